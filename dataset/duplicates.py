@@ -1,81 +1,466 @@
 import os
-import shutil
+import math
+import sqlite3
+from concurrent.futures import ProcessPoolExecutor
+from itertools import combinations
+import numpy as np
 from PIL import Image
 import imagehash
 from tqdm import tqdm
+from dataset.tools.file_transfer import transfer_files
 
 # Dataset dirs path
 DATASET_PATH = r""
 OUTPUT_PATH = r""
+# Общий индекс хэшей (можно использовать для нескольких датасетов), пустая строка - без индекса
+HASH_INDEX_PATH = r""
+# Максимальное расстояние Хэмминга между хэшами почти-дубликатов, 0 - только точные совпадения
+HAMMING_THRESHOLD = 0
+# Как переносить файлы в новый датасет: "copy", "hardlink", "reflink" или "symlink"
+TRANSFER_MODE = "copy"
+
+# Части хэша до этой длины ищутся по таблице корзин (2 ** bits элементов)
+DIRECTORY_BITS = 22
+# Максимум вариантов перебора на одну часть хэша в multi-index hashing
+MAX_FLIP_PATTERNS = 1 << 20
+
+IMAGE_EXTENSIONS = {".jpg", ".jpeg", ".png", ".bmp", ".tif", ".tiff", ".webp"}
+
 
 def get_image_hash(image_path):
     """Вычислить перцептивный хэш изображения."""
     try:
-        image = Image.open(image_path)
-        return imagehash.phash(image)
+        with Image.open(image_path) as image:
+            return imagehash.phash(image)
     except Exception as e:
         print(f"Ошибка обработки {image_path}: {e}")
         return None
 
-def find_duplicates(dataset_path):
-    """Поиск дубликатов изображений."""
-    hash_dict = {}
-    duplicates = []
 
-    for task_folder in os.listdir(dataset_path):
+def _hash_to_int(image_hash):
+    """64-битный pHash как беззнаковое целое."""
+    return int(str(image_hash), 16)
+
+
+def _hash_file(image_path):
+    """Хэш файла для пула процессов: целое число или None."""
+    image_hash = get_image_hash(image_path)
+    return None if image_hash is None else _hash_to_int(image_hash)
+
+
+class HashIndex:
+    """
+    Постоянный индекс pHash изображений (файл SQLite).
+
+    Записи хранятся по абсолютному пути вместе с размером и mtime файла, поэтому при
+    повторном запуске пересчитываются только новые и изменённые изображения. Один индекс
+    можно использовать для любого числа датасетов.
+
+    Args:
+        path (str): Путь к файлу индекса, создаётся при отсутствии.
+    """
+
+    def __init__(self, path):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.path = path
+        self._db = sqlite3.connect(path)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS hashes "
+            "(path TEXT PRIMARY KEY, size INTEGER NOT NULL, mtime_ns INTEGER NOT NULL, hash INTEGER NOT NULL)"
+        )
+
+    def entries(self, root):
+        """
+        Возвращает записи индекса для изображений внутри директории.
+
+        Args:
+            root (str): Директория (например, корень датасета).
+
+        Returns:
+            dict: Путь -> (размер, mtime_ns, хэш).
+        """
+        prefix = os.path.join(os.path.abspath(root), "")
+        # Диапазон по строкам вместо LIKE, чтобы использовать первичный ключ
+        upper = prefix[:-1] + chr(ord(prefix[-1]) + 1)
+        rows = self._db.execute(
+            "SELECT path, size, mtime_ns, hash FROM hashes WHERE path >= ? AND path < ?", (prefix, upper)
+        )
+        # SQLite хранит знаковые 64-битные числа
+        return {path: (size, mtime_ns, value & 0xFFFFFFFFFFFFFFFF) for path, size, mtime_ns, value in rows}
+
+    def update(self, rows):
+        """
+        Сохраняет хэши изображений.
+
+        Args:
+            rows (list[tuple]): Кортежи (путь, размер, mtime_ns, хэш).
+        """
+        self._db.executemany(
+            "INSERT OR REPLACE INTO hashes (path, size, mtime_ns, hash) VALUES (?, ?, ?, ?)",
+            [(path, size, mtime_ns, value - (1 << 64) if value >= 1 << 63 else value)
+             for path, size, mtime_ns, value in rows],
+        )
+        self._db.commit()
+
+    def close(self):
+        self._db.close()
+
+
+def list_images(dataset_path):
+    """
+    Список изображений датасета формата task/images с размером и mtime.
+
+    Returns:
+        list[tuple]: Кортежи (задача, путь, размер, mtime_ns) в порядке задач и имён.
+    """
+    images = []
+    for task_folder in sorted(os.listdir(dataset_path)):
         task_path = os.path.join(dataset_path, task_folder, "images")
-        if not os.path.exists(task_path):
+        if not os.path.isdir(task_path):
             continue
+        with os.scandir(task_path) as entries:
+            files = sorted(
+                (entry for entry in entries
+                 if entry.is_file() and os.path.splitext(entry.name)[1].lower() in IMAGE_EXTENSIONS),
+                key=lambda entry: entry.name,
+            )
+            for entry in files:
+                stat = entry.stat()
+                images.append((task_folder, entry.path, stat.st_size, stat.st_mtime_ns))
+    return images
+
+
+def hash_images(images, index=None, workers=None, chunksize=64):
+    """
+    Вычислить pHash изображений в пуле процессов, используя индекс как кэш.
+
+    Args:
+        images (list[tuple]): Кортежи (задача, путь, размер, mtime_ns) из `list_images`.
+        index (HashIndex, optional): Постоянный индекс хэшей. Defaults to None.
+        workers (int, optional): Число процессов. Defaults to None (число ядер).
+        chunksize (int, optional): Изображений на одну задачу пула. Defaults to 64.
+
+    Returns:
+        dict: Путь -> хэш (64-битное целое); изображения, которые не удалось прочитать, пропускаются.
+    """
+    known = {}
+    if index is not None:
+        # Индекс хранит абсолютные пути, корень датасета - на три уровня выше файла (task/images/file)
+        for root in {os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(path)))) for _, path, _, _ in images}:
+            known.update(index.entries(root))
+
+    hashes, pending = {}, []
+    for _, path, size, mtime_ns in images:
+        entry = known.get(os.path.abspath(path))
+        if entry is not None and entry[:2] == (size, mtime_ns):
+            hashes[path] = entry[2]
+        else:
+            pending.append((path, size, mtime_ns))
+    print(f"Хэши из индекса: {len(hashes)}, нужно вычислить: {len(pending)}")
+
+    if pending:
+        rows = []
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            results = executor.map(_hash_file, [path for path, _, _ in pending], chunksize=chunksize)
+            for (path, size, mtime_ns), value in tqdm(zip(pending, results), total=len(pending), desc="Хэширование"):
+                if value is not None:
+                    hashes[path] = value
+                    rows.append((os.path.abspath(path), size, mtime_ns, value))
+        if index is not None:
+            index.update(rows)
+    return hashes
+
+
+def popcount(values):
+    """Число единичных битов каждого элемента массива uint64."""
+    if hasattr(np, "bitwise_count"):  # numpy >= 2.0
+        return np.bitwise_count(values)
+    bits = np.unpackbits(values.view(np.uint8).reshape(-1, 8), axis=1)
+    return bits.sum(axis=1)
+
+
+def _flip_patterns(width, radius):
+    """Все маски из `width` битов, в которых не больше `radius` единиц (генератор)."""
+    for count in range(radius + 1):
+        for positions in combinations(range(width), count):
+            yield sum(1 << position for position in positions)
+
+
+def _pattern_count(width, radius):
+    """Число масок, которые вернёт `_flip_patterns(width, radius)`."""
+    return sum(math.comb(width, k) for k in range(radius + 1))
+
+
+def _choose_chunks(count, threshold):
+    """
+    Число частей хэша для multi-index hashing с минимальной оценкой стоимости.
+
+    Если расстояние между хэшами не больше `threshold`, то хотя бы одна из `chunks` частей
+    отличается не больше чем на `threshold // chunks` битов. Больше частей - меньше
+    вариантов перебора на часть, но крупнее корзины с одинаковым ключом.
+    """
+    best, best_cost = 1, None
+    for chunks in range(1, min(threshold + 1, 16) + 1):
+        width = 64 // chunks
+        probes = _pattern_count(width, threshold // chunks)
+        cost = chunks * probes * (count + count * count / 2 ** width)
+        if best_cost is None or cost < best_cost:
+            best, best_cost = chunks, cost
+    return best
 
-        for img_file in tqdm(os.listdir(task_path), desc=f"Обработка {task_folder}"):
-            img_path = os.path.join(task_path, img_file)
-            img_hash = get_image_hash(img_path)
 
-            if img_hash is not None:
-                if img_hash in hash_dict:
-                    duplicates.append((img_path, hash_dict[img_hash]))
+def hamming_pairs(hashes, threshold, chunks=None, block=1 << 16):
+    """
+    Находит все пары хэшей с расстоянием Хэмминга не больше порога (multi-index hashing).
+
+    Хэш делится на `chunks` частей; для каждой части массив ключей сортируется, и для каждого
+    хэша бинарным поиском находятся хэши, часть которых отличается не больше чем на
+    `threshold // chunks` битов. Кандидаты проверяются точным расстоянием. Всё считается
+    векторно над массивами uint64, без сравнения всех пар.
+
+    Args:
+        hashes (np.ndarray): Хэши, uint64.
+        threshold (int): Максимальное расстояние Хэмминга.
+        chunks (int, optional): Число частей хэша. Defaults to None (по оценке стоимости).
+        block (int, optional): Хэшей на один шаг поиска (ограничивает память). Defaults to 65536.
+
+    Returns:
+        tuple[np.ndarray, np.ndarray]: Индексы пар (i, j), i < j, без повторов.
+
+    Raises:
+        ValueError: Если при таком числе частей перебор на часть больше `MAX_FLIP_PATTERNS`.
+    """
+    hashes = np.asarray(hashes, dtype=np.uint64)
+    count = len(hashes)
+    chunks = chunks or _choose_chunks(count, threshold)
+    bounds = np.linspace(0, 64, chunks + 1).astype(int)
+    radius = threshold // chunks
+    # Самая широкая часть даёт больше всего вариантов
+    probes = _pattern_count(int(np.diff(bounds).max()), radius)
+    if probes > MAX_FLIP_PATTERNS:
+        raise ValueError(
+            f"Слишком мало частей хэша ({chunks}) для порога {threshold}: {probes} вариантов на часть, "
+            f"допустимо не больше {MAX_FLIP_PATTERNS}."
+        )
+    found = []
+    for low, high in zip(bounds[:-1], bounds[1:]):
+        width = int(high - low)
+        keys = (hashes >> np.uint64(low)) & np.uint64((1 << width) - 1)
+        order = np.argsort(keys, kind="stable")
+        sorted_keys = keys[order]
+        # Для коротких частей - таблица начала каждой корзины вместо бинарного поиска
+        starts = None
+        if width <= DIRECTORY_BITS:
+            starts = np.zeros((1 << width) + 1, dtype=np.int64)
+            np.cumsum(np.bincount(keys.astype(np.int64), minlength=1 << width), out=starts[1:])
+        for pattern in _flip_patterns(width, radius):
+            query = keys ^ np.uint64(pattern)
+            # Пара находится с обеих сторон; оставляем поиск от меньшего ключа (или i < j для равных)
+            sources = np.nonzero(keys < query)[0] if pattern else np.arange(count)
+            for offset in range(0, len(sources), block):
+                source = sources[offset:offset + block]
+                if starts is not None:
+                    buckets = query[source].astype(np.int64)
+                    first = starts[buckets]
+                    sizes = starts[buckets + 1] - first
                 else:
-                    hash_dict[img_hash] = img_path
+                    first = np.searchsorted(sorted_keys, query[source], "left")
+                    sizes = np.searchsorted(sorted_keys, query[source], "right") - first
+                total = int(sizes.sum())
+                if not total:
+                    continue
+                # Разворачиваем диапазоны [first, first + size) в плоские массивы пар
+                ends = np.cumsum(sizes)
+                positions = np.arange(total) - np.repeat(ends - sizes, sizes) + np.repeat(first, sizes)
+                left, right = np.repeat(source, sizes), order[positions]
+                keep = left < right if not pattern else np.ones(total, dtype=bool)
+                keep &= popcount(hashes[left] ^ hashes[right]) <= threshold
+                left, right = left[keep], right[keep]
+                found.append(np.minimum(left, right) * count + np.maximum(left, right))
+    if not found:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+    codes = np.unique(np.concatenate(found))
+    return codes // count, codes % count
+
+
+def cluster_hashes(hashes, threshold):
+    """
+    Группирует почти одинаковые хэши в кластеры с представителем.
+
+    Хэши обходятся по порядку; первый ещё не распределённый хэш становится представителем, а
+    все нераспределённые хэши в пределах порога от него - членами его кластера. Так каждый
+    член кластера отличается от представителя не больше чем на `threshold` битов (нет
+    цепочек, как у связных компонент). Одинаковые хэши сначала схлопываются, поэтому большие
+    группы точных дубликатов не порождают квадратичного числа пар.
+
+    Args:
+        hashes (np.ndarray): Хэши, uint64, в порядке приоритета представителей.
+        threshold (int): Максимальное расстояние Хэмминга до представителя.
+
+    Returns:
+        np.ndarray: Индекс представителя для каждого хэша (для представителей - свой индекс).
+    """
+    hashes = np.asarray(hashes, dtype=np.uint64)
+    unique, first, inverse = np.unique(hashes, return_index=True, return_inverse=True)
+    # Уникальные хэши по порядку первого появления, чтобы представителем был самый ранний
+    order = np.argsort(first, kind="stable")
+    rank = np.empty_like(order)
+    rank[order] = np.arange(len(order))
+    unique, first, inverse = unique[order], first[order], rank[inverse.reshape(-1)]
+
+    leaders = np.arange(len(unique))
+    if threshold > 0 and len(unique) > 1:
+        left, right = hamming_pairs(unique, threshold)
+        sources = np.concatenate([left, right])
+        neighbors = np.concatenate([right, left])[np.argsort(sources, kind="stable")]
+        indptr = np.zeros(len(unique) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(sources, minlength=len(unique)), out=indptr[1:])
+        assigned = np.zeros(len(unique), dtype=bool)
+        # Хэши без соседей остаются своими представителями, цикл только по остальным
+        for node in np.unique(sources):
+            if assigned[node]:
+                continue
+            assigned[node] = True
+            members = neighbors[indptr[node]:indptr[node + 1]]
+            members = members[~assigned[members]]
+            assigned[members] = True
+            leaders[members] = node
+    return first[leaders[inverse]]
+
+
+def find_duplicates(dataset_path, index_path=None, reference_paths=(), workers=None, threshold=HAMMING_THRESHOLD):
+    """
+    Поиск дубликатов изображений.
+
+    С `threshold` > 0 ищутся и почти-дубликаты (например, соседние кадры одного видео):
+    изображения группируются в кластеры, где каждое отличается от представителя (первого
+    изображения кластера) не больше чем на `threshold` битов pHash.
+
+    С `reference_paths` изображения этих датасетов (уже посчитанные в индексе) считаются
+    оригиналами, так что новый датасет проверяется на совпадения с уже имеющимися.
+
+    Args:
+        dataset_path (str): Корень датасета (task/images).
+        index_path (str, optional): Файл постоянного индекса хэшей. Defaults to None.
+        reference_paths (list[str], optional): Корни датасетов из индекса для сравнения. Defaults to ().
+        workers (int, optional): Число процессов хэширования. Defaults to None (число ядер).
+        threshold (int, optional): Максимальное расстояние Хэмминга. Defaults to `HAMMING_THRESHOLD`.
+
+    Returns:
+        list[tuple]: Пары (дубликат, представитель).
+    """
+    index = HashIndex(index_path) if index_path else None
+    try:
+        # Изображения датасетов сравнения идут первыми, чтобы становиться представителями
+        paths, values = [], []
+        if index is not None:
+            for reference_path in reference_paths:
+                for path, (_, _, value) in sorted(index.entries(reference_path).items()):
+                    paths.append(path)
+                    values.append(value)
+        elif reference_paths:
+            raise ValueError("reference_paths требует индекс хэшей (index_path).")
+
+        images = list_images(dataset_path)
+        hashes = hash_images(images, index, workers)
+    finally:
+        if index is not None:
+            index.close()
+
+    references = len(paths)
+    for _, img_path, _, _ in images:
+        if img_path in hashes:
+            paths.append(img_path)
+            values.append(hashes[img_path])
+    leaders = cluster_hashes(np.array(values, dtype=np.uint64), threshold)
 
+    duplicates = []
+    for position in range(references, len(paths)):
+        original = paths[leaders[position]]
+        # Изображение из датасета сравнения не считается дубликатом самого себя
+        if leaders[position] != position and original != os.path.abspath(paths[position]):
+            duplicates.append((paths[position], original))
     return duplicates
 
-def remove_duplicates(duplicates, dataset_path, output_path):
-    """Удалить дубликаты и их аннотации."""
-    if not os.path.exists(output_path):
-        os.makedirs(output_path)
 
-    for task_folder in os.listdir(dataset_path):
+def group_duplicates(duplicates):
+    """
+    Собирает пары из `find_duplicates` в кластеры.
+
+    Returns:
+        dict: Представитель -> список его дубликатов.
+    """
+    clusters = {}
+    for img_path, original in duplicates:
+        clusters.setdefault(original, []).append(img_path)
+    return clusters
+
+
+def build_copy_manifest(duplicates, dataset_path, output_path):
+    """
+    Список файлов нового датасета без дубликатов: изображения и их аннотации.
+
+    Args:
+        duplicates (list[tuple]): Пары (дубликат, представитель) из `find_duplicates`.
+        dataset_path (str): Корень исходного датасета (task/images, task/labels).
+        output_path (str): Корень нового датасета.
+
+    Returns:
+        list[tuple]: Пары (исходный файл, файл в новом датасете).
+    """
+    duplicate_paths = {os.path.normpath(img_path) for img_path, _ in duplicates}
+    manifest = []
+    for task_folder in sorted(os.listdir(dataset_path)):
         src_images = os.path.join(dataset_path, task_folder, "images")
         src_labels = os.path.join(dataset_path, task_folder, "labels")
+        if not os.path.isdir(src_images):
+            continue
         dst_images = os.path.join(output_path, task_folder, "images")
         dst_labels = os.path.join(output_path, task_folder, "labels")
+        # Одно чтение директории аннотаций вместо проверки файла для каждого изображения
+        labels = set(os.listdir(src_labels)) if os.path.isdir(src_labels) else set()
 
-        # Создаем папки в выходной директории
-        os.makedirs(dst_images, exist_ok=True)
-        os.makedirs(dst_labels, exist_ok=True)
-
-        # Копируем файлы, исключая дубликаты
-        for img_file in os.listdir(src_images):
+        for img_file in sorted(os.listdir(src_images)):
             img_path = os.path.join(src_images, img_file)
-            # Имя текстового файла аннотации (без учета расширения)
-            file_base_name = os.path.splitext(img_file)[0]  # Извлекаем имя файла без расширения
-            label_path = os.path.join(src_labels, file_base_name + ".txt")
-
-            # Пропускаем дубликаты
-            if any(dup[0] == img_path for dup in duplicates):
+            if os.path.normpath(img_path) in duplicate_paths:
                 continue
+            manifest.append((img_path, os.path.join(dst_images, img_file)))
+            label_file = os.path.splitext(img_file)[0] + ".txt"
+            if label_file in labels:
+                manifest.append((os.path.join(src_labels, label_file), os.path.join(dst_labels, label_file)))
+    return manifest
+
+
+def remove_duplicates(duplicates, dataset_path, output_path, mode="copy", workers=8):
+    """
+    Удалить дубликаты и их аннотации: собрать новый датасет без них.
+
+    С `mode` "hardlink", "reflink" или "symlink" файлы не копируются, а связываются с
+    исходными, так что датасет без дубликатов почти не занимает места и создаётся быстро.
+
+    Args:
+        duplicates (list[tuple]): Пары (дубликат, представитель) из `find_duplicates`.
+        dataset_path (str): Корень исходного датасета.
+        output_path (str): Корень нового датасета.
+        mode (str, optional): "copy", "hardlink", "reflink" или "symlink". Defaults to "copy".
+        workers (int, optional): Число потоков копирования. Defaults to 8.
+
+    Returns:
+        list[tuple]: Манифест - пары (исходный файл, файл в новом датасете).
+    """
+    manifest = build_copy_manifest(duplicates, dataset_path, output_path)
+    used = transfer_files(manifest, mode, workers, desc="Копирование")
+    print(f"Файлов в новом датасете: {len(manifest)} ({', '.join(f'{name}: {count}' for name, count in used.items())})")
+    return manifest
 
-            # Копируем изображения и аннотации
-            shutil.copy(img_path, dst_images)
-            if os.path.exists(label_path):
-                shutil.copy(label_path, dst_labels)
 
-# Шаг 1: Найти дубликаты
-print("Ищем дубликаты...")
-duplicates = find_duplicates(DATASET_PATH)
-print(f"Найдено дубликатов: {len(duplicates)}")
+if __name__ == "__main__":
+    # Шаг 1: Найти дубликаты
+    print("Ищем дубликаты...")
+    duplicates = find_duplicates(DATASET_PATH, HASH_INDEX_PATH or None, threshold=HAMMING_THRESHOLD)
+    print(f"Найдено дубликатов: {len(duplicates)} в {len(group_duplicates(duplicates))} кластерах")
 
-# Шаг 2: Удалить дубликаты
-print("Удаляем дубликаты...")
-remove_duplicates(duplicates, DATASET_PATH, OUTPUT_PATH)
-print(f"Фильтрация завершена. Новый датасет сохранен в {OUTPUT_PATH}.")
+    # Шаг 2: Удалить дубликаты
+    print("Удаляем дубликаты...")
+    remove_duplicates(duplicates, DATASET_PATH, OUTPUT_PATH, TRANSFER_MODE)
+    print(f"Фильтрация завершена. Новый датасет сохранен в {OUTPUT_PATH}.")
@@ -0,0 +1,107 @@
+import os
+
+import numpy as np
+import pytest
+
+pytest.importorskip("imagehash")
+
+from dataset import duplicates
+from dataset.duplicates import build_copy_manifest, cluster_hashes, find_duplicates, hamming_pairs, popcount
+
+
+def near_duplicate_hashes(count=300, seed=0):
+    """Random hashes plus copies with a few flipped bits, so every distance up to 10 occurs."""
+    rng = np.random.default_rng(seed)
+    hashes = rng.integers(0, 2 ** 63, size=count, dtype=np.uint64) * np.uint64(2) + rng.integers(0, 2, size=count).astype(np.uint64)
+    copies = []
+    for index in range(0, count, 3):
+        flips = rng.choice(64, size=rng.integers(0, 11), replace=False)
+        copies.append(hashes[index] ^ np.uint64(sum(1 << int(bit) for bit in flips)))
+    return np.concatenate([hashes, copies, hashes[:5]])
+
+
+def brute_force_pairs(hashes, threshold):
+    values = [int(value) for value in hashes]
+    return {
+        (i, j)
+        for i in range(len(values))
+        for j in range(i + 1, len(values))
+        if bin(values[i] ^ values[j]).count("1") <= threshold
+    }
+
+
+def test_popcount():
+    values = np.array([0, 1, 0xFF, 2 ** 64 - 1, 0x8000000000000001], dtype=np.uint64)
+    assert popcount(values).tolist() == [0, 1, 8, 64, 2]
+
+
+@pytest.mark.parametrize(
+    "threshold, chunks",
+    # One chunk at threshold 8 would need C(64, <=8) probes, see the rejection test below
+    [(threshold, chunks) for threshold in (0, 3, 8) for chunks in (None, 1, 2, 4) if (threshold, chunks) != (8, 1)],
+)
+def test_hamming_pairs_match_brute_force(threshold, chunks):
+    hashes = near_duplicate_hashes()
+    left, right = hamming_pairs(hashes, threshold, chunks=chunks, block=64)
+    assert np.all(left < right)
+    assert set(zip(left.tolist(), right.tolist())) == brute_force_pairs(hashes, threshold)
+
+
+def test_hamming_pairs_reject_infeasible_chunks():
+    hashes = near_duplicate_hashes(count=10)
+    with pytest.raises(ValueError):
+        hamming_pairs(hashes, 8, chunks=1)
+
+
+def test_clusters_stay_within_the_threshold_of_their_leader():
+    hashes = near_duplicate_hashes()
+    leaders = cluster_hashes(hashes, 6)
+    distances = popcount(hashes ^ hashes[leaders])
+    assert distances.max() <= 6
+    # Leaders lead themselves and come before their members
+    assert np.all(leaders[leaders] == leaders)
+    assert np.all(leaders <= np.arange(len(hashes)))
+    # Exact copies always join the first occurrence
+    assert leaders[-5:].tolist() == [leaders[index] for index in range(5)]
+    # A hash within the threshold of a leader is never left alone
+    alone = np.flatnonzero(leaders == np.arange(len(hashes)))
+    left, right = hamming_pairs(hashes[alone], 6)
+    assert len(left) == 0
+
+
+def test_threshold_zero_groups_exact_copies_only():
+    hashes = np.array([5, 4, 5, 7, 4], dtype=np.uint64)
+    assert cluster_hashes(hashes, 0).tolist() == [0, 1, 0, 3, 1]
+
+
+def write_dataset(root):
+    from PIL import Image
+
+    rng = np.random.default_rng(1)
+    images = {name: rng.integers(0, 255, size=(64, 64, 3), dtype=np.uint8) for name in ("a", "b")}
+    for task, names in {"task_1": ["a", "b"], "task_2": ["a"]}.items():
+        os.makedirs(root / task / "images")
+        os.makedirs(root / task / "labels")
+        for index, name in enumerate(names):
+            Image.fromarray(images[name]).save(root / task / "images" / f"{index}.png")
+            (root / task / "labels" / f"{index}.txt").write_text(f"0 0.5 0.5 0.1 0.1 # {name}\n")
+
+
+def test_duplicate_images_are_left_out_of_the_manifest(tmp_path, monkeypatch):
+    dataset = tmp_path / "dataset"
+    write_dataset(dataset)
+    found = find_duplicates(str(dataset), index_path=str(tmp_path / "index.sqlite"), workers=1)
+    assert found == [(str(dataset / "task_2" / "images" / "0.png"), str(dataset / "task_1" / "images" / "0.png"))]
+
+    # The second run takes every hash from the index
+    monkeypatch.setattr(duplicates, "_hash_file", None)
+    assert find_duplicates(str(dataset), index_path=str(tmp_path / "index.sqlite"), workers=1) == found
+
+    manifest = build_copy_manifest(found, str(dataset), str(tmp_path / "out"))
+    targets = [os.path.relpath(dst, tmp_path / "out") for _, dst in manifest]
+    assert targets == [
+        os.path.join("task_1", "images", "0.png"),
+        os.path.join("task_1", "labels", "0.txt"),
+        os.path.join("task_1", "images", "1.png"),
+        os.path.join("task_1", "labels", "1.txt"),
+    ]
@@ -0,0 +1,52 @@
+import os
+
+import pytest
+
+from dataset.tools.file_transfer import transfer_file, transfer_files
+
+
+@pytest.fixture
+def source(tmp_path):
+    path = tmp_path / "src" / "a.jpg"
+    path.parent.mkdir()
+    path.write_bytes(b"image-bytes")
+    return path
+
+
+@pytest.mark.parametrize("mode", ["copy", "hardlink", "reflink", "symlink"])
+def test_transfer_file_places_content(tmp_path, source, mode):
+    dst = tmp_path / "a.jpg"
+    used = transfer_file(source, dst, mode)
+    assert dst.read_bytes() == b"image-bytes"
+    assert used in (mode, "copy")
+    if mode == "symlink":
+        assert dst.is_symlink()
+
+
+@pytest.mark.parametrize("first", ["copy", "hardlink", "reflink", "symlink"])
+@pytest.mark.parametrize("second", ["copy", "hardlink", "reflink", "symlink"])
+def test_rerun_over_existing_output_keeps_source(tmp_path, source, first, second):
+    # A link left by an earlier run must be replaced, never written through
+    dst = tmp_path / "a.jpg"
+    transfer_file(source, dst, first)
+    transfer_file(source, dst, second)
+    assert source.read_bytes() == b"image-bytes"
+    assert dst.read_bytes() == b"image-bytes"
+
+
+def test_transfer_file_rejects_same_path(source):
+    with pytest.raises(ValueError):
+        transfer_file(source, source, "copy")
+    assert source.read_bytes() == b"image-bytes"
+
+
+def test_transfer_files_creates_directories(tmp_path, source):
+    manifest = [(str(source), str(tmp_path / "out" / name / "a.jpg")) for name in ("x", "y")]
+    used = transfer_files(manifest, "hardlink", workers=2)
+    assert sum(used.values()) == 2
+    assert all(os.path.exists(dst) for _, dst in manifest)
+
+
+def test_transfer_files_rejects_unknown_mode(tmp_path, source):
+    with pytest.raises(ValueError):
+        transfer_files([(str(source), str(tmp_path / "a.jpg"))], "move")
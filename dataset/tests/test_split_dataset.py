@@ -0,0 +1,103 @@
+import numpy as np
+import pytest
+
+from dataset.tools.split_dataset import DatasetSplitter, TaskStatistics, _parse_labels, solve_split
+
+
+def make_dataset(root, tasks=10, seed=0):
+    rng = np.random.default_rng(seed)
+    for task in range(tasks):
+        images, labels = root / f"t{task}" / "images", root / f"t{task}" / "labels"
+        images.mkdir(parents=True)
+        labels.mkdir()
+        for index in range(int(rng.integers(2, 8))):
+            (images / f"{index}.jpg").write_bytes(b"jpg")
+            lines = [f"{rng.integers(0, 2)} 0.5 0.5 0.01 0.01" for _ in range(int(rng.integers(0, 3)))]
+            (labels / f"{index}.txt").write_text("\n".join(lines))
+    return root
+
+
+def subset_tasks(output):
+    return {name: {folder.name for folder in (output / name).iterdir()} for name in ("train", "val", "test")}
+
+
+def test_collect_counts_images_boxes_and_sizes(tmp_path):
+    task = tmp_path / "ds" / "t0"
+    (task / "images").mkdir(parents=True)
+    (task / "labels").mkdir()
+    for name in ("a", "b", "c"):
+        (task / "images" / f"{name}.jpg").write_bytes(b"jpg")
+    (task / "labels" / "a.txt").write_text("0 0.5 0.5 0.01 0.01\n1 0.5 0.5 0.5 0.5\n")
+    (task / "labels" / "b.txt").write_text("1 0.5 0.5 0.1 0.1\n")
+    stats = TaskStatistics.collect(tmp_path / "ds")
+    assert stats.images.tolist() == [3]
+    assert stats.boxes.tolist() == [[1, 2]]
+    assert stats.sizes.tolist() == [[1, 1, 1]]
+
+
+def test_collect_reads_polygon_labels_line_by_line(tmp_path):
+    # 9 + 11 values: a multiple of 5 that must not be read as four boxes
+    task = tmp_path / "ds" / "t0"
+    (task / "images").mkdir(parents=True)
+    (task / "labels").mkdir()
+    (task / "images" / "a.jpg").write_bytes(b"jpg")
+    (task / "labels" / "a.txt").write_text(
+        "2 0.1 0.1 0.3 0.1 0.3 0.4 0.1 0.4\n"
+        "0 0.5 0.5 0.9 0.5 0.9 0.9 0.5 0.9 0.7 0.95\n"
+    )
+    stats = TaskStatistics.collect(tmp_path / "ds")
+    assert stats.boxes.tolist() == [[1, 0, 1]]
+    assert stats.sizes.tolist() == [[0, 0, 2]]
+    labels = _parse_labels((task / "labels" / "a.txt").read_text())
+    np.testing.assert_allclose(labels, [[2, 0.2, 0.25, 0.2, 0.3], [0, 0.7, 0.725, 0.4, 0.45]])
+
+
+def test_solve_split_hits_ratios_on_every_column():
+    rng = np.random.default_rng(1)
+    table = np.column_stack([rng.integers(10, 500, 600), rng.poisson(20, 600), rng.poisson(3, 600)])
+    assignment = solve_split(table, (0.7, 0.2, 0.1))
+    shares = np.array([table[assignment == subset].sum(axis=0) / table.sum(axis=0) for subset in range(3)])
+    assert np.allclose(shares, [[0.7], [0.2], [0.1]], atol=0.01)
+
+
+def test_solve_split_leaves_zero_ratio_subsets_empty():
+    table = np.ones((20, 2))
+    assert set(solve_split(table, (0.8, 0.2, 0.0)).tolist()) <= {0, 1}
+
+
+def test_empty_dataset_gives_empty_subsets(tmp_path):
+    assert solve_split(np.zeros((0, 3)), (0.7, 0.2, 0.1)).tolist() == []
+    (tmp_path / "ds").mkdir()
+    DatasetSplitter(tmp_path / "ds", tmp_path / "out").split(stratified=True)
+    assert not any((tmp_path / "out").glob("*/*"))
+
+
+@pytest.mark.parametrize("mode", ["copy", "hardlink", "symlink"])
+def test_split_refuses_to_merge_into_previous_split(tmp_path, mode):
+    dataset = make_dataset(tmp_path / "ds")
+    output = tmp_path / "out"
+    DatasetSplitter(dataset, output, seed=1).split(mode=mode)
+    with pytest.raises(ValueError):
+        DatasetSplitter(dataset, output, seed=2).split(mode=mode)
+
+
+@pytest.mark.parametrize("first, second", [("copy", "symlink"), ("hardlink", "reflink"), ("symlink", "copy")])
+def test_overwrite_replaces_split_without_leakage(tmp_path, first, second):
+    dataset = make_dataset(tmp_path / "ds")
+    output = tmp_path / "out"
+    DatasetSplitter(dataset, output, seed=1).split(mode=first)
+    DatasetSplitter(dataset, output, seed=2).split(stratified=True, mode=second, overwrite=True)
+
+    tasks = subset_tasks(output)
+    assert not tasks["train"] & tasks["val"] and not tasks["train"] & tasks["test"] and not tasks["val"] & tasks["test"]
+    assert len(tasks["train"] | tasks["val"] | tasks["test"]) == 10
+    # Replacing links must not touch the source dataset
+    assert all(path.read_bytes() == b"jpg" for path in dataset.glob("*/images/*.jpg"))
+
+
+def test_manifest_lists_every_image_once(tmp_path):
+    dataset = make_dataset(tmp_path / "ds")
+    output = tmp_path / "out"
+    DatasetSplitter(dataset, output).split(mode="manifest")
+    lines = [line for name in ("train", "val", "test") for line in (output / f"{name}.txt").read_text().splitlines()]
+    assert sorted(lines) == sorted(str(path.resolve()) for path in dataset.glob("*/images/*.jpg"))
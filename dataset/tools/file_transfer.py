@@ -0,0 +1,111 @@
+import os
+import shutil
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from tqdm import tqdm
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+TRANSFER_MODES = ("copy", "hardlink", "reflink", "symlink")
+
+# ioctl that shares the extents of a file on copy-on-write filesystems (Btrfs, XFS)
+FICLONE = 0x40049409
+
+
+def reflink(src, dst):
+    """
+    Creates `dst` as a copy-on-write clone of `src`.
+
+    Raises:
+        OSError: If the platform or the filesystem does not support reflinks.
+    """
+    if fcntl is None:
+        raise OSError("Reflinks are not supported on this platform.")
+    with open(src, "rb") as source, open(dst, "wb") as target:
+        fcntl.ioctl(target.fileno(), FICLONE, source.fileno())
+
+
+def _place(src, dst, mode):
+    if mode == "hardlink":
+        os.link(src, dst)
+    elif mode == "symlink":
+        os.symlink(os.path.abspath(src), dst)
+    elif mode == "reflink":
+        reflink(src, dst)
+    else:
+        shutil.copyfile(src, dst)
+
+
+def transfer_file(src, dst, mode="copy"):
+    """
+    Places a file at `dst` as a copy or a link of `src`, replacing an existing `dst`.
+
+    An existing `dst` is unlinked first and never opened for writing: it may be a hard link or
+    a symbolic link to `src` left by an earlier run, and writing through it would truncate the
+    source. Hard links and reflinks fall back to a copy when the filesystem does not support
+    them (e.g. across devices).
+
+    Args:
+        src (str or Path): Source file.
+        dst (str or Path): Destination file; its directory must exist.
+        mode (str, optional): "copy", "hardlink", "reflink" or "symlink". Defaults to "copy".
+
+    Returns:
+        str: The mode that was used.
+
+    Raises:
+        ValueError: If `src` and `dst` are the same path.
+    """
+    if os.path.abspath(src) == os.path.abspath(dst):
+        raise ValueError(f"Source and destination are the same file: {src}")
+    try:
+        os.unlink(dst)
+    except FileNotFoundError:
+        pass
+    try:
+        _place(src, dst, mode)
+    except OSError:
+        if mode not in ("hardlink", "reflink"):
+            raise
+        # A failed reflink may leave an empty file behind; it is a new file, not the source
+        try:
+            os.unlink(dst)
+        except FileNotFoundError:
+            pass
+        shutil.copyfile(src, dst)
+        return "copy"
+    return mode
+
+
+def transfer_files(manifest, mode="copy", workers=8, desc=None):
+    """
+    Copies or links every (source, destination) pair of a manifest on a thread pool.
+
+    The destination directories are created once up front, so the workers only move files.
+
+    Args:
+        manifest (list[tuple]): Pairs (source file, destination file).
+        mode (str, optional): "copy", "hardlink", "reflink" or "symlink". Defaults to "copy".
+        workers (int, optional): Number of threads. Defaults to 8.
+        desc (str, optional): Label of the progress bar. Defaults to None.
+
+    Returns:
+        Counter: Number of files per mode used (fallbacks to a copy are counted as "copy").
+
+    Raises:
+        ValueError: If the mode is unknown.
+    """
+    if mode not in TRANSFER_MODES:
+        raise ValueError(f"Unknown transfer mode: {mode}. Use one of {TRANSFER_MODES}.")
+    for directory in {os.path.dirname(dst) for _, dst in manifest}:
+        os.makedirs(directory, exist_ok=True)
+
+    used = Counter()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        results = executor.map(lambda pair: transfer_file(pair[0], pair[1], mode), manifest)
+        for result in tqdm(results, total=len(manifest), desc=desc):
+            used[result] += 1
+    return used
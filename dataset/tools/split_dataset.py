@@ -1,8 +1,175 @@
+import os
 import random
 import shutil
 from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
+import numpy as np
+
+from .file_transfer import TRANSFER_MODES, transfer_files
+
+SUBSETS = ("train", "val", "test")
+# How the subsets are written: a copy or link tree per file, or only list files of the images
+SPLIT_MODES = TRANSFER_MODES + ("manifest",)
+
+# Upper bounds of the small and medium box area, as a fraction of the image (32 and 96 px at 640)
+BOX_SIZE_LIMITS = ((32 / 640) ** 2, (96 / 640) ** 2)
+
+
+def _parse_labels(text):
+    """
+    Parses the content of YOLO label files into an (N, 5) array: class, x, y, w, h.
+
+    Every line is one object. Segmentation lines (class followed by polygon points) are
+    reduced to the bounding box of their points.
+    """
+    rows = []
+    for line in text.splitlines():
+        values = [float(value) for value in line.split()]
+        if len(values) > 5:
+            xs, ys = values[1::2], values[2::2]
+            x_min, x_max, y_min, y_max = min(xs), max(xs), min(ys), max(ys)
+            values = [values[0], (x_min + x_max) / 2, (y_min + y_max) / 2, x_max - x_min, y_max - y_min]
+        elif values:
+            values += [0.0] * (5 - len(values))
+        if values:
+            rows.append(values)
+    return np.array(rows, dtype=np.float64).reshape(-1, 5)
+
+
+def _task_stats(folder):
+    """Counts the images of a task and reads all its label files in one pass."""
+    images_dir, labels_dir = folder / "images", folder / "labels"
+    images = sum(1 for entry in os.scandir(images_dir) if entry.is_file()) if images_dir.is_dir() else 0
+    texts = []
+    if labels_dir.is_dir():
+        for entry in os.scandir(labels_dir):
+            if entry.name.endswith(".txt"):
+                with open(entry.path) as f:
+                    texts.append(f.read())
+    return images, _parse_labels("\n".join(texts))
+
+
+class TaskStatistics:
+    """
+    Per-task label statistics of a dataset in the data-extraction/cvat layout.
+
+    Attributes:
+        tasks (list[Path]): Task folders, in row order.
+        images (np.ndarray): Number of images per task, shape (tasks,).
+        boxes (np.ndarray): Number of boxes per task and class, shape (tasks, classes).
+        sizes (np.ndarray): Number of small, medium and large boxes per task, shape (tasks, 3).
+    """
+
+    def __init__(self, tasks, images, boxes, sizes):
+        self.tasks = tasks
+        self.images = images
+        self.boxes = boxes
+        self.sizes = sizes
+
+    @classmethod
+    def collect(cls, input_folder, workers=8):
+        """
+        Reads the label files of every task once.
+
+        Args:
+            input_folder (str or Path): Dataset with one folder (images, labels) per task.
+            workers (int): Number of threads reading the tasks.
+
+        Returns:
+            TaskStatistics: The statistics table.
+        """
+        tasks = sorted(folder for folder in Path(input_folder).iterdir() if folder.is_dir())
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(_task_stats, tasks))
+
+        num_classes = max((int(labels[:, 0].max()) + 1 for _, labels in results if len(labels)), default=0)
+        images = np.array([count for count, _ in results], dtype=np.int64)
+        boxes = np.zeros((len(tasks), num_classes), dtype=np.int64)
+        sizes = np.zeros((len(tasks), 3), dtype=np.int64)
+        for row, (_, labels) in enumerate(results):
+            boxes[row] = np.bincount(labels[:, 0].astype(int), minlength=num_classes)
+            buckets = np.searchsorted(BOX_SIZE_LIMITS, labels[:, 3] * labels[:, 4])
+            sizes[row] = np.bincount(buckets, minlength=3)
+        return cls(tasks, images, boxes, sizes)
+
+    def table(self):
+        """Returns the columns the split is balanced on: images and boxes per class, shape (tasks, 1 + classes)."""
+        return np.column_stack([self.images, self.boxes])
+
+
+def solve_split(table, ratios, seed=42, restarts=4, max_moves=10000):
+    """
+    Assigns whole tasks to subsets so that every column is split close to the target ratios.
+
+    The cost is the squared deviation of each subset's column totals from their targets,
+    relative to the column total, summed over columns. A greedy pass places the tasks, largest
+    first, where they reduce the cost most; then the single task move with the largest gain is
+    applied until no move helps. The gain of every task/subset move is computed at once with
+    array operations, so a pass over thousands of tasks takes milliseconds. The best of
+    `restarts` randomized runs is kept.
+
+    Args:
+        table (np.ndarray): Counts per task and column, shape (tasks, columns).
+        ratios (tuple): Target fraction of each subset.
+        seed (int): Random seed of the task order tie-breaking.
+        restarts (int): Number of randomized runs.
+        max_moves (int): Maximum number of improving moves per run.
+
+    Returns:
+        np.ndarray: Subset index of every task; empty for an empty table.
+    """
+    table = np.asarray(table, dtype=np.float64)
+    if len(table) == 0:
+        return np.zeros(0, dtype=np.int64)
+    ratios = np.asarray(ratios, dtype=np.float64)
+    totals = table.sum(axis=0)
+    scale = np.where(totals > 0, totals, 1.0)
+    # Columns relative to their total, so that images and rare classes weigh the same
+    weights = table / scale
+    targets = np.outer(ratios, np.ones(table.shape[1]))
+    rng = np.random.default_rng(seed)
+    tasks = len(table)
+
+    best, best_cost = None, None
+    for _ in range(restarts):
+        assignment = np.zeros(tasks, dtype=np.int64)
+        sums = np.zeros_like(targets)
+        order = rng.permutation(tasks)
+        order = order[np.argsort(-weights[order].sum(axis=1), kind="stable")]
+        for task in order:
+            # Cost of the subsets after adding the task to each one of them
+            deviation = sums + weights[task] - targets
+            gains = (deviation ** 2).sum(axis=1) - ((sums - targets) ** 2).sum(axis=1)
+            gains[ratios == 0] = np.inf
+            subset = int(np.argmin(gains))
+            assignment[task] = subset
+            sums[subset] += weights[task]
+
+        for _ in range(max_moves):
+            # Change of cost for moving every task from its subset to every other subset
+            current = sums[assignment]
+            removed = ((current - weights - targets[assignment]) ** 2).sum(axis=1) - (
+                (current - targets[assignment]) ** 2
+            ).sum(axis=1)
+            added = ((sums[None, :, :] + weights[:, None, :] - targets[None]) ** 2).sum(axis=2) - (
+                (sums - targets) ** 2
+            ).sum(axis=1)[None, :]
+            delta = removed[:, None] + added
+            delta[np.arange(tasks), assignment] = np.inf
+            delta[:, ratios == 0] = np.inf
+            task, subset = np.unravel_index(np.argmin(delta), delta.shape)
+            if delta[task, subset] >= -1e-12:
+                break
+            sums[assignment[task]] -= weights[task]
+            sums[subset] += weights[task]
+            assignment[task] = subset
+
+        cost = ((sums - targets) ** 2).sum()
+        if best_cost is None or cost < best_cost:
+            best, best_cost = assignment, cost
+    return best
+
 
 class DatasetSplitter:
     """
@@ -58,45 +225,155 @@ class DatasetSplitter:
 
         self.train_ratio, self.val_ratio, self.test_ratio = ratio
 
-    def split(self):
+    def split(self, stratified=False, workers=8, mode="copy", overwrite=False):
         """
         Splits the dataset into training, validation, and testing subsets.
 
-        This method randomly shuffles the top-level folders in the input dataset and
-        splits them into three subsets based on the specified ratios.
+        By default this method randomly shuffles the top-level folders in the input dataset
+        and splits them into three subsets based on the specified ratios.
+
+        With `stratified=True` the YOLO label files are read once to build per-task statistics,
+        and whole tasks are assigned so that both the image count and the box count of every
+        class follow the ratios (see `solve_split`).
+
+        `mode` selects how the subsets are written:
+            - "copy": every file is copied, in parallel over `workers` threads;
+            - "hardlink" / "reflink": the same tree of hard links or copy-on-write clones,
+              which takes no extra disk space (falls back to a copy where unsupported);
+            - "symlink": one symbolic link per task folder;
+            - "manifest": nothing is copied, `train.txt`, `val.txt` and `test.txt` list the
+              absolute image paths and can be used directly in an Ultralytics dataset YAML.
+
+        Args:
+            stratified (bool): Whether to balance images and classes instead of folder counts.
+            workers (int): Number of threads reading the label files and copying the files.
+            mode (str): "copy", "hardlink", "reflink", "symlink" or "manifest".
+            overwrite (bool): Whether to delete existing train/val/test folders first. Without it a
+                split is refused when one of them is not empty, since merging into an earlier split
+                would put the same task into several subsets.
+
+        Raises:
+            ValueError: If the mode is unknown or a subset folder is not empty.
         """
-        all_folders = [folder for folder in self.input_folder.iterdir() if folder.is_dir()]
+        if mode not in SPLIT_MODES:
+            raise ValueError(f"Unknown split mode: {mode}. Use one of {SPLIT_MODES}.")
+        if mode != "manifest":
+            self._prepare_subset_folders(overwrite)
+        if stratified:
+            train_folders, val_folders, test_folders = self._stratified_split(workers)
+        else:
+            all_folders = [folder for folder in self.input_folder.iterdir() if folder.is_dir()]
 
-        random.seed(self.seed)
-        random.shuffle(all_folders)
+            random.seed(self.seed)
+            random.shuffle(all_folders)
 
-        total = len(all_folders)
-        train_split = int(total * self.train_ratio)
-        val_split = train_split + int(total * self.val_ratio)
+            total = len(all_folders)
+            train_split = int(total * self.train_ratio)
+            val_split = train_split + int(total * self.val_ratio)
 
-        train_folders = all_folders[:train_split]
-        val_folders = all_folders[train_split:val_split]
-        test_folders = all_folders[val_split:]
+            train_folders = all_folders[:train_split]
+            val_folders = all_folders[train_split:val_split]
+            test_folders = all_folders[val_split:]
 
-        with ThreadPoolExecutor(max_workers=3) as executor:
-            executor.submit(self._copy_folders, train_folders, self.output_folder / "train")
-            executor.submit(self._copy_folders, val_folders, self.output_folder / "val")
-            executor.submit(self._copy_folders, test_folders, self.output_folder / "test")
+        subsets = dict(zip(SUBSETS, (train_folders, val_folders, test_folders)))
+        if mode == "manifest":
+            self._write_manifests(subsets)
+        elif mode == "symlink":
+            self._link_folders(subsets)
+        else:
+            self._transfer_folders(subsets, mode, workers)
 
         print("Dataset successfully shuffled and split!")
         print(f"Training set: {len(train_folders)} folders")
         print(f"Validation set: {len(val_folders)} folders")
         print(f"Test set: {len(test_folders)} folders")
 
-    @staticmethod
-    def _copy_folders(folders, target_folder):
+    def _stratified_split(self, workers):
+        """
+        Solves a label-aware split of the tasks and prints how close it is to the ratios.
+
+        Returns:
+            tuple[list[Path]]: Train, validation and test task folders.
+        """
+        stats = TaskStatistics.collect(self.input_folder, workers)
+        ratios = (self.train_ratio, self.val_ratio, self.test_ratio)
+        assignment = solve_split(stats.table(), ratios, self.seed)
+
+        print("Subset shares (target / images / boxes per class / small, medium, large boxes):")
+        for index, name in enumerate(SUBSETS):
+            mask = assignment == index
+            shares = [
+                stats.images[mask].sum() / max(stats.images.sum(), 1),
+                *(stats.boxes[mask].sum(axis=0) / np.maximum(stats.boxes.sum(axis=0), 1)),
+            ]
+            sizes = stats.sizes[mask].sum(axis=0) / np.maximum(stats.sizes.sum(axis=0), 1)
+            print(
+                f"  {name:<5} {ratios[index]:.2f} / " + " ".join(f"{share:.2f}" for share in shares)
+                + " / " + " ".join(f"{share:.2f}" for share in sizes)
+            )
+        return tuple([task for task, subset in zip(stats.tasks, assignment) if subset == index] for index in range(3))
+
+    def _prepare_subset_folders(self, overwrite):
+        """
+        Makes sure the train/val/test folders are empty, deleting them with `overwrite`.
+
+        Raises:
+            ValueError: If a subset folder is not empty and `overwrite` is not set.
+        """
+        for name in SUBSETS:
+            folder = self.output_folder / name
+            if folder.is_symlink() or not folder.exists():
+                continue
+            if any(folder.iterdir()):
+                if not overwrite:
+                    raise ValueError(f"{folder} is not empty; use overwrite=True to replace the previous split.")
+                # Links are removed, not followed, so the source dataset is left untouched
+                shutil.rmtree(folder)
+
+    def _write_manifests(self, subsets):
+        """
+        Writes one list file of absolute image paths per subset.
+
+        Args:
+            subsets (dict): Subset name -> task folders.
+        """
+        for name, folders in subsets.items():
+            lines = [
+                str((folder / "images" / entry.name).resolve())
+                for folder in folders if (folder / "images").is_dir()
+                for entry in sorted(os.scandir(folder / "images"), key=lambda entry: entry.name) if entry.is_file()
+            ]
+            path = self.output_folder / f"{name}.txt"
+            path.write_text("".join(line + "\n" for line in lines))
+            print(f"{path}: {len(lines)} images")
+
+    def _link_folders(self, subsets):
+        """
+        Links every task folder into its subset folder.
+
+        Args:
+            subsets (dict): Subset name -> task folders.
+        """
+        for name, folders in subsets.items():
+            target_folder = self.output_folder / name
+            target_folder.mkdir(parents=True, exist_ok=True)
+            for folder in folders:
+                (target_folder / folder.name).symlink_to(folder.resolve(), target_is_directory=True)
+
+    def _transfer_folders(self, subsets, mode, workers):
         """
-        Copies a list of folders to the target directory.
+        Copies or links every file of the task folders into their subset folders.
 
         Args:
-            folders (list[Path]): List of folder paths to copy.
-            target_folder (Path): Destination directory for the folders.
+            subsets (dict): Subset name -> task folders.
+            mode (str): "copy", "hardlink" or "reflink".
+            workers (int): Number of threads.
         """
-        target_folder.mkdir(parents=True, exist_ok=True)
-        for folder in folders:
-            shutil.copytree(folder, target_folder / folder.name)
+        manifest = []
+        for name, folders in subsets.items():
+            for folder in folders:
+                for root, _, files in os.walk(folder):
+                    target = self.output_folder / name / folder.name / Path(root).relative_to(folder)
+                    manifest.extend((os.path.join(root, file), str(target / file)) for file in files)
+        used = transfer_files(manifest, mode, workers, desc="Writing subsets")
+        print(f"Files written: {len(manifest)} ({', '.join(f'{key}: {count}' for key, count in used.items())})")
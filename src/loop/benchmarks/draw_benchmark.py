@@ -0,0 +1,99 @@
+"""
+Microbenchmark of the in-place box renderer against the previous full-frame blend.
+
+Run from the repository root:
+
+    python -m src.loop.benchmarks.draw_benchmark --repeat 50
+
+Running the file directly (`python src/loop/benchmarks/draw_benchmark.py`) works as well.
+"""
+import argparse
+import os
+import sys
+import time
+
+import cv2
+import numpy as np
+
+if __package__ in (None, ""):
+    # Run as a script: make the repository root importable, as `python -m` does
+    sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", "..")))
+
+from src.loop.utils.draw import BoxRenderer
+
+RESOLUTIONS = {"1080p": (1920, 1080), "4K": (3840, 2160)}
+BOX_COUNTS = (0, 10, 200)
+CLASSES = {
+    0: {"color": (255, 255, 0), "tag": "Multicopter"},
+    1: {"color": (255, 0, 255), "tag": "Wing"},
+    2: {"color": (0, 255, 255), "tag": "XWing"},
+}
+
+
+def draw_boxes_full_blend(frame, boxes, class_ids, scores, classes):
+    """Reference: the previous renderer, copying the frame and blending the whole overlay."""
+    overlay = frame.copy()
+    for box, class_id, score in zip(boxes, class_ids, scores):
+        x_min, y_min, x_max, y_max = map(int, box)
+        class_info = classes.get(class_id, {"color": (0, 255, 0), "tag": f"Class {class_id}"})
+        color = class_info["color"]
+        cv2.rectangle(overlay, (x_min, y_min), (x_max, y_max), color, thickness=3)
+        label = f"{class_info['tag']}: {score:.2f}"
+        (text_width, text_height), _ = cv2.getTextSize(label, cv2.FONT_HERSHEY_SIMPLEX, 0.6, 2)
+        cv2.rectangle(overlay, (x_min, max(y_min - text_height - 10, 0)), (x_min + text_width + 10, y_min), color, -1)
+        cv2.putText(overlay, label, (x_min + 5, y_min - 5), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255), 2, cv2.LINE_AA)
+    return cv2.addWeighted(overlay, 0.7, frame, 0.3, 0)
+
+
+def random_detections(count, width, height, rng):
+    """Random boxes of drone-like sizes with random classes and scores."""
+    sizes = rng.uniform(10, 120, size=(count, 2))
+    corners = rng.uniform(0, 1, size=(count, 2)) * ([width, height] - sizes)
+    boxes = np.hstack([corners, corners + sizes]).astype(np.float32)
+    return boxes, rng.integers(0, 3, size=count), rng.uniform(0.2, 1.0, size=count).astype(np.float32)
+
+
+def benchmark(renderer, frame, detections, repeat):
+    """
+    Average milliseconds of one call, the frame copy of the caller included for the reference.
+
+    The in-place renderer changes the frame it draws on, so every call gets the original
+    frame restored into a working buffer first, outside the timed section.
+    """
+    boxes, class_ids, scores = detections
+    work = frame.copy()
+    renderer(work, boxes, class_ids, scores, CLASSES)
+    total = 0.0
+    for _ in range(repeat):
+        np.copyto(work, frame)
+        start = time.perf_counter()
+        renderer(work, boxes, class_ids, scores, CLASSES)
+        total += time.perf_counter() - start
+    return total / repeat * 1000
+
+
+def main(repeat=50, seed=0):
+    """
+    Times the in-place renderer against the full-frame blend for 0, 10 and 200 boxes at 1080p and 4K.
+
+    Args:
+        repeat (int, optional): Calls per measurement. Defaults to 50.
+        seed (int, optional): Seed of the random detections. Defaults to 0.
+    """
+    rng = np.random.default_rng(seed)
+    print(f"{'resolution':<11}{'boxes':>6}{'full blend, ms':>16}{'in place, ms':>14}{'speedup':>9}")
+    for name, (width, height) in RESOLUTIONS.items():
+        frame = rng.integers(0, 255, size=(height, width, 3), dtype=np.uint8)
+        for count in BOX_COUNTS:
+            detections = random_detections(count, width, height, rng)
+            reference = benchmark(lambda f, *a: draw_boxes_full_blend(f.copy(), *a), frame, detections, repeat)
+            in_place = benchmark(BoxRenderer().draw, frame, detections, repeat)
+            print(f"{name:<11}{count:>6}{reference:>16.3f}{in_place:>14.3f}{reference / in_place:>8.1f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Microbenchmark of the box renderer.")
+    parser.add_argument("--repeat", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    main(args.repeat, args.seed)
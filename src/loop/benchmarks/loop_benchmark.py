@@ -0,0 +1,313 @@
+"""
+Benchmark of `run_tracking` on reproducible synthetic videos.
+
+Run from the repository root:
+
+    python -m src.loop.benchmarks.loop_benchmark --output results.json --baseline previous.json
+
+Running the file directly (`python src/loop/benchmarks/loop_benchmark.py`) works as well.
+"""
+import argparse
+import contextlib
+import io
+import json
+import multiprocessing
+import os
+import platform
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+import cv2
+import numpy as np
+
+if __package__ in (None, ""):
+    # Run as a script: make the repository root importable, as `python -m` does
+    sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", "..")))
+
+from src.loop.tests.stubs import Result
+
+RESOLUTIONS = {"720p": (1280, 720), "1080p": (1920, 1080), "4K": (3840, 2160)}
+
+# Every config runs `run_tracking` on the synthetic video of its resolution; all keys except
+# "name" and "resolution" are passed to `run_tracking`. A "video_sink" also enables the output.
+DEFAULT_CONFIGS = [
+    {"name": "720p", "resolution": "720p"},
+    {"name": "720p_batch4", "resolution": "720p", "batch_size": 4},
+    {"name": "720p_batch4_pipelined", "resolution": "720p", "batch_size": 4, "pipelined": True},
+    {"name": "1080p", "resolution": "1080p"},
+    {"name": "4K", "resolution": "4K"},
+    {"name": "4K_ingest640", "resolution": "4K", "ingest_size": 640},
+    {"name": "720p_sink_xvid", "resolution": "720p", "video_sink": "xvid"},
+    {"name": "720p_sink_mjpeg", "resolution": "720p", "video_sink": "mjpeg"},
+    {"name": "720p_sink_images", "resolution": "720p", "video_sink": "images"},
+    {"name": "720p_sink_h264", "resolution": "720p", "video_sink": "h264"},
+]
+
+# Metrics compared against the baseline and whether a higher value is better
+COMPARED_METRICS = {"fps": True, "latency_p95_ms": False, "peak_rss_mb": False}
+
+
+class StandInDetector:
+    """
+    Deterministic detector with the `predict` interface of YOLO, used instead of real weights.
+
+    Like YOLO it scales every frame down to `imgsz` and runs a fixed amount of per-pixel work
+    on it (`layers` filter passes), then reports the dark blobs of the synthetic video as
+    drones. Its cost depends on the inference size only, like a real network.
+
+    Args:
+        imgsz (int, optional): Inference size. Defaults to 640.
+        layers (int, optional): Number of filter passes per frame. Defaults to 8.
+    """
+
+    def __init__(self, imgsz=640, layers=8):
+        self.imgsz = imgsz
+        self.layers = layers
+
+    def predict(self, source, imgsz=None, **kwargs):
+        frames = source if isinstance(source, list) else [source]
+        results = []
+        for frame in frames:
+            scale = (imgsz or self.imgsz) / max(frame.shape[:2])
+            small = cv2.resize(frame, None, fx=scale, fy=scale, interpolation=cv2.INTER_LINEAR)
+            gray = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+            features = gray.astype(np.float32)
+            for _ in range(self.layers):
+                features = cv2.GaussianBlur(features, (5, 5), 0)
+            _, mask = cv2.threshold(gray, 80, 255, cv2.THRESH_BINARY_INV)
+            count, _, stats, _ = cv2.connectedComponentsWithStats(mask)
+            blobs = stats[1:count]
+            boxes = np.column_stack([blobs[:, 0], blobs[:, 1], blobs[:, 0] + blobs[:, 2], blobs[:, 1] + blobs[:, 3]])
+            boxes = boxes.astype(np.float32).reshape(-1, 4) / scale
+            results.append(Result(boxes))
+        return results
+
+    def __call__(self, source, **kwargs):
+        return self.predict(source, **kwargs)
+
+
+def make_synthetic_video(path, width, height, frames=120, fps=30, drones=5, seed=0):
+    """
+    Writes a reproducible video of small dark drones flying over a noisy sky gradient.
+
+    Args:
+        path (str): Path of the `.avi` file.
+        width (int): Width of the frames.
+        height (int): Height of the frames.
+        frames (int, optional): Number of frames. Defaults to 120.
+        fps (int, optional): Frame rate. Defaults to 30.
+        drones (int, optional): Number of drones. Defaults to 5.
+        seed (int, optional): Seed of the drone paths and noise. Defaults to 0.
+    """
+    rng = np.random.default_rng(seed)
+    sky = np.empty((height, width, 3), dtype=np.uint8)
+    sky[:] = np.linspace(235, 150, height, dtype=np.uint8)[:, None, None]
+    sizes = rng.integers(max(height // 100, 4), max(height // 25, 8), size=drones)
+    starts = rng.uniform(0, 1, size=(drones, 2)) * (width, height)
+    velocities = rng.uniform(-1, 1, size=(drones, 2)) * (width, height) / frames
+
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"MJPG"), fps, (width, height))
+    for index in range(frames):
+        frame = sky + rng.integers(0, 12, size=(height, width, 1), dtype=np.uint8)
+        positions = (starts + velocities * index) % (width, height)
+        for (x, y), size in zip(positions.astype(int), sizes):
+            cv2.rectangle(frame, (x, y), (x + int(size), y + int(size) // 2), (40, 40, 40), -1)
+        writer.write(frame)
+    writer.release()
+
+
+def _run_config(config, video, weights):
+    """Runs one config in a fresh process and measures it."""
+    from src.loop.main_loop import run_tracking
+    from src.loop.utils.profiler import peak_rss_mb
+
+    options = {key: value for key, value in config.items() if key not in ("name", "resolution")}
+    output_dir = tempfile.mkdtemp(prefix="loop_benchmark_") if "video_sink" in options else None
+    model = weights or StandInDetector()
+    try:
+        wall_start, cpu_start = time.perf_counter(), time.process_time()
+        with contextlib.redirect_stdout(io.StringIO()) as log:
+            profiler = run_tracking(model, video=video, output_dir=output_dir, **options)
+        wall, cpu = time.perf_counter() - wall_start, time.process_time() - cpu_start
+    finally:
+        if output_dir:
+            shutil.rmtree(output_dir, ignore_errors=True)
+    if profiler is None:
+        return {"error": log.getvalue().strip().splitlines()[-1] if log.getvalue().strip() else "run failed"}
+
+    p50, p95, p99 = profiler.latency.percentiles() * 1000
+    return {
+        "frames": profiler.latency.count,
+        "fps": profiler.latency.count / wall,
+        "latency_p50_ms": p50,
+        "latency_p95_ms": p95,
+        "latency_p99_ms": p99,
+        "cpu_percent": cpu / wall * 100,
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+
+def _median_run(runs):
+    """Combines repeated runs of a config into the median of every metric."""
+    errors = [run for run in runs if "error" in run]
+    if errors:
+        return errors[0]
+    return {key: statistics.median(run[key] for run in runs) for key in runs[0] if runs[0][key] is not None}
+
+
+def run_benchmark(configs=None, frames=120, repeat=1, weights=None, work_dir=None, seed=0):
+    """
+    Runs `run_tracking` in every config and measures throughput, latency, CPU and memory.
+
+    Every run happens in a fresh process so the peak memory of one config does not leak into
+    the next, and the synthetic videos are written by child processes too. Peak memory is the
+    high-water mark of the run's own address space. Frame latency is decode-to-detection; CPU
+    utilization is the CPU time of the process in percent of one core (external `ffmpeg`
+    encoders are not included).
+
+    Args:
+        configs (list[dict], optional): Configs to run. Defaults to `DEFAULT_CONFIGS`.
+        frames (int, optional): Length of the synthetic videos. Defaults to 120.
+        repeat (int, optional): Runs per config; the median is reported. Defaults to 1.
+        weights (str, optional): YOLO weights; the stand-in detector is used without. Defaults to None.
+        work_dir (str, optional): Directory of the synthetic videos. Defaults to a temporary one.
+        seed (int, optional): Seed of the synthetic videos. Defaults to 0.
+
+    Returns:
+        dict: Environment information under "meta" and the metrics of every config under "results".
+    """
+    configs = configs or DEFAULT_CONFIGS
+    temporary = work_dir is None
+    work_dir = work_dir or tempfile.mkdtemp(prefix="loop_benchmark_")
+    os.makedirs(work_dir, exist_ok=True)
+
+    results = {}
+    context = multiprocessing.get_context("spawn")
+    for config in configs:
+        name = config["name"]
+        if config.get("video_sink") in ("h264", "h265") and shutil.which("ffmpeg") is None:
+            results[name] = {"skipped": "ffmpeg not found"}
+            print(f"{name:<26} skipped (ffmpeg not found)")
+            continue
+
+        width, height = RESOLUTIONS[config.get("resolution", "720p")]
+        video = os.path.join(work_dir, f"synthetic_{width}x{height}_{frames}_{seed}.avi")
+        if not os.path.exists(video):
+            # Built in a child process so the 4K frames do not grow the parent that spawns the runs
+            writer = context.Process(target=make_synthetic_video, args=(video, width, height, frames), kwargs={"seed": seed})
+            writer.start()
+            writer.join()
+
+        runs = []
+        for _ in range(repeat):
+            with context.Pool(1) as pool:
+                runs.append(pool.apply(_run_config, (config, video, weights)))
+        results[name] = _median_run(runs)
+        print(format_result(name, results[name]))
+    if temporary:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    meta = {
+        "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "platform": platform.platform(),
+        "python": platform.python_version(),
+        "opencv": cv2.__version__,
+        "cpu_count": os.cpu_count(),
+        "frames": frames,
+        "repeat": repeat,
+        "model": weights or "stand-in",
+    }
+    return {"meta": meta, "results": results}
+
+
+def format_result(name, result):
+    """Formats the metrics of one config as a table row."""
+    if "error" in result or "skipped" in result:
+        return f"{name:<26} {result.get('error') or 'skipped: ' + result['skipped']}"
+    rss = f"{result['peak_rss_mb']:8.0f}" if "peak_rss_mb" in result else f"{'n/a':>8}"
+    return (
+        f"{name:<26} fps={result['fps']:7.1f} p50={result['latency_p50_ms']:7.1f}ms "
+        f"p95={result['latency_p95_ms']:7.1f}ms p99={result['latency_p99_ms']:7.1f}ms "
+        f"cpu={result['cpu_percent']:5.0f}% rss={rss}MB"
+    )
+
+
+def compare_results(results, baseline, threshold=0.1):
+    """
+    Compares benchmark results with a baseline and lists the regressions.
+
+    A regression is a compared metric (fps, p95 latency, peak RSS) of a config present in both
+    that got worse by more than `threshold` (relative).
+
+    Args:
+        results (dict): Output of `run_benchmark`.
+        baseline (dict): Output of an earlier `run_benchmark`.
+        threshold (float, optional): Allowed relative change. Defaults to 0.1.
+
+    Returns:
+        list[dict]: Config, metric, baseline and current value and relative change of every regression.
+    """
+    regressions = []
+    for name, current in results["results"].items():
+        previous = baseline["results"].get(name)
+        if not previous:
+            continue
+        for metric, higher_is_better in COMPARED_METRICS.items():
+            if not previous.get(metric) or current.get(metric) is None:
+                continue
+            change = (current[metric] - previous[metric]) / previous[metric]
+            if (-change if higher_is_better else change) > threshold:
+                regressions.append({
+                    "config": name,
+                    "metric": metric,
+                    "baseline": previous[metric],
+                    "current": current[metric],
+                    "change": change,
+                })
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark of run_tracking on synthetic video.")
+    parser.add_argument("--output", default="loop_benchmark.json", help="Results file to write.")
+    parser.add_argument("--baseline", help="Results file of an earlier run to compare with.")
+    parser.add_argument("--threshold", type=float, default=0.1, help="Allowed relative regression.")
+    parser.add_argument("--frames", type=int, default=120)
+    parser.add_argument("--repeat", type=int, default=1)
+    parser.add_argument("--weights", help="YOLO weights to use instead of the stand-in detector.")
+    parser.add_argument("--backends", nargs="*", default=[], help="Extra backends to run with --weights.")
+    parser.add_argument("--calibration-data", help="Dataset yaml for the openvino-int8 backend.")
+    parser.add_argument("--visualize", action="store_true", help="Add a config with visualize on (needs a display).")
+    parser.add_argument("--only", nargs="*", help="Names of the configs to run.")
+    args = parser.parse_args()
+
+    configs = list(DEFAULT_CONFIGS)
+    if args.visualize:
+        configs.append({"name": "720p_visualize", "resolution": "720p", "visualize": True})
+    if args.weights:
+        configs += [
+            {"name": f"720p_{backend}", "resolution": "720p", "backend": backend, "calibration_data": args.calibration_data}
+            for backend in args.backends
+        ]
+    if args.only:
+        configs = [config for config in configs if config["name"] in args.only]
+
+    report = run_benchmark(configs, args.frames, args.repeat, args.weights)
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Results saved to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare_results(report, json.load(f), args.threshold)
+        for regression in regressions:
+            print(
+                f"REGRESSION {regression['config']} {regression['metric']}: "
+                f"{regression['baseline']:.2f} -> {regression['current']:.2f} ({regression['change']:+.0%})"
+            )
+        if regressions:
+            sys.exit(1)
+        print(f"No regressions beyond {args.threshold:.0%} against {args.baseline}")
@@ -0,0 +1,99 @@
+import argparse
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import cv2
+
+BOUNDARY = "frame"
+
+
+def _encode_video(video, quality):
+    """Encodes every frame of the video to JPEG and returns the frames and the frame rate."""
+    cap = cv2.VideoCapture(video)
+    if not cap.isOpened():
+        raise ValueError(f"Unable to open video: {video}")
+    fps = cap.get(cv2.CAP_PROP_FPS) or 30
+    frames = []
+    while True:
+        ret_val, frame = cap.read()
+        if not ret_val:
+            break
+        frames.append(cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, quality])[1].tobytes())
+    cap.release()
+    return frames, fps
+
+
+def _make_handler(frames, fps, loop):
+    class MjpegHandler(BaseHTTPRequestHandler):
+        """Streams the frames as multipart MJPEG at the frame rate, every client from the start."""
+
+        def do_GET(self):
+            self.send_response(200)
+            self.send_header("Content-Type", f"multipart/x-mixed-replace; boundary={BOUNDARY}")
+            self.end_headers()
+            interval = 1 / fps
+            next_frame = time.perf_counter()
+            index = 0
+            try:
+                while index < len(frames):
+                    jpeg = frames[index]
+                    index = (index + 1) % len(frames) if loop else index + 1
+                    # Pace the stream like a camera: frames are sent at the frame rate, not as fast as possible
+                    next_frame += interval
+                    time.sleep(max(next_frame - time.perf_counter(), 0))
+                    self.wfile.write(
+                        f"--{BOUNDARY}\r\nContent-Type: image/jpeg\r\nContent-Length: {len(jpeg)}\r\n\r\n".encode()
+                    )
+                    self.wfile.write(jpeg)
+                    self.wfile.write(b"\r\n")
+            except (BrokenPipeError, ConnectionResetError):
+                pass
+
+        def log_message(self, format, *args):
+            pass
+
+    return MjpegHandler
+
+
+def serve_video(video, host="127.0.0.1", port=8554, fps=None, loop=False, quality=90):
+    """
+    Serves a video file as a live MJPEG-over-HTTP stream, a local stand-in for a camera.
+
+    The stream is available at `http://<host>:<port>/` and can be passed to
+    `run_tracking(stream=...)`. The frames are encoded up front, so the server does not
+    decode while a client in the same process opens the stream (OpenCV serializes opening
+    captures), which limits it to short test clips. The server runs on a daemon thread.
+
+    Args:
+        video (str): Path to the video file.
+        host (str, optional): Address to listen on. Defaults to "127.0.0.1".
+        port (int, optional): Port to listen on; 0 picks a free port. Defaults to 8554.
+        fps (float, optional): Frame rate of the stream. Defaults to None (the video frame rate).
+        loop (bool, optional): Whether to restart the video when it ends. Defaults to False.
+        quality (int, optional): JPEG quality of the frames. Defaults to 90.
+
+    Returns:
+        ThreadingHTTPServer: The running server; call `shutdown()` to stop it.
+    """
+    frames, video_fps = _encode_video(video, quality)
+    server = ThreadingHTTPServer((host, port), _make_handler(frames, fps or video_fps, loop))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="stream-server", daemon=True).start()
+    return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve a video file as a live MJPEG stream.")
+    parser.add_argument("video")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8554)
+    parser.add_argument("--fps", type=float, default=None)
+    parser.add_argument("--loop", action="store_true")
+    args = parser.parse_args()
+    server = serve_video(args.video, args.host, args.port, args.fps, args.loop)
+    print(f"Streaming {args.video} at http://{args.host}:{server.server_address[1]}/")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
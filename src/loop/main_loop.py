@@ -1,6 +1,162 @@
+import os
+import threading
+import time
+from contextlib import ExitStack
+from dataclasses import dataclass, replace
+from functools import partial
+
 import cv2
 from ultralytics import YOLO
-from src.loop.utils.process import get_frame_iterator, generate_output_name, create_output_writer, process_frame
+from src.loop.utils.backends import EXPORT_ARGS, calibration_id, load_backend, weights_path
+from src.loop.utils.detection_cache import DetectionCache, cache_namespace, file_digest, frame_digest
+from src.loop.utils.detection_sinks import open_detection_sink
+from src.loop.utils.display import DisplayThread
+from src.loop.utils.draw import BoxRenderer
+from src.loop.utils.ingest import IngestResizer
+from src.loop.utils.keyframes import KeyframeScheduler, BoxPropagator
+from src.loop.utils.roi import RoiDetector
+from src.loop.utils.tiling import TiledDetector
+from src.loop.utils.tracker import MultiObjectTracker
+from src.loop.utils.pipeline import StopPipeline, run_pipeline, format_stage_report
+from src.loop.utils.profiler import StageProfiler
+from src.loop.utils.quality import QualityController, quality_ladder
+from src.loop.utils.writers import open_video_writer
+from src.loop.utils.process import (
+    FramePacket,
+    get_frame_iterator,
+    generate_output_name,
+    detect_frames,
+    emit_frame,
+    iterate_batches,
+)
+
+# Frames waiting for the background video writer
+WRITE_QUEUE_SIZE = 32
+
+
+@dataclass
+class TrackingConfig:
+    """
+    Options of `run_tracking`, grouped by the part of the loop they control.
+
+    A config can be built once and reused for several sources; keyword arguments passed to
+    `run_tracking` override single fields of it.
+
+    Attributes:
+        pipelined (bool): Whether to run the stages concurrently. Defaults to False.
+        queue_size (int): Capacity of the queues between pipelined stages. Defaults to 8.
+        backpressure (str): What a stage does when the next queue is full: "block",
+            "drop_oldest" or "drop_newest". Only used with `pipelined=True`. Defaults to "block".
+        batch_size (int): Number of frames per predict call. Defaults to 1.
+        max_batch_wait (float): Maximum time in seconds to wait for a batch to fill, useful for
+            live sources. Defaults to None (wait for a full batch).
+
+        detect_stride (int): Maximum number of frames between detector runs. Defaults to 1.
+        scene_change_threshold (float): Scene change score in [0, 1] that triggers a detector
+            run before the stride is reached. Defaults to None.
+        motion_model (str): How boxes are carried between keyframes, "velocity" or "flow".
+            Defaults to "velocity".
+        track (bool): Whether to assign persistent track IDs to the detections. Defaults to False.
+        track_min_hits (int): Detector runs a track needs before it is shown. Defaults to 3.
+        track_max_age (int): Detector runs a track survives without a match. Defaults to 30.
+
+        tile_size (int): Side of the tiles in pixels; None disables tiling. Defaults to None.
+        tile_overlap (float): Fraction of a tile shared with its neighbour. Defaults to 0.2.
+        tile_full_frame (bool): Whether to add a full-frame pass to the tiles. Defaults to True.
+        tile_motion_threshold (int): Intensity change that marks a pixel as moving; tiles without
+            moving pixels are skipped. None runs every tile. Defaults to None.
+        roi (bool): Whether to run the detector only around moving regions. Defaults to False.
+        roi_crop_size (int): Side and inference size of the ROI crops. Defaults to 320.
+        backend (str): Inference backend: "torch", "onnx", "openvino" or "openvino-int8".
+            Defaults to "torch".
+        calibration_data (str): Dataset yaml used to calibrate the "openvino-int8" export.
+            Defaults to None.
+
+        detections_out (str): Path of the detections stream: `.jsonl`, `.parquet` or `.json`
+            (COCO results for `COCOEvalTool`). Defaults to None.
+        video_sink (str): Output format: "xvid", "mjpeg", "raw", "h264", "h265" or "images".
+            Defaults to "xvid".
+        video_encoder (str): FFmpeg encoder for "h264"/"h265", e.g. "h264_nvenc" for hardware
+            encoding. Defaults to None (libx264 / libx265).
+        encode_preset (str): FFmpeg encoder preset (x264 names), ignored by encoders without
+            presets such as VAAPI. Defaults to "veryfast".
+        output_fps (float): Frame rate of the output. Defaults to None (the source frame rate,
+            or 30 for frame directories).
+        async_write (bool): Whether to encode on a background thread. Defaults to True.
+        drop_output_frames (bool): Whether to drop frames instead of waiting when the encoder
+            falls behind. Only used with `async_write=True`. Defaults to False.
+        display_fps (float): Maximum refresh rate of the visualization window. Defaults to 30.
+
+        prefetch (int): Number of frames decoded ahead of the loop; 0 decodes on the loop
+            thread. Defaults to 8.
+        read_workers (int): Number of threads reading a directory of images. Defaults to 4.
+        ingest_size (int): Longest side of the frames the loop works on, normally the inference
+            size (e.g. 640). Defaults to None (full resolution).
+        full_resolution_output (bool): Whether to annotate and write the frames at the source
+            resolution when `ingest_size` is set. Defaults to False.
+        latest_only (bool): Whether to drop stale stream frames instead of queueing them.
+            Defaults to True.
+
+        profile (bool): Whether to print the per-stage latency report. Defaults to False.
+        profile_trace (str): Path of a Chrome trace JSON of the stage calls; enables profiling.
+            Defaults to None.
+        detection_cache (str): Path of the persistent detection cache file. Defaults to None.
+        detection_cache_mb (int): Size limit of the cache; least recently used entries are
+            evicted beyond it. Defaults to 512.
+        target_fps (float): Output frame rate the quality controller holds. Defaults to None.
+        latency_budget_ms (float): Mean per-frame latency the quality controller stays under.
+            Defaults to None.
+    """
+
+    # Scheduling
+    pipelined: bool = False
+    queue_size: int = 8
+    backpressure: str = "block"
+    batch_size: int = 1
+    max_batch_wait: float = None
+
+    # Keyframes and tracking
+    detect_stride: int = 1
+    scene_change_threshold: float = None
+    motion_model: str = "velocity"
+    track: bool = False
+    track_min_hits: int = 3
+    track_max_age: int = 30
+
+    # Detector
+    tile_size: int = None
+    tile_overlap: float = 0.2
+    tile_full_frame: bool = True
+    tile_motion_threshold: int = None
+    roi: bool = False
+    roi_crop_size: int = 320
+    backend: str = "torch"
+    calibration_data: str = None
+
+    # Outputs
+    detections_out: str = None
+    video_sink: str = "xvid"
+    video_encoder: str = None
+    encode_preset: str = "veryfast"
+    output_fps: float = None
+    async_write: bool = True
+    drop_output_frames: bool = False
+    display_fps: float = 30
+
+    # Input
+    prefetch: int = 8
+    read_workers: int = 4
+    ingest_size: int = None
+    full_resolution_output: bool = False
+    latest_only: bool = True
+
+    # Profiling, caching and quality control
+    profile: bool = False
+    profile_trace: str = None
+    detection_cache: str = None
+    detection_cache_mb: int = 512
+    target_fps: float = None
+    latency_budget_ms: float = None
 
 
 def run_tracking(
@@ -9,10 +165,93 @@ def run_tracking(
     frames_dir: str = None,
     output_dir: str = None,
     visualize=False,
-    classes=None
+    classes=None,
+    stream=None,
+    config: TrackingConfig = None,
+    **options,
 ):
     """
-    Tracks objects in the input video or frames and visualizes predictions.
+    Tracks objects in the input video, frames or live stream and visualizes predictions.
+
+    The options of the loop are the fields of `TrackingConfig`; they are passed as a `config`,
+    as keyword arguments, or both (keyword arguments override the fields of `config`).
+
+    The work is split into four stages: decode, infer, annotate and encode. By default the
+    stages run one after another for every frame. With `pipelined=True` each stage runs
+    on its own thread and the stages are connected by bounded queues, so decoding,
+    inference and encoding of neighbouring frames overlap. Frame order is kept in both modes.
+
+    Frames travel through the stages in batches of `batch_size`; the infer stage runs a
+    single predict call per batch and the results are split back out per frame.
+
+    With `detect_stride` > 1 (or a `scene_change_threshold`) the detector only runs on
+    keyframes; boxes on the frames in between are carried forward by `motion_model`, so the
+    output is still annotated on every frame.
+
+    With `track=True` the detections are passed through a multi-object tracker that assigns
+    persistent IDs, hides detections that do not persist for `track_min_hits` detector runs
+    and predicts the boxes on the frames between keyframes (`motion_model` is then unused).
+
+    With `tile_size` set, every frame is cut into overlapping tiles that are detected in one
+    batch, which keeps tiny distant drones from vanishing when the frame is downscaled.
+
+    With `roi=True` the detector only runs on crops around moving regions; frames without
+    motion reuse the previous detections, and detections away from the moving regions are
+    kept until the next full-frame pass. The ROI status of every detected frame is counted
+    in the profile report. Tiling and ROI inference are mutually exclusive.
+
+    `backend` selects the runtime of the detector: the PyTorch weights as they are, or an
+    ONNX Runtime / OpenVINO (FP32 or INT8) export of them (exported once next to the weights).
+    The INT8 export is calibrated on `calibration_data`.
+
+    Detections are not printed; with `detections_out` they are appended to a structured
+    stream (one row per detection with frame id, timestamp, box, class, score and track id)
+    that is written in batches.
+
+    The annotated output goes to `video_sink`: an XVID, MJPEG or uncompressed AVI through
+    OpenCV, H.264/H.265 through an `ffmpeg` pipe, or a numbered image sequence. The source
+    frame rate and resolution are kept, and by default frames are encoded on a background
+    thread behind a bounded queue.
+
+    With `prefetch` > 0 frames are decoded ahead on background threads; videos decode into a
+    ring of preallocated frames and image folders are read by `read_workers` threads.
+
+    With `ingest_size` set, frames are scaled once while decoding so that their longest side
+    matches the inference size (JPEG folders are decoded at reduced scale). The annotated
+    output is then written at that size unless `full_resolution_output=True`, which keeps the
+    decoded frames for the output only. Boxes in `detections_out` are always in source pixels.
+
+    A `stream` (RTSP/HTTP URL or camera index) is grabbed on a background thread that keeps
+    only the newest frame, so a slow detector skips frames instead of falling behind. The
+    glass-to-detection latency (grab to detection result) of every frame is stored in
+    `packet.meta["latency"]` and summarized at the end of a stream run.
+
+    With `profile=True` every stage (decode, preprocess, inference, postprocess, draw, encode,
+    display) is timed per frame and a report with p50/p95/p99, FPS and peak RSS is printed at
+    the end; `profile_trace` additionally writes a Chrome trace of all stage calls.
+
+    With `detection_cache` the detections of every detected frame are stored on disk, keyed by
+    the weights, the inference parameters and the frame (file hash plus index for videos,
+    pixel hash otherwise). A re-run that only changes drawing or output options skips
+    `model.predict` for every cached frame. The cache cannot be combined with ROI inference or
+    motion-gated tiles, whose detections depend on the frames before.
+
+    With `target_fps` or `latency_budget_ms` a quality controller watches the output rate and
+    the per-frame latency and trades quality for speed when a target is missed: it drops
+    tiling, raises the detection stride, lowers the inference size and raises the confidence
+    threshold one step at a time, and restores quality once there is headroom again. Every
+    adjustment is printed. Exported backends have a fixed inference size, so for them the
+    controller only adjusts tiling, the detection stride and the confidence threshold.
+
+    With `visualize=True` the annotated frames are shown by a display thread at up to
+    `display_fps`; it only draws the newest frame and skips the rest, so the window does not
+    slow down the loop. ESC stops the run. On macOS, where the window must belong to the main
+    thread, the frames are drawn on the main thread instead and a pipelined run moves its
+    stages to a worker thread.
+
+    Everything the run opens (detection cache, capture, frame reader, detections stream,
+    display thread, video writer and batch feeder) is closed in reverse order of opening,
+    also when a stage fails; the error is raised once everything is closed.
 
     Args:
         model (YOLO): YOLO model instance for object detection.
@@ -21,32 +260,341 @@ def run_tracking(
         output_dir (str, optional): Directory to save the processed video. Defaults to None.
         visualize (bool, optional): Whether to visualize the predictions in real-time. Defaults to False.
         classes (dict, optional): Dictionary containing class information (tags and colors). Defaults to None.
+        stream (str or int, optional): URL of a network stream or index of a camera. Defaults to None.
+        config (TrackingConfig, optional): Options of the loop. Defaults to None (the defaults
+            of `TrackingConfig`).
+        **options: Fields of `TrackingConfig` to override.
+
+    Returns:
+        StageProfiler: Timings of the run; the per-stage timings are only filled with profiling
+        enabled, the per-frame latency (`latency`) always. None if the run failed.
+
+    Raises:
+        TypeError: If an option is not a field of `TrackingConfig`.
     """
-    if visualize:
-        cv2.namedWindow("cam", cv2.WINDOW_NORMAL)
+    config = replace(config, **options) if config is not None else TrackingConfig(**options)
+    classes = classes or {}
 
     try:
-        frame_iterator, total_frames, cap = get_frame_iterator(video=video, frames_dir=frames_dir)
+        with ExitStack() as resources:
+            profiler, start = _track(model, video, frames_dir, output_dir, visualize, classes, stream, config, resources)
+    except ValueError as e:
+        print(e)
+        return None
+
+    # Measured after the writer is flushed, so encoding on the background thread is included
+    wall_time = time.perf_counter() - start
+    if profiler.enabled:
+        print(profiler.report(wall_time))
+    if config.profile_trace:
+        profiler.export_trace(config.profile_trace)
+        print(f"Stage trace saved to {config.profile_trace}")
+    return profiler
+
+
+def _run_beside_display(run, display):
+    """Calls `run` on a worker thread while the calling (main) thread draws the display; returns its result."""
+    outcome = {}
+
+    def target():
+        try:
+            outcome["result"] = run()
+        except BaseException as e:
+            outcome["error"] = e
+
+    worker = threading.Thread(target=target, name="pipeline", daemon=True)
+    worker.start()
+    display.run_until(lambda: not worker.is_alive())
+    worker.join()
+    if "error" in outcome:
+        raise outcome["error"]
+    return outcome["result"]
+
+
+def _track(model, video, frames_dir, output_dir, visualize, classes, stream, config, resources):
+    """
+    Runs the loop of `run_tracking`, registering the closing of everything it opens on `resources`.
+
+    Returns:
+        tuple: The profiler of the run and the time the frames started flowing.
+    """
+    if config.tile_size and config.roi:
+        raise ValueError("Tiled and ROI inference cannot be combined.")
+    # These detectors carry motion references and detections from frame to frame, so they must
+    # see every frame; a partial cache hit would leave their state on the wrong frame
+    if config.detection_cache and (config.roi or (config.tile_size and config.tile_motion_threshold is not None)):
+        raise ValueError("The detection cache cannot be combined with ROI inference or motion-gated tiles.")
+
+    cache = None
+    if config.detection_cache:
+        cache = DetectionCache(config.detection_cache, config.detection_cache_mb * 1024 * 1024)
+
+        def close_cache():
+            cache.close()
+            print(cache.summary())
+
+        resources.callback(close_cache)
+        # Everything that changes the detections of a frame, besides the frame itself
+        params = {
+            "backend": config.backend,
+            "tile": [config.tile_size, config.tile_overlap, config.tile_full_frame, config.tile_motion_threshold]
+            if config.tile_size else None,
+            "ingest_size": config.ingest_size,
+            "calibration": calibration_id(config.calibration_data)
+            if config.calibration_data and (EXPORT_ARGS.get(config.backend) or {}).get("int8") else None,
+        }
+        namespace = cache_namespace(file_digest(weights_path(model)), params, file_digest(video) if video else None)
+    model = load_backend(model, config.backend, data=config.calibration_data)
+
+    # Frames are annotated in place and handed on, so a ring slot may only be reused once
+    # no stage, queue or the background writer can still hold the frame decoded into it
+    batch_size = config.batch_size
+    in_flight_batches = 3 * config.queue_size + 4 if config.pipelined else 1
+    hold = batch_size * (in_flight_batches + 3) + (WRITE_QUEUE_SIZE + 1 if config.async_write else 0)
+    resizer = IngestResizer(config.ingest_size) if config.ingest_size else None
+    # A full-resolution output needs the full frames, so they are only reduced after decoding
+    keep_source_frames = resizer is not None and config.full_resolution_output and bool(output_dir)
+    frame_iterator, total_frames, cap = get_frame_iterator(
+        video=video,
+        frames_dir=frames_dir,
+        prefetch=config.prefetch,
+        hold=hold,
+        workers=config.read_workers,
+        resizer=None if keep_source_frames else resizer,
+        stream=stream,
+        latest_only=config.latest_only,
+    )
+    live_reader = stream is not None and config.latest_only
+    # The live reader releases its capture itself, possibly after its grabber is unblocked
+    if cap and not live_reader:
+        resources.callback(cap.release)
+
+    def close_reader():
+        frame_iterator.close()
+        if config.prefetch or live_reader:
+            print(frame_iterator.summary())
 
-        vid_writer = None
-        output_name = generate_output_name(video=video, frames_dir=frames_dir)
+    resources.callback(close_reader)
 
-        for frame_id, frame in enumerate(frame_iterator):
-            if vid_writer is None and output_dir:
-                height, width, _ = frame.shape
-                vid_writer = create_output_writer(output_dir, output_name, width, height)
+    vid_writer = None
+    output_name = os.path.splitext(generate_output_name(video=video, frames_dir=frames_dir, stream=stream))[0]
+    fps = config.output_fps or (cap.get(cv2.CAP_PROP_FPS) if cap else 0) or 30
+    scheduler = KeyframeScheduler(config.detect_stride, config.scene_change_threshold)
+    propagator = BoxPropagator(config.motion_model)
+    if config.tile_size:
+        detector = TiledDetector(
+            model, config.tile_size, config.tile_overlap, config.tile_full_frame, config.tile_motion_threshold
+        )
+    elif config.roi:
+        detector = RoiDetector(model, config.roi_crop_size)
+    else:
+        detector = partial(detect_frames, model=model)
+    quality = None
+    if config.target_fps or config.latency_budget_ms:
+        # Exported backends have the inference size baked in, so only the torch weights are resized;
+        # the stride may go up to twice the configured one so that a large stride still has rungs
+        ladder = quality_ladder(
+            config.detect_stride,
+            tiling=bool(config.tile_size),
+            min_imgsz=320 if config.backend == "torch" else 640,
+            max_stride=max(4, 2 * config.detect_stride),
+        )
+        latency_budget = config.latency_budget_ms / 1000 if config.latency_budget_ms else None
+        quality = QualityController(ladder, config.target_fps, latency_budget)
+    tracker = MultiObjectTracker(min_hits=config.track_min_hits, max_age=config.track_max_age) if config.track else None
 
-            if not process_frame(frame, model, classes, vid_writer, visualize):
-                break
+    detection_sink = None
+    if config.detections_out:
+        detection_sink = open_detection_sink(config.detections_out)
 
-        if cap:
-            cap.release()
+        def close_sink():
+            detection_sink.close()
+            print(f"Detections saved to {config.detections_out} ({detection_sink.rows} rows)")
 
-        if visualize:
-            cv2.destroyAllWindows()
+        resources.callback(close_sink)
+
+    display = None
+    if visualize:
+        display = DisplayThread(refresh_rate=config.display_fps)
+
+        def close_display():
+            display.close()
+            print(display.summary())
+
+        resources.callback(close_display)
+
+    def close_writer():
+        # The writer is opened with the first frame, so there may be none
         if vid_writer:
             vid_writer.release()
-            print(f"Processed video saved as {output_name} in {output_dir}")
+            print(vid_writer.summary())
 
-    except ValueError as e:
-        print(e)
+    resources.callback(close_writer)
+    renderer = BoxRenderer()
+    profiler = StageProfiler(enabled=config.profile or bool(config.profile_trace), trace=bool(config.profile_trace))
+
+    def read_packets():
+        frames = iter(frame_iterator)
+        while True:
+            start = time.perf_counter()
+            frame = next(frames, None)
+            if frame is None:
+                return
+            # The source index, so unreadable or dropped frames do not shift the later ids
+            frame_id = frame_iterator.frame_index
+            timestamp = frame_iterator.capture_time if live_reader else None
+            if keep_source_frames:
+                packet = FramePacket(frame_id, resizer.resize(frame), timestamp)
+                packet.source_frame = frame
+            else:
+                packet = FramePacket(frame_id, frame, timestamp)
+            profiler.record("decode", start, time.perf_counter())
+            yield packet
+
+    def select_detector():
+        """Returns the detector for the current quality level and the cache key suffix of the level."""
+        if quality is None:
+            return detector, ""
+        settings = quality.settings
+        base = quality.ladder[0]
+        # The stride does not change the detections of a frame, the other knobs do
+        knobs = (settings["imgsz"], settings["conf"], settings["tiling"])
+        suffix = "" if knobs == (base["imgsz"], base["conf"], base["tiling"]) else f":{knobs}"
+        if config.roi:
+            detector.imgsz, detector.predict_args = settings["imgsz"], {"conf": settings["conf"]}
+            return detector, suffix
+        if settings["tiling"]:
+            detector.predict_args = {"conf": settings["conf"]}
+            return detector, suffix
+        return partial(detect_frames, model=model, imgsz=settings["imgsz"], conf=settings["conf"]), suffix
+
+    def detect(keyframes):
+        """Detects the keyframes, looking them up in the cache first when there is one."""
+        run, suffix = select_detector()
+        if cache is None:
+            missing, results = keyframes, None
+        else:
+            keys = [
+                f"{namespace}{suffix}:{packet.frame_id if video else frame_digest(packet.frame)}"
+                for packet in keyframes
+            ]
+            results = [cache.get(key) for key in keys]
+            missing = [packet for packet, result in zip(keyframes, results) if result is None]
+        fresh = run([packet.frame for packet in missing]) if missing else []
+        if config.roi:
+            for packet, report in zip(missing, detector.last_reports):
+                packet.meta.update(report)
+                profiler.count(f"roi_{report['roi_status']}")
+        if results is None:
+            return fresh
+        fresh = iter(fresh)
+        for index, result in enumerate(results):
+            if result is None:
+                results[index] = next(fresh)
+                cache.put(keys[index], *results[index])
+        return results
+
+    def infer(batch):
+        if quality is not None:
+            scheduler.stride = quality.settings["stride"]
+        with profiler.span("preprocess", len(batch)):
+            for packet in batch:
+                packet.is_keyframe = scheduler.is_keyframe(packet.frame)
+            keyframes = [packet for packet in batch if packet.is_keyframe]
+        with profiler.span("inference", len(keyframes)):
+            detections = iter(detect(keyframes))
+
+        with profiler.span("postprocess", len(batch)):
+            for packet in batch:
+                if tracker is not None:
+                    if packet.is_keyframe:
+                        boxes, class_ids, scores, track_ids = tracker.update(*next(detections))
+                    else:
+                        boxes, class_ids, scores, track_ids = tracker.coast()
+                    packet.track_ids = track_ids
+                elif packet.is_keyframe:
+                    boxes, class_ids, scores = next(detections)
+                    propagator.update(packet.frame, boxes, class_ids, scores)
+                else:
+                    boxes, class_ids, scores = propagator.propagate(packet.frame)
+                packet.boxes, packet.class_ids, packet.scores = boxes, class_ids, scores
+                packet.meta["latency"] = time.time() - packet.timestamp
+        return batch
+
+    def annotate(batch):
+        with profiler.span("draw", len(batch)):
+            for packet in batch:
+                # The decoded frame is not needed afterwards, so it is annotated in place
+                if packet.source_frame is not None:
+                    frame, boxes = packet.source_frame, resizer.to_source(packet.boxes)
+                else:
+                    frame, boxes = packet.frame, packet.boxes
+                packet.annotated = renderer.draw(
+                    frame, boxes, packet.class_ids, packet.scores, classes, packet.track_ids
+                )
+        return batch
+
+    def encode(batch):
+        nonlocal vid_writer
+        for packet in batch:
+            with profiler.span("encode"):
+                if vid_writer is None and output_dir:
+                    height, width, _ = packet.annotated.shape
+                    vid_writer = open_video_writer(
+                        output_dir, output_name, width, height, fps, config.video_sink, config.video_encoder,
+                        config.encode_preset, config.async_write, WRITE_QUEUE_SIZE, config.drop_output_frames,
+                    )
+
+                profiler.latency.add(packet.meta["latency"])
+                if quality is not None:
+                    quality.observe(packet.meta["latency"])
+                if detection_sink:
+                    boxes = resizer.to_source(packet.boxes) if resizer else packet.boxes
+                    detection_sink.write(
+                        packet.frame_id, packet.timestamp, boxes, packet.class_ids, packet.scores, packet.track_ids
+                    )
+                emit_frame(packet.annotated, vid_writer)
+            if display is not None:
+                with profiler.span("display"):
+                    display.show(packet.annotated)
+                if display.cancelled.is_set():
+                    raise StopPipeline()
+        return batch
+
+    stages = [("infer", infer), ("annotate", annotate), ("encode", encode)]
+    # Frames of a live source waiting for a batch would go stale, only the newest one waits
+    stale = []
+    batches = iterate_batches(
+        read_packets(), batch_size, config.max_batch_wait, latest_only=live_reader, on_drop=stale.append
+    )
+    # Stops the batch feeder thread of `max_batch_wait` when the run ends early
+    resources.callback(batches.close)
+
+    start = time.perf_counter()
+    if config.pipelined:
+        run = partial(
+            run_pipeline, batches, stages, queue_size=config.queue_size, backpressure=config.backpressure, item_size=len
+        )
+        stats = _run_beside_display(run, display) if display is not None and not display.background else run()
+        print(format_stage_report(stats, time.perf_counter() - start))
+    else:
+        try:
+            for batch in batches:
+                for _, stage in stages:
+                    stage(batch)
+        except StopPipeline:
+            pass
+
+    if config.detect_stride > 1 or config.scene_change_threshold is not None or quality is not None:
+        print(scheduler.summary())
+    if quality is not None:
+        print(quality.summary())
+    if config.tile_size or config.roi:
+        print(detector.summary())
+    latency = profiler.latency
+    if stream is not None and latency.count:
+        p50, p95 = latency.percentiles((50, 95)) * 1000
+        print(f"Glass-to-detection latency: p50={p50:.1f}ms p95={p95:.1f}ms max={latency.max * 1000:.1f}ms")
+    if stale:
+        print(f"Dropped {len(stale)} stale frames waiting for a batch")
+    return profiler, start
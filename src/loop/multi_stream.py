@@ -0,0 +1,281 @@
+import os
+import queue
+import threading
+import time
+
+import cv2
+from ultralytics import YOLO
+from src.loop.utils.draw import BoxRenderer
+from src.loop.utils.process import (
+    FramePacket,
+    get_frame_iterator,
+    generate_output_name,
+    create_output_writer,
+    detect_frames,
+)
+from src.loop.utils.tracker import MultiObjectTracker
+
+_END = object()
+
+
+class StreamState:
+    """
+    Everything the multi-stream runner keeps for one source.
+
+    Attributes:
+        index (int): Position of the source in the input list.
+        source (str): Path to the video file or to the directory with frames.
+        output_name (str): Name of the annotated output video.
+        inbox (queue.Queue): Decoded frames waiting for inference.
+        outbox (queue.Queue): Detected frames waiting for annotation and encoding.
+        tracker (MultiObjectTracker): Tracker of the stream, None when tracking is off.
+        fps (float): Frame rate of the source, 30 for frame directories.
+        frames (int): Number of frames written.
+        detections (int): Number of detections on the written frames.
+        started (float): Time the first frame of the stream was decoded, None before.
+        finished (float): Time the last frame of the stream was written.
+        error (Exception): Error that ended the decoding of the stream early, None otherwise.
+    """
+
+    def __init__(self, index, source, inbox_size, track):
+        self.index = index
+        self.source = source
+        self.is_dir = os.path.isdir(source)
+        self.output_name = generate_output_name(
+            video=None if self.is_dir else source,
+            frames_dir=source if self.is_dir else None,
+        )
+        self.inbox = queue.Queue(maxsize=inbox_size)
+        self.outbox = queue.Queue(maxsize=inbox_size)
+        self.tracker = MultiObjectTracker() if track else None
+        self.fps = 30
+        self.done = False
+        self.frames = 0
+        self.detections = 0
+        self.started = None
+        self.finished = None
+        self.error = None
+
+    def summary(self):
+        elapsed = (self.finished or time.perf_counter()) - self.started if self.started is not None else 0.0
+        fps = self.frames / elapsed if elapsed > 0 else 0.0
+        failed = f" failed: {self.error}" if self.error is not None else ""
+        return (
+            f"[{self.index}] {os.path.basename(os.path.normpath(self.source))}: frames={self.frames} "
+            f"detections={self.detections} fps={fps:.1f}{failed}"
+        )
+
+
+def _put(items, item, stop):
+    """Puts an item into a queue, gives up when the run is stopped."""
+    while not stop.is_set():
+        try:
+            items.put(item, timeout=0.1)
+            return True
+        except queue.Full:
+            pass
+    return False
+
+
+def _get(items, stop):
+    """Waits for the next item of a queue, returns the end marker once the run is stopped."""
+    while True:
+        try:
+            return items.get(timeout=0.1)
+        except queue.Empty:
+            if stop.is_set():
+                return _END
+
+
+def _read_stream(stream, ready, stop):
+    """
+    Decodes the frames of a stream into its inbox, notifies the scheduler about every frame.
+
+    A source that cannot be opened or fails while decoding only ends its own stream; the
+    error is kept on the stream and the other streams carry on.
+    """
+    cap = None
+    try:
+        frame_iterator, _, cap = get_frame_iterator(
+            video=None if stream.is_dir else stream.source,
+            frames_dir=stream.source if stream.is_dir else None,
+        )
+        if cap:
+            # Set before the first frame is queued, so the writer sees it
+            stream.fps = cap.get(cv2.CAP_PROP_FPS) or stream.fps
+        for frame in frame_iterator:
+            if stream.started is None:
+                stream.started = time.perf_counter()
+            if not _put(stream.inbox, FramePacket(frame_iterator.frame_index, frame), stop):
+                break
+            with ready:
+                ready.notify()
+    except Exception as e:
+        stream.error = e
+        print(f"[{stream.index}] {stream.source}: {e}")
+    finally:
+        if cap:
+            cap.release()
+        _put(stream.inbox, _END, stop)
+        with ready:
+            ready.notify()
+
+
+def _write_stream(stream, output_dir, classes, stop, errors):
+    """Annotates and encodes the detected frames of a stream, in order; a failure stops the run."""
+    vid_writer = None
+    renderer = BoxRenderer()
+    try:
+        while True:
+            packet = _get(stream.outbox, stop)
+            if packet is _END:
+                break
+            if output_dir:
+                # The frame is not needed afterwards, so it is annotated in place
+                annotated = renderer.draw(
+                    packet.frame, packet.boxes, packet.class_ids, packet.scores, classes, packet.track_ids
+                )
+                if vid_writer is None:
+                    height, width, _ = packet.frame.shape
+                    vid_writer = create_output_writer(output_dir, stream.output_name, width, height, stream.fps)
+                vid_writer.write(annotated)
+            stream.frames += 1
+            stream.detections += len(packet.boxes)
+    except Exception as e:
+        errors.append(e)
+        stop.set()
+    finally:
+        stream.finished = time.perf_counter()
+        if vid_writer:
+            vid_writer.release()
+
+
+def _next_batch(streams, batch_size, offset):
+    """
+    Takes up to `batch_size` frames from the streams in round-robin order.
+
+    Every round takes at most one frame per stream, starting with the stream at `offset`,
+    so a fast source can never starve the others. Returns the batch and the streams that
+    reached their end while it was collected.
+    """
+    batch, finished = [], []
+    active = [stream for stream in streams if not stream.done]
+    if not active:
+        return batch, finished
+    order = active[offset % len(active):] + active[:offset % len(active)]
+    progress = True
+    while len(batch) < batch_size and progress:
+        progress = False
+        for stream in order:
+            if stream.done or len(batch) == batch_size:
+                continue
+            try:
+                packet = stream.inbox.get_nowait()
+            except queue.Empty:
+                continue
+            if packet is _END:
+                stream.done = True
+                finished.append(stream)
+                continue
+            batch.append((stream, packet))
+            progress = True
+    return batch, finished
+
+
+def run_multi_stream(
+    model: YOLO,
+    sources: list,
+    output_dir: str = None,
+    classes=None,
+    batch_size=8,
+    queue_size=4,
+    track=False,
+):
+    """
+    Runs detection over many videos or frame directories at once with a single shared model.
+
+    Every source is decoded on its own thread and annotated/encoded on another one. The
+    main thread collects frames from all sources in fair round-robin order, runs one
+    predict call per batch of up to `batch_size` frames and routes the results back to
+    the writer of each source. The aggregate throughput grows with the number of streams
+    because decode and encode of all streams overlap with the shared batched inference.
+    The output videos keep the frame rate of their sources.
+
+    When inference or a writer fails, every thread is stopped (no thread waits on a full
+    or empty queue forever) and the error is raised once they have finished. A source that
+    cannot be read only ends its own stream, see `StreamState.error`.
+
+    Args:
+        model (YOLO): YOLO model instance for object detection.
+        sources (list[str]): Paths to video files or directories with image frames.
+        output_dir (str, optional): Directory to save the processed videos. Defaults to None.
+        classes (dict, optional): Dictionary containing class information (tags and colors). Defaults to None.
+        batch_size (int, optional): Maximum number of frames per predict call. Defaults to 8.
+        queue_size (int, optional): Capacity of the per-stream queues. Defaults to 4.
+        track (bool, optional): Whether to track objects in every stream. Defaults to False.
+
+    Returns:
+        list[StreamState]: The final state and statistics of every stream.
+
+    Raises:
+        Exception: The first error of the inference or of a writer.
+    """
+    classes = classes or {}
+    streams = [StreamState(index, source, queue_size, track) for index, source in enumerate(sources)]
+    names = [stream.output_name for stream in streams]
+    for stream in streams:
+        if names.count(stream.output_name) > 1:
+            stream.output_name = f"{stream.index}_{stream.output_name}"
+
+    ready = threading.Condition()
+    stop = threading.Event()
+    errors = []
+    readers = [threading.Thread(target=_read_stream, args=(s, ready, stop), daemon=True) for s in streams]
+    writers = [
+        threading.Thread(target=_write_stream, args=(s, output_dir, classes, stop, errors), daemon=True)
+        for s in streams
+    ]
+    for thread in readers + writers:
+        thread.start()
+
+    start = time.perf_counter()
+    calls = frames = offset = 0
+    try:
+        while not all(stream.done for stream in streams) and not stop.is_set():
+            batch, finished = _next_batch(streams, batch_size, offset)
+            if not batch:
+                for stream in finished:
+                    _put(stream.outbox, _END, stop)
+                with ready:
+                    ready.wait(timeout=0.01)
+                continue
+            offset += 1
+            calls += 1
+            frames += len(batch)
+
+            detections = detect_frames([packet.frame for _, packet in batch], model)
+            for (stream, packet), (boxes, class_ids, scores) in zip(batch, detections):
+                if stream.tracker is not None:
+                    boxes, class_ids, scores, packet.track_ids = stream.tracker.update(boxes, class_ids, scores)
+                packet.boxes, packet.class_ids, packet.scores = boxes, class_ids, scores
+                _put(stream.outbox, packet, stop)
+            for stream in finished:
+                _put(stream.outbox, _END, stop)
+    except BaseException:
+        stop.set()
+        raise
+    finally:
+        for thread in readers + writers:
+            thread.join()
+    if errors:
+        raise errors[0]
+    elapsed = time.perf_counter() - start
+
+    print("Stream statistics:")
+    for stream in streams:
+        print(f"  {stream.summary()}")
+    if elapsed > 0 and calls:
+        print(f"  aggregate fps={frames / elapsed:.1f} predict calls={calls} mean batch={frames / calls:.1f}")
+    if output_dir:
+        print(f"Processed videos saved in {output_dir}")
+    return streams
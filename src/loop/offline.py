@@ -0,0 +1,204 @@
+import multiprocessing
+import os
+import time
+
+import cv2
+import numpy as np
+from src.loop.utils.draw import BoxRenderer
+from src.loop.utils.process import list_frame_files, create_output_writer, generate_output_name, detect_frames
+
+# Per-process model, created once by the pool initializer
+_worker_model = None
+
+
+def _init_worker(weights, threads_per_worker):
+    """Loads a private model instance in a pool worker and limits its thread count."""
+    global _worker_model
+    import torch
+    from ultralytics import YOLO
+
+    torch.set_num_threads(threads_per_worker)
+    cv2.setNumThreads(1)
+    _worker_model = YOLO(weights)
+
+
+def _detect_shard(shard, batch_size):
+    """
+    Detects objects on a contiguous shard of frames inside a pool worker.
+
+    Args:
+        shard (list[str]): Paths to the frames of the shard, in order.
+        batch_size (int): Number of frames per predict call.
+
+    Returns:
+        tuple: Number of detections per frame, boxes, class indices and probabilities of the shard.
+    """
+    counts, boxes, class_ids, scores = [], [], [], []
+    for start in range(0, len(shard), batch_size):
+        frames = [cv2.imread(path) for path in shard[start:start + batch_size]]
+        readable = [frame for frame in frames if frame is not None]
+        detections = iter(detect_frames(readable, _worker_model))
+        for path, frame in zip(shard[start:start + batch_size], frames):
+            if frame is None:
+                print(f"Could not read frame: {path}")
+                counts.append(0)
+                continue
+            frame_boxes, frame_class_ids, frame_scores = next(detections)
+            counts.append(len(frame_boxes))
+            boxes.append(frame_boxes.reshape(-1, 4))
+            class_ids.append(frame_class_ids)
+            scores.append(frame_scores)
+
+    def stack(arrays, shape, dtype):
+        return np.concatenate(arrays).astype(dtype) if arrays else np.zeros(shape, dtype=dtype)
+
+    return (
+        np.array(counts, dtype=np.int64),
+        stack(boxes, (0, 4), np.float32),
+        stack(class_ids, (0,), np.int32),
+        stack(scores, (0,), np.float32),
+    )
+
+
+def _detect_shard_with_batch(args):
+    """Unpacks the arguments of `_detect_shard` for `Pool.imap`."""
+    return _detect_shard(*args)
+
+
+def save_detections(path, frame_files, counts, boxes, class_ids, scores):
+    """
+    Writes per-frame detections as a columnar `.npz` file.
+
+    Detections of all frames are stored in flat columns; `frame_offsets[i]:frame_offsets[i + 1]`
+    is the slice of the columns that belongs to frame `i`. The file is written at `path` as
+    given, without the `.npz` suffix that `np.savez` would append.
+
+    Args:
+        path (str): Path of the output file.
+        frame_files (list[str]): Paths to the frames, in order.
+        counts (np.ndarray): Number of detections per frame.
+        boxes (np.ndarray): Boxes [x_min, y_min, x_max, y_max] of all frames.
+        class_ids (np.ndarray): Class indices of all frames.
+        scores (np.ndarray): Probabilities of all frames.
+    """
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    offsets = np.concatenate([[0], np.cumsum(counts)]).astype(np.int64)
+    with open(path, "wb") as f:
+        np.savez(
+            f,
+            frame_files=np.array(frame_files),
+            frame_offsets=offsets,
+            boxes=boxes,
+            class_ids=class_ids,
+            scores=scores,
+        )
+
+
+def load_detections(path):
+    """
+    Reads a detections file written by `save_detections`.
+
+    Args:
+        path (str): Path of the `.npz` file.
+
+    Yields:
+        tuple: Frame path, boxes, class indices and probabilities of every frame, in order.
+    """
+    with np.load(path) as data:
+        offsets = data["frame_offsets"]
+        boxes, class_ids, scores = data["boxes"], data["class_ids"], data["scores"]
+        for index, frame_file in enumerate(data["frame_files"]):
+            start, end = offsets[index], offsets[index + 1]
+            yield str(frame_file), boxes[start:end], class_ids[start:end], scores[start:end]
+
+
+def assemble_video(detections_path, output_dir, output_name, classes=None, fps=30):
+    """
+    Renders the annotated video of an offline run from its detections file, in frame order.
+
+    Args:
+        detections_path (str): Path of the detections file.
+        output_dir (str): Directory to save the video.
+        output_name (str): Name of the video file.
+        classes (dict, optional): Dictionary containing class information (tags and colors). Defaults to None.
+        fps (int, optional): Frame rate of the video. Defaults to 30.
+    """
+    classes = classes or {}
+    vid_writer = None
+    renderer = BoxRenderer()
+    for frame_file, boxes, class_ids, scores in load_detections(detections_path):
+        frame = cv2.imread(frame_file)
+        if frame is None:
+            continue
+        if vid_writer is None:
+            height, width, _ = frame.shape
+            vid_writer = create_output_writer(output_dir, output_name, width, height, fps)
+        vid_writer.write(renderer.draw(frame, boxes, class_ids, scores, classes))
+    if vid_writer:
+        vid_writer.release()
+        print(f"Processed video saved as {output_name} in {output_dir}")
+
+
+def run_offline(
+    weights: str,
+    frames_dir: str,
+    detections_path: str,
+    workers=None,
+    threads_per_worker=1,
+    shard_size=256,
+    batch_size=8,
+    output_dir: str = None,
+    classes=None,
+):
+    """
+    Detects objects on a large directory of frames with a pool of processes.
+
+    The sorted frame list is cut into contiguous shards that are handed out to the
+    workers; every worker holds its own model instance with `threads_per_worker` threads,
+    so `workers * threads_per_worker` should match the number of cores. Results are
+    collected in frame order and written to a columnar detections file. The annotated
+    video is optional and rendered afterwards from that file.
+
+    Args:
+        weights (str): Path to the YOLO weights loaded by every worker.
+        frames_dir (str): Path to the directory containing image frames.
+        detections_path (str): Path of the `.npz` detections file to write.
+        workers (int, optional): Number of worker processes. Defaults to cores / threads_per_worker.
+        threads_per_worker (int, optional): Inference threads of each worker. Defaults to 1.
+        shard_size (int, optional): Number of frames handed to a worker at once. Defaults to 256.
+        batch_size (int, optional): Number of frames per predict call. Defaults to 8.
+        output_dir (str, optional): Directory to save the annotated video; None skips it. Defaults to None.
+        classes (dict, optional): Dictionary containing class information (tags and colors). Defaults to None.
+    """
+    frame_files = list_frame_files(frames_dir)
+    workers = workers or max((os.cpu_count() or 1) // threads_per_worker, 1)
+    shards = [frame_files[i:i + shard_size] for i in range(0, len(frame_files), shard_size)]
+
+    start = time.perf_counter()
+    counts, boxes, class_ids, scores = [], [], [], []
+    context = multiprocessing.get_context("spawn")
+    with context.Pool(workers, initializer=_init_worker, initargs=(weights, threads_per_worker)) as pool:
+        # imap keeps shard order while the workers run ahead
+        results = pool.imap(_detect_shard_with_batch, [(shard, batch_size) for shard in shards])
+        for done, (shard_counts, shard_boxes, shard_class_ids, shard_scores) in enumerate(results, start=1):
+            counts.append(shard_counts)
+            boxes.append(shard_boxes)
+            class_ids.append(shard_class_ids)
+            scores.append(shard_scores)
+            print(f"Shard {done}/{len(shards)} done")
+    elapsed = time.perf_counter() - start
+
+    save_detections(
+        detections_path,
+        frame_files,
+        np.concatenate(counts),
+        np.concatenate(boxes),
+        np.concatenate(class_ids),
+        np.concatenate(scores),
+    )
+    print(f"Detected {len(frame_files)} frames in {elapsed:.1f}s ({len(frame_files) / elapsed:.1f} fps) with {workers} workers")
+    print(f"Detections saved to {detections_path}")
+
+    if output_dir:
+        output_name = generate_output_name(frames_dir=frames_dir)
+        assemble_video(detections_path, output_dir, output_name, classes)
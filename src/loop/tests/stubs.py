@@ -0,0 +1,39 @@
+"""Stand-ins for the parts of the ultralytics results that `extract_detections` reads."""
+import numpy as np
+
+
+class Array:
+    """Mimics the part of the tensor API that `extract_detections` uses."""
+
+    def __init__(self, values):
+        self.values = values
+
+    def cpu(self):
+        return self
+
+    def numpy(self):
+        return self.values
+
+
+class Boxes:
+    def __init__(self, boxes, class_ids, scores):
+        self.xyxy = Array(boxes)
+        self.cls = Array(class_ids)
+        self.conf = Array(scores)
+
+
+class Result:
+    """
+    Prediction result of one frame.
+
+    Args:
+        boxes (array-like): Boxes [x_min, y_min, x_max, y_max].
+        class_ids (array-like, optional): Class indices. Defaults to class 0 for every box.
+        scores (array-like, optional): Probabilities. Defaults to 0.9 for every box.
+    """
+
+    def __init__(self, boxes, class_ids=None, scores=None):
+        boxes = np.asarray(boxes, dtype=np.float32).reshape(-1, 4)
+        class_ids = np.zeros(len(boxes)) if class_ids is None else np.asarray(class_ids, dtype=np.float32)
+        scores = np.full(len(boxes), 0.9, dtype=np.float32) if scores is None else np.asarray(scores, dtype=np.float32)
+        self.boxes = Boxes(boxes, class_ids, scores)
@@ -0,0 +1,87 @@
+import os
+
+import pytest
+
+pytest.importorskip("ultralytics")
+
+from src.loop.utils import backends
+from src.loop.utils.backends import calibration_id, export_model, export_path
+
+
+class FakeExporter:
+    """Stands in for `YOLO`: writes the export where ultralytics would and records the calls."""
+
+    calls = []
+
+    def __init__(self, weights):
+        self.weights = weights
+
+    def export(self, **kwargs):
+        FakeExporter.calls.append(kwargs)
+        base = os.path.splitext(self.weights)[0]
+        if kwargs["format"] == "onnx":
+            path = f"{base}.onnx"
+            open(path, "w").close()
+        else:
+            path = f"{base}_int8_openvino_model" if kwargs.get("int8") else f"{base}_openvino_model"
+            os.makedirs(path)
+        return path
+
+
+@pytest.fixture
+def weights(tmp_path, monkeypatch):
+    monkeypatch.setattr(backends, "YOLO", FakeExporter)
+    FakeExporter.calls = []
+    path = tmp_path / "best.pt"
+    path.write_bytes(b"weights")
+    return str(path)
+
+
+def test_export_path_keys_on_size_and_precision():
+    assert export_path("w/best.pt", "onnx", 640) == "w/best_640.onnx"
+    assert export_path("w/best.pt", "openvino", 320) == "w/best_320_openvino_model"
+    assert export_path("w/best.pt", "openvino-int8", 640, "coco8.yaml") == (
+        f"w/best_640_int8_{calibration_id('coco8.yaml')}_openvino_model"
+    )
+    # Calibration data only names INT8 exports
+    assert export_path("w/best.pt", "openvino", 320, "coco8.yaml") == "w/best_320_openvino_model"
+
+
+def test_calibration_id_changes_with_the_calibration_data(tmp_path):
+    data = tmp_path / "data.yaml"
+    data.write_text("path: a\n")
+    first = calibration_id(str(data))
+    assert first == calibration_id(str(data))
+    assert first != calibration_id(str(tmp_path / "other.yaml"))
+    data.write_text("path: other\n")
+    os.utime(data, ns=(0, 0))
+    assert calibration_id(str(data)) != first
+
+
+def test_export_is_reused_only_for_the_same_size(weights):
+    first = export_model(weights, "onnx", imgsz=640)
+    assert first == export_path(weights, "onnx", 640) and os.path.exists(first)
+    assert export_model(weights, "onnx", imgsz=640) == first
+    assert len(FakeExporter.calls) == 1
+
+    second = export_model(weights, "onnx", imgsz=320)
+    assert second != first and os.path.exists(second)
+    assert [call["imgsz"] for call in FakeExporter.calls] == [640, 320]
+
+
+def test_int8_export_needs_calibration_data(weights):
+    with pytest.raises(ValueError):
+        export_model(weights, "openvino-int8")
+    exported = export_model(weights, "openvino-int8", data="coco8.yaml")
+    assert exported == export_path(weights, "openvino-int8", 640, "coco8.yaml") and os.path.isdir(exported)
+    assert FakeExporter.calls[-1]["data"] == "coco8.yaml"
+    # Re-calibrating on other data makes a new export instead of reusing the old one
+    recalibrated = export_model(weights, "openvino-int8", data="coco128.yaml")
+    assert recalibrated != exported and len(FakeExporter.calls) == 2
+    # The FP32 export does not pick up the INT8 one
+    assert export_model(weights, "openvino") != exported
+
+
+def test_torch_backend_uses_the_weights(weights):
+    assert export_model(weights, "torch") == weights
+    assert FakeExporter.calls == []
@@ -0,0 +1,56 @@
+import numpy as np
+
+from src.loop.utils.detection_cache import DetectionCache, cache_namespace, frame_digest
+
+BOXES = np.array([[10, 20, 40, 60], [100, 100, 110, 120]], dtype=np.float32)
+# Packed size of one detection: count + box + class + score
+ENTRY = 4 + 16 + 4 + 4
+
+
+def test_detections_survive_a_reopen(tmp_path):
+    path = str(tmp_path / "cache" / "detections.sqlite")
+    cache = DetectionCache(path)
+    assert cache.get("a") is None
+    cache.put("a", BOXES, [0, 2], [0.9, 0.4])
+    cache.put("empty", np.zeros((0, 4)), [], [])
+    cache.close()
+
+    cache = DetectionCache(path)
+    boxes, class_ids, scores = cache.get("a")
+    assert boxes.tolist() == BOXES.tolist()
+    assert class_ids.tolist() == [0, 2]
+    assert scores.tolist() == np.float32([0.9, 0.4]).tolist()
+    assert cache.get("empty")[0].shape == (0, 4)
+    assert (cache.hits, cache.misses) == (2, 0)
+    cache.close()
+
+
+def test_replacing_an_entry_keeps_the_size_right(tmp_path):
+    cache = DetectionCache(str(tmp_path / "detections.sqlite"))
+    cache.put("a", BOXES, [0, 2], [0.9, 0.4])
+    cache.put("a", BOXES[:1], [0], [0.9])
+    assert cache.size == ENTRY
+    cache.close()
+
+
+def test_least_recently_used_entries_are_evicted_down_to_the_limit(tmp_path):
+    cache = DetectionCache(str(tmp_path / "detections.sqlite"), max_bytes=3 * ENTRY, flush_every=1000)
+    for key in "abcd":
+        cache.put(key, BOXES[:1], [0], [0.9])
+    cache.get("a")
+    cache.flush()
+    # 90% of the limit leaves room for two entries; "a" was used last
+    assert cache.evicted == 2
+    assert cache.size == 2 * ENTRY
+    assert [key for key in "abcd" if cache.get(key) is not None] == ["a", "d"]
+    cache.close()
+
+
+def test_keys_depend_on_everything_that_changes_the_detections():
+    frame = np.zeros((4, 6, 3), dtype=np.uint8)
+    assert frame_digest(frame) == frame_digest(frame.copy())
+    assert frame_digest(frame) != frame_digest(frame.reshape(6, 4, 3))
+    assert cache_namespace("w", {"imgsz": 640, "backend": "onnx"}) == cache_namespace("w", {"backend": "onnx", "imgsz": 640})
+    assert cache_namespace("w", {"imgsz": 640}) != cache_namespace("w", {"imgsz": 1280})
+    assert cache_namespace("w", {}) != cache_namespace("v", {})
+    assert cache_namespace("w", {}) != cache_namespace("w", {}, source_digest="s")
@@ -0,0 +1,73 @@
+import json
+
+import numpy as np
+import pytest
+
+from src.loop.utils.detection_sinks import CocoResultsSink, JsonlSink, open_detection_sink
+
+BOXES = np.array([[10, 20, 40, 60], [100, 100, 110, 120]], dtype=np.float32)
+
+
+def write_frames(sink):
+    sink.write(0, 1.5, BOXES, [0, 2], [0.9, 0.4], track_ids=[7, -1])
+    sink.write(1, 1.6, np.zeros((0, 4)), [], [])
+    sink.write(2, 1.7, BOXES[:1], [1], [0.8])
+
+
+def test_jsonl_rows_are_buffered_per_batch(tmp_path):
+    path = tmp_path / "detections.jsonl"
+    sink = JsonlSink(str(path), batch_size=2)
+    write_frames(sink)
+    # The first two frames were flushed, the third is still buffered
+    assert sink.rows == 2
+    sink.close()
+    rows = [json.loads(line) for line in path.read_text().splitlines()]
+    assert [(row["frame_id"], row["class_id"], row["track_id"]) for row in rows] == [(0, 0, 7), (0, 2, None), (2, 1, None)]
+    assert rows[0] == pytest.approx({
+        "frame_id": 0, "timestamp": 1.5, "x_min": 10, "y_min": 20, "x_max": 40, "y_max": 60,
+        "class_id": 0, "score": 0.9, "track_id": 7,
+    })
+    assert sink.rows == 3
+
+
+def test_coco_results_are_a_json_array_with_offsets(tmp_path):
+    path = tmp_path / "results.json"
+    with CocoResultsSink(str(path), batch_size=1) as sink:
+        write_frames(sink)
+    results = json.loads(path.read_text())
+    assert results == [
+        {"image_id": 1, "category_id": 1, "bbox": [10, 20, 30, 40], "score": 0.9},
+        {"image_id": 1, "category_id": 3, "bbox": [100, 100, 10, 20], "score": 0.4},
+        {"image_id": 3, "category_id": 2, "bbox": [10, 20, 30, 40], "score": 0.8},
+    ]
+
+
+def test_coco_results_without_detections_are_not_written(tmp_path, capsys):
+    # COCO.loadRes rejects an empty list, so no file is left, not even one of an earlier run
+    path = tmp_path / "results.json"
+    path.write_text("[]\n")
+    with CocoResultsSink(str(path), batch_size=1) as sink:
+        sink.write(0, 0.0, [], [], [])
+        sink.write(1, 0.1, np.zeros((0, 4)), [], [])
+    assert not path.exists()
+    assert "No detections" in capsys.readouterr().out
+
+
+def test_parquet_keeps_missing_track_ids_null(tmp_path):
+    pq = pytest.importorskip("pyarrow.parquet")
+    path = tmp_path / "detections.parquet"
+    with open_detection_sink(str(path), batch_size=2) as sink:
+        write_frames(sink)
+    table = pq.read_table(path)
+    assert table.column("frame_id").to_pylist() == [0, 0, 2]
+    assert table.column("track_id").to_pylist() == [7, None, None]
+    # One row group per flushed batch
+    assert pq.ParquetFile(path).num_row_groups == 2
+
+
+def test_sink_is_chosen_by_extension(tmp_path):
+    sink = open_detection_sink(str(tmp_path / "out" / "detections.jsonl"))
+    assert isinstance(sink, JsonlSink)
+    sink.close()
+    with pytest.raises(ValueError):
+        open_detection_sink(str(tmp_path / "detections.csv"))
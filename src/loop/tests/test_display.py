@@ -0,0 +1,91 @@
+import threading
+
+import numpy as np
+import pytest
+
+from src.loop.utils import display as display_module
+from src.loop.utils.display import ESC_KEY, DisplayThread
+
+
+class FakeHighGui:
+    """Records the thread of every HighGUI call instead of opening a window."""
+
+    def __init__(self, key=-1):
+        self.key = key
+        self.calls = []
+
+    def record(self, name):
+        self.calls.append((name, threading.current_thread().name))
+
+    def install(self, monkeypatch):
+        monkeypatch.setattr(display_module.cv2, "namedWindow", lambda *args: self.record("namedWindow"))
+        monkeypatch.setattr(display_module.cv2, "imshow", lambda *args: self.record("imshow"))
+        monkeypatch.setattr(display_module.cv2, "destroyWindow", lambda *args: self.record("destroyWindow"))
+        monkeypatch.setattr(display_module.cv2, "waitKey", lambda *args: self.record("waitKey") or self.key)
+        return self
+
+    def threads(self, name=None):
+        return {thread for call, thread in self.calls if name is None or call == name}
+
+
+@pytest.fixture
+def gui(monkeypatch):
+    return FakeHighGui().install(monkeypatch)
+
+
+def frame():
+    return np.zeros((48, 64, 3), dtype=np.uint8)
+
+
+def test_background_display_draws_on_its_own_thread(gui):
+    display = DisplayThread(refresh_rate=1000, background=True)
+    display.show(frame())
+    for _ in range(100):
+        if display.shown:
+            break
+        threading.Event().wait(0.01)
+    display.close()
+    assert display.shown == 1
+    assert gui.threads() == {"display"}
+
+
+def test_main_thread_display_draws_frames_of_the_main_thread_right_away(gui):
+    display = DisplayThread(refresh_rate=1000, background=False)
+    display.show(frame())
+    assert display.shown == 1
+    display.close()
+    assert gui.threads() == {threading.main_thread().name}
+    assert gui.calls[-1][0] == "destroyWindow"
+
+
+def test_main_thread_display_draws_frames_of_other_threads_in_run_until(gui):
+    display = DisplayThread(refresh_rate=1000, background=False)
+
+    def produce():
+        for _ in range(5):
+            display.show(frame())
+            threading.Event().wait(0.01)
+
+    producer = threading.Thread(target=produce, name="producer")
+    producer.start()
+    display.run_until(lambda: not producer.is_alive())
+    display.close()
+    assert display.shown >= 1
+    assert gui.threads() == {threading.main_thread().name}
+
+
+def test_escape_cancels(monkeypatch):
+    FakeHighGui(key=ESC_KEY).install(monkeypatch)
+    display = DisplayThread(background=False)
+    display.show(frame())
+    assert display.cancelled.is_set()
+    display.close()
+
+
+def test_main_thread_is_the_default_on_macos(gui, monkeypatch):
+    monkeypatch.setattr(display_module.sys, "platform", "darwin")
+    assert DisplayThread().background is False
+    monkeypatch.setattr(display_module.sys, "platform", "linux")
+    display = DisplayThread()
+    assert display.background is True
+    display.close()
@@ -0,0 +1,50 @@
+import numpy as np
+
+from src.loop.utils.draw import BoxRenderer, draw_boxes
+from src.loop.utils.process import process_frame
+from src.loop.tests.stubs import Result
+
+BOXES = np.array([[20, 30, 80, 90]], dtype=np.float32)
+CLASSES = {0: {"color": (0, 0, 255), "tag": "Multicopter"}}
+
+
+class StubModel:
+    def predict(self, frame):
+        return [Result(BOXES)]
+
+
+class ListWriter:
+    def __init__(self):
+        self.frames = []
+
+    def write(self, frame):
+        self.frames.append(frame)
+
+
+def blank():
+    return np.zeros((120, 160, 3), dtype=np.uint8)
+
+
+def test_draw_boxes_returns_an_annotated_copy():
+    frame = blank()
+    annotated = draw_boxes(frame, BOXES, [0], [0.9], CLASSES)
+    assert annotated is not frame
+    assert not frame.any()
+    # Border pixels are blended towards the class color (red in BGR)
+    assert annotated[30, 50, 2] > 0 and annotated[30, 50, 0] == 0
+
+
+def test_renderer_draws_in_place():
+    frame = blank()
+    annotated = BoxRenderer().draw(frame, BOXES, [0], [0.9], CLASSES)
+    assert annotated is frame
+    assert frame[30, 50, 2] > 0
+    assert np.array_equal(annotated, draw_boxes(blank(), BOXES, [0], [0.9], CLASSES))
+
+
+def test_process_frame_keeps_the_input_frame():
+    frame = blank()
+    writer = ListWriter()
+    assert process_frame(frame, StubModel(), CLASSES, writer)
+    assert not frame.any()
+    assert writer.frames[0] is not frame and writer.frames[0].any()
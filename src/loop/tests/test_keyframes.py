@@ -0,0 +1,63 @@
+import numpy as np
+import pytest
+
+from src.loop.utils.keyframes import BoxPropagator, KeyframeScheduler
+
+
+def blank(value=0, width=160, height=120):
+    return np.full((height, width, 3), value, dtype=np.uint8)
+
+
+def textured(x, y, width=160, height=120):
+    """A checkerboard patch at (x, y) on a black frame, something optical flow can follow."""
+    frame = blank(width=width, height=height)
+    patch = (np.indices((24, 24)).sum(axis=0) // 4 % 2 * 255).astype(np.uint8)
+    frame[y:y + 24, x:x + 24] = patch[..., None]
+    return frame
+
+
+def test_stride_schedule():
+    scheduler = KeyframeScheduler(stride=3)
+    assert [scheduler.is_keyframe(blank()) for _ in range(7)] == [True, False, False, True, False, False, True]
+    assert scheduler.summary() == "Detector ran on 3/7 frames (42.9%)"
+    with pytest.raises(ValueError):
+        KeyframeScheduler(stride=0)
+
+
+def test_scene_change_forces_a_keyframe():
+    scheduler = KeyframeScheduler(stride=100, scene_change_threshold=0.1)
+    frames = [blank(0), blank(5), blank(200), blank(205), blank(0)]
+    assert [scheduler.is_keyframe(frame) for frame in frames] == [True, False, True, False, True]
+
+
+def test_velocity_model_continues_the_motion_between_keyframes():
+    propagator = BoxPropagator("velocity")
+    propagator.update(blank(), [[10, 20, 30, 40]], [0], [0.9])
+    # Nothing is known about the motion before the second keyframe
+    assert propagator.propagate(blank())[0].tolist() == [[10, 20, 30, 40]]
+    propagator.propagate(blank())
+    propagator.update(blank(), [[22, 20, 42, 40]], [0], [0.8])
+    boxes, class_ids, scores = propagator.propagate(blank())
+    assert boxes.tolist() == [[26, 20, 46, 40]]
+    assert class_ids.tolist() == [0]
+    assert scores.tolist() == [np.float32(0.8)]
+    # Boxes stop at the frame border
+    for _ in range(30):
+        boxes = propagator.propagate(blank())[0]
+    assert boxes.tolist() == [[146, 20, 160, 40]]
+
+
+def test_velocity_is_only_measured_between_boxes_of_the_same_class():
+    propagator = BoxPropagator("velocity")
+    propagator.update(blank(), [[10, 20, 30, 40]], [0], [0.9])
+    propagator.update(blank(), [[15, 20, 35, 40]], [1], [0.9])
+    assert propagator.propagate(blank())[0].tolist() == [[15, 20, 35, 40]]
+
+
+def test_flow_model_follows_the_pixels():
+    propagator = BoxPropagator("flow")
+    propagator.update(textured(40, 40), [[40, 40, 64, 64]], [0], [0.9])
+    boxes = propagator.propagate(textured(43, 42))[0]
+    assert boxes[0] == pytest.approx([43, 42, 67, 66], abs=0.5)
+    with pytest.raises(ValueError):
+        BoxPropagator("kalman")
@@ -0,0 +1,126 @@
+import json
+import threading
+
+import cv2
+import numpy as np
+import pytest
+
+pytest.importorskip("ultralytics")
+
+from src.loop.main_loop import TrackingConfig, run_tracking
+from src.loop.tests.stubs import Result
+
+FRAMES = 12
+
+
+class StubModel:
+    """Finds one fixed box on every frame; fails on the call number `fail_at`."""
+
+    def __init__(self, fail_at=None):
+        self.calls = 0
+        self.fail_at = fail_at
+
+    def predict(self, frames, **kwargs):
+        self.calls += 1
+        if self.calls == self.fail_at:
+            raise RuntimeError("detector failed")
+        return [Result([[10, 10, 50, 50]]) for _ in frames]
+
+
+@pytest.fixture(scope="module")
+def video(tmp_path_factory):
+    path = str(tmp_path_factory.mktemp("video") / "clip.avi")
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"MJPG"), 25, (160, 120))
+    for index in range(FRAMES):
+        writer.write(np.full((120, 160, 3), index * 10, dtype=np.uint8))
+    writer.release()
+    return path
+
+
+def read_rows(path):
+    with open(path) as f:
+        return [json.loads(line) for line in f]
+
+
+def reader_threads():
+    """Returns the decoding threads that are still running a second after the run."""
+    threads = [thread for thread in threading.enumerate() if thread.name.startswith(("frame-reader", "batch-feeder"))]
+    for thread in threads:
+        thread.join(timeout=1)
+    return [thread for thread in threads if thread.is_alive()]
+
+
+def test_config_and_keyword_options(video, tmp_path):
+    config = TrackingConfig(batch_size=4, detect_stride=3)
+    model = StubModel()
+    out = str(tmp_path / "detections.jsonl")
+    profiler = run_tracking(model, video=video, config=config, detections_out=out)
+    assert profiler is not None
+    # Keyframes 0, 3, 6 and 9 in batches of four frames
+    assert model.calls == 3
+    assert len(read_rows(out)) == FRAMES
+    # The config itself is left untouched by the overrides
+    assert config.detections_out is None
+
+
+@pytest.mark.parametrize("prefetch", [0, 4])
+def test_frame_ids_follow_the_source_past_unreadable_frames(tmp_path, prefetch):
+    frames_dir = tmp_path / "frames"
+    frames_dir.mkdir()
+    for index in range(5):
+        path = frames_dir / f"{index:03d}.png"
+        if index == 2:
+            path.write_bytes(b"broken")
+        else:
+            cv2.imwrite(str(path), np.full((120, 160, 3), index * 10, dtype=np.uint8))
+    out = str(tmp_path / "detections.jsonl")
+    assert run_tracking(StubModel(), frames_dir=str(frames_dir), detections_out=out, prefetch=prefetch) is not None
+    assert [row["frame_id"] for row in read_rows(out)] == [0, 1, 3, 4]
+
+
+def test_unknown_option_is_rejected(video):
+    with pytest.raises(TypeError):
+        run_tracking(StubModel(), video=video, batch_sizes=2)
+
+
+@pytest.mark.parametrize("options", [{"roi": True}, {"tile_size": 64, "tile_motion_threshold": 25}])
+def test_detection_cache_rejects_stateful_detectors(video, tmp_path, options):
+    model = StubModel()
+    cache = tmp_path / "cache.sqlite"
+    assert run_tracking(model, video=video, detection_cache=str(cache), **options) is None
+    assert model.calls == 0
+    assert not cache.exists()
+
+
+@pytest.mark.parametrize("pipelined", [False, True])
+def test_failing_stage_closes_everything(video, tmp_path, pipelined):
+    out = str(tmp_path / "detections.jsonl")
+    output_dir = str(tmp_path / "out")
+    with pytest.raises(RuntimeError):
+        run_tracking(
+            StubModel(fail_at=3), video=video, output_dir=output_dir, detections_out=out,
+            pipelined=pipelined, max_batch_wait=0.05, video_sink="mjpeg",
+        )
+    # Whatever reached the encode stage before the failure was flushed to disk; the pipelined
+    # stages stop without draining their queues
+    rows = [row["frame_id"] for row in read_rows(out)]
+    assert rows == [0, 1] if not pipelined else rows == [0, 1][:len(rows)]
+    if not pipelined:
+        cap = cv2.VideoCapture(str(tmp_path / "out" / "clip_result.avi"))
+        assert cap.isOpened() and cap.read()[0]
+        cap.release()
+    assert not reader_threads()
+
+
+@pytest.mark.parametrize("pipelined", [False, True])
+def test_display_stays_on_the_main_thread_on_macos(video, monkeypatch, pipelined):
+    from src.loop.utils import display as display_module
+
+    calls = []
+    record = lambda *args: calls.append(threading.current_thread()) or -1
+    for name in ("namedWindow", "imshow", "waitKey", "destroyWindow"):
+        monkeypatch.setattr(display_module.cv2, name, record)
+    monkeypatch.setattr(display_module.sys, "platform", "darwin")
+    run_tracking(StubModel(), video=video, visualize=True, pipelined=pipelined, display_fps=1000)
+    assert calls
+    assert set(calls) == {threading.main_thread()}
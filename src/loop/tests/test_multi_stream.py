@@ -0,0 +1,102 @@
+import threading
+
+import cv2
+import numpy as np
+import pytest
+
+pytest.importorskip("ultralytics")
+
+from src.loop import multi_stream
+from src.loop.multi_stream import run_multi_stream
+from src.loop.tests.stubs import Result
+
+FRAMES = 20
+
+
+class StubModel:
+    def __init__(self, fail_at=None):
+        self.calls = 0
+        self.fail_at = fail_at
+
+    def predict(self, frames, **kwargs):
+        self.calls += 1
+        if self.calls == self.fail_at:
+            raise RuntimeError("detector failed")
+        return [Result([[10, 10, 40, 40]]) for _ in frames]
+
+
+class BrokenClasses(dict):
+    """Makes the writer thread fail on the first frame it annotates."""
+
+    def get(self, *args):
+        raise KeyError("broken classes")
+
+
+@pytest.fixture(scope="module")
+def videos(tmp_path_factory):
+    folder = tmp_path_factory.mktemp("videos")
+    paths = []
+    for name, fps in (("a", 12), ("b", 25)):
+        path = str(folder / f"{name}.avi")
+        writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"MJPG"), fps, (96, 64))
+        for index in range(FRAMES):
+            writer.write(np.full((64, 96, 3), index * 10, dtype=np.uint8))
+        writer.release()
+        paths.append(path)
+    return paths
+
+
+def run_with_timeout(*args, **kwargs):
+    """Runs `run_multi_stream` on a thread and fails the test instead of hanging."""
+    outcome = {}
+
+    def target():
+        try:
+            outcome["streams"] = run_multi_stream(*args, **kwargs)
+        except Exception as e:
+            outcome["error"] = e
+
+    thread = threading.Thread(target=target, daemon=True)
+    thread.start()
+    thread.join(timeout=20)
+    assert not thread.is_alive(), "run_multi_stream did not finish"
+    return outcome
+
+
+def test_outputs_keep_the_source_frame_rate(videos, tmp_path):
+    outcome = run_with_timeout(StubModel(), videos, output_dir=str(tmp_path), batch_size=3, queue_size=2)
+    assert [stream.frames for stream in outcome["streams"]] == [FRAMES, FRAMES]
+    for name, fps in (("a", 12), ("b", 25)):
+        cap = cv2.VideoCapture(str(tmp_path / f"{name}_result.avi"))
+        assert cap.get(cv2.CAP_PROP_FPS) == pytest.approx(fps)
+        cap.release()
+
+
+def test_inference_failure_stops_every_thread(videos, tmp_path):
+    outcome = run_with_timeout(StubModel(fail_at=2), videos, output_dir=str(tmp_path), batch_size=1, queue_size=1)
+    assert isinstance(outcome["error"], RuntimeError)
+
+
+def test_writer_failure_is_raised(videos, tmp_path):
+    outcome = run_with_timeout(
+        StubModel(), videos, output_dir=str(tmp_path), classes=BrokenClasses({0: {}}), batch_size=1, queue_size=1
+    )
+    assert isinstance(outcome["error"], KeyError)
+
+
+def test_reader_failure_only_ends_its_stream(videos, monkeypatch):
+    original = multi_stream.get_frame_iterator
+
+    def get_frame_iterator(video=None, **kwargs):
+        if video == videos[0]:
+            raise OSError("camera unplugged")
+        return original(video=video, **kwargs)
+
+    monkeypatch.setattr(multi_stream, "get_frame_iterator", get_frame_iterator)
+    outcome = run_with_timeout(StubModel(), videos, batch_size=2, queue_size=2)
+    failed, healthy = outcome["streams"]
+    assert isinstance(failed.error, OSError) and failed.frames == 0 and failed.started is None
+    assert healthy.error is None and healthy.frames == FRAMES
+    # Timed from the first decoded frame, not from the construction of the state
+    assert healthy.started is not None and healthy.finished >= healthy.started
+    assert "failed: camera unplugged" in failed.summary()
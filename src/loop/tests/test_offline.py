@@ -0,0 +1,72 @@
+import cv2
+import numpy as np
+import pytest
+
+from src.loop import offline
+from src.loop.offline import load_detections, save_detections
+from src.loop.tests.stubs import Result
+
+
+def brightness_result(frame):
+    """One box per 50 levels of the frame's brightness, so every frame has its own count."""
+    count = int(frame[0, 0, 0]) // 50
+    boxes = np.tile(np.array([[1, 2, 3, 4]], dtype=np.float32), (count, 1)) * (count or 1)
+    return Result(boxes, np.full(count, count), np.full(count, 0.1 * count))
+
+
+class StubModel:
+    def __init__(self):
+        self.batches = []
+
+    def predict(self, frames, **kwargs):
+        self.batches.append(len(frames))
+        return [brightness_result(frame) for frame in frames]
+
+
+@pytest.fixture
+def frames(tmp_path):
+    # Brightness 0 -> no detections, 50 -> one, 100 -> two; "broken" is not an image
+    paths = []
+    for index, value in enumerate([100, 0, 50, None, 0, 100]):
+        path = tmp_path / f"{index:03d}.png"
+        if value is None:
+            path.write_bytes(b"broken")
+        else:
+            cv2.imwrite(str(path), np.full((8, 8, 3), value, dtype=np.uint8))
+        paths.append(str(path))
+    return paths
+
+
+def test_detections_round_trip_in_frame_order(tmp_path, frames, monkeypatch):
+    model = StubModel()
+    monkeypatch.setattr(offline, "_worker_model", model)
+    counts, boxes, class_ids, scores = offline._detect_shard(frames, batch_size=4)
+    assert counts.tolist() == [2, 0, 1, 0, 0, 2]
+    # The unreadable frame is left out of the predict call
+    assert model.batches == [3, 2]
+
+    # No .npz suffix is added, so the path can be read back as given
+    path = tmp_path / "out" / "dets.bin"
+    save_detections(str(path), frames, counts, boxes, class_ids, scores)
+    assert path.exists()
+
+    loaded = list(load_detections(str(path)))
+    assert [frame_file for frame_file, _, _, _ in loaded] == frames
+    for (_, frame_boxes, frame_class_ids, frame_scores), count in zip(loaded, counts):
+        assert len(frame_boxes) == len(frame_class_ids) == len(frame_scores) == count
+        if count:
+            assert frame_boxes.tolist() == [[1 * count, 2 * count, 3 * count, 4 * count]] * count
+            assert frame_class_ids.tolist() == [count] * count
+            np.testing.assert_allclose(frame_scores, 0.1 * count)
+    with np.load(path) as data:
+        assert data["frame_offsets"].tolist() == [0, 2, 2, 3, 3, 3, 5]
+
+
+def test_empty_shard_round_trips(tmp_path, monkeypatch):
+    monkeypatch.setattr(offline, "_worker_model", StubModel())
+    counts, boxes, class_ids, scores = offline._detect_shard([], batch_size=4)
+    assert boxes.shape == (0, 4)
+
+    path = tmp_path / "dets.npz"
+    save_detections(str(path), [], counts, boxes, class_ids, scores)
+    assert list(load_detections(str(path))) == []
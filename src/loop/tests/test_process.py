@@ -0,0 +1,54 @@
+import threading
+import time
+
+import pytest
+
+from src.loop.utils.process import iterate_batches
+
+
+def slow_source(count, delay=0.005):
+    for item in range(count):
+        time.sleep(delay)
+        yield item
+
+
+def test_batches_keep_order_and_sizes():
+    assert list(iterate_batches(range(7), 3)) == [[0, 1, 2], [3, 4, 5], [6]]
+    assert [item for batch in iterate_batches(slow_source(7), 3, max_wait=0.5) for item in batch] == list(range(7))
+    with pytest.raises(ValueError):
+        list(iterate_batches(range(3), 0))
+
+
+def test_partial_batch_after_max_wait():
+    batches = list(iterate_batches(slow_source(4, delay=0.05), 4, max_wait=0.01))
+    assert max(len(batch) for batch in batches) < 4
+    assert sum(batches, []) == list(range(4))
+
+
+def test_single_item_batches_do_not_start_a_feeder():
+    before = {thread.ident for thread in threading.enumerate()}
+    for _ in iterate_batches(slow_source(3), 1, max_wait=0.5):
+        started = [t for t in threading.enumerate() if t.ident not in before and t.name == "batch-feeder"]
+        assert not started
+
+
+@pytest.mark.parametrize("latest_only", [False, True])
+def test_latest_only_drops_items_waiting_behind_a_slow_consumer(latest_only):
+    dropped = []
+    batches = iterate_batches(
+        slow_source(40, delay=0.002), 2, max_wait=0.01, latest_only=latest_only, on_drop=dropped.append
+    )
+    first = next(batches)
+    # The consumer is busy while the source produces everything else
+    time.sleep(0.5)
+    second = next(batches)
+    rest = sum(batches, [])
+    assert first[0] == 0
+    if latest_only:
+        assert second[0] >= 30
+    else:
+        assert second[0] == first[-1] + 1
+    # Items that are delivered stay in source order and the last item is never dropped
+    delivered = first + second + rest
+    assert delivered == sorted(delivered) and delivered[-1] == 39
+    assert sorted(delivered + dropped) == list(range(40))
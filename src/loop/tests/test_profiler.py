@@ -0,0 +1,61 @@
+import json
+import multiprocessing
+import sys
+
+import numpy as np
+import pytest
+
+from src.loop.utils.profiler import SampleWindow, StageProfiler, peak_rss_mb
+
+
+def test_sample_window_keeps_totals_and_recent_percentiles():
+    window = SampleWindow(size=10)
+    for value in range(100):
+        window.add(float(value))
+    assert window.count == 100
+    assert window.total == sum(range(100))
+    assert window.max == 99
+    # Only the last 10 values remain for the percentiles
+    assert window.percentiles((0, 100)).tolist() == [90.0, 99.0]
+
+
+def test_profiler_records_per_frame_times_and_trace(tmp_path):
+    profiler = StageProfiler(trace=True)
+    profiler.record("inference", 0.0, 0.4, items=4)
+    profiler.record("inference", 1.0, 1.2, items=2)
+    assert profiler.frames["inference"] == 6
+    assert profiler.stages["inference"].percentiles((50,)).tolist() == pytest.approx([0.1])
+    assert "inference" in profiler.report(wall_time=1.0)
+
+    trace = tmp_path / "trace.json"
+    profiler.export_trace(str(trace))
+    events = json.loads(trace.read_text())["traceEvents"]
+    assert [event["args"]["frames"] for event in events] == [4, 2]
+
+
+def test_disabled_profiler_records_nothing():
+    profiler = StageProfiler(enabled=False)
+    with profiler.span("draw"):
+        pass
+    profiler.record("decode", 0.0, 1.0)
+    assert profiler.stages == {}
+
+
+@pytest.mark.skipif(not sys.platform.startswith("linux"), reason="exec keeps ru_maxrss on Linux")
+def test_spawned_process_does_not_report_parent_peak():
+    ballast = np.ones(400 * 1024 * 1024 // 8)  # 400 MB touched in the parent
+    with multiprocessing.get_context("spawn").Pool(1) as pool:
+        child_peak = pool.apply(peak_rss_mb)
+    assert child_peak < peak_rss_mb() - 300
+    del ballast
+
+
+def test_profiler_counts_frame_outcomes():
+    profiler = StageProfiler()
+    profiler.count("roi_full")
+    profiler.count("roi_cropped", 3)
+    assert profiler.counts == {"roi_full": 1, "roi_cropped": 3}
+    assert "roi_cropped=3" in profiler.report(wall_time=1.0)
+    disabled = StageProfiler(enabled=False)
+    disabled.count("roi_full")
+    assert disabled.counts == {}
@@ -0,0 +1,83 @@
+import pytest
+
+from src.loop.utils import quality
+from src.loop.utils.quality import QualityController, quality_ladder
+
+
+def feed(controller, latency, frames):
+    """Observes `frames` frames of the given latency and returns the levels after each one."""
+    levels = []
+    for _ in range(frames):
+        controller.observe(latency)
+        levels.append(controller.level)
+    return levels
+
+
+def test_ladder_degrades_one_knob_per_level():
+    ladder = quality_ladder(stride=1, imgsz=640, tiling=True, min_imgsz=320)
+    assert ladder[0] == {"stride": 1, "imgsz": 640, "conf": 0.25, "tiling": True}
+    assert ladder[1]["tiling"] is False
+    for previous, current in zip(ladder, ladder[1:]):
+        changed = [knob for knob in current if current[knob] != previous[knob]]
+        assert len(changed) == 1
+    assert min(level["imgsz"] for level in ladder) == 320
+    assert ladder[-1]["conf"] == 0.5
+
+
+def test_fixed_size_ladder_keeps_the_inference_size():
+    ladder = quality_ladder(stride=4, imgsz=640, min_imgsz=640, max_stride=8)
+    assert {level["imgsz"] for level in ladder} == {640}
+    assert [level["stride"] for level in ladder[:5]] == [4, 5, 6, 7, 8]
+
+
+def test_needs_a_target():
+    with pytest.raises(ValueError):
+        QualityController(quality_ladder())
+
+
+def test_steps_down_under_overload_and_up_after_recovery():
+    ladder = quality_ladder(min_imgsz=416)
+    controller = QualityController(ladder, latency_budget=0.1, window=5, cooldown=5)
+    levels = feed(controller, 0.2, 5 * (len(ladder) + 3))
+    # One level per window, never skipping one, and it stops at the cheapest level
+    assert levels[-1] == len(ladder) - 1
+    assert all(0 <= later - earlier <= 1 for earlier, later in zip(levels, levels[1:]))
+    assert min(ladder[level]["imgsz"] for level in levels) == 416
+
+    levels = feed(controller, 0.01, 5 * (len(ladder) + 3))
+    assert levels[-1] == 0
+    assert all(0 <= earlier - later <= 1 for earlier, later in zip(levels, levels[1:]))
+
+
+def test_holds_the_level_inside_the_headroom():
+    controller = QualityController(quality_ladder(), latency_budget=0.1, window=5, cooldown=5, headroom=0.8)
+    feed(controller, 0.2, 6)
+    assert controller.level == 1
+    # Under the budget but not under 80% of it: neither too slow nor fast enough
+    assert set(feed(controller, 0.09, 50)) == {1}
+    assert controller.adjustments == 1
+
+
+def test_waits_for_the_cooldown_between_adjustments():
+    controller = QualityController(quality_ladder(), latency_budget=0.1, window=5, cooldown=20)
+    levels = feed(controller, 0.2, 46)
+    # The first window adjusts, then a change at most every 20 frames
+    assert levels[5] == 1
+    assert levels.index(2) == 25 and levels.index(3) == 45
+    assert controller.adjustments == 3
+
+
+def test_target_fps_uses_the_measured_rate(monkeypatch):
+    clock = [0.0]
+    monkeypatch.setattr(quality.time, "perf_counter", lambda: clock[0])
+    controller = QualityController(quality_ladder(), target_fps=25, window=10, cooldown=10)
+
+    def run(fps, frames):
+        for _ in range(frames):
+            clock[0] += 1 / fps
+            controller.observe(0.0)
+
+    run(10, 31)
+    assert controller.level == 3
+    run(40, 30)
+    assert controller.level == 0
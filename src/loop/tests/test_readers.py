@@ -0,0 +1,126 @@
+import threading
+import time
+
+import cv2
+import numpy as np
+import pytest
+
+from src.loop.utils.ingest import IngestResizer
+from src.loop.utils.readers import ImagePrefetchReader, LatestFrameReader, VideoPrefetchReader
+
+FRAMES = 40
+
+
+def frame_value(index):
+    return (index * 6) % 250
+
+
+def frame_index(frame):
+    return int(round(float(frame.mean()) / 6))
+
+
+@pytest.fixture(scope="module")
+def video(tmp_path_factory):
+    path = str(tmp_path_factory.mktemp("video") / "clip.avi")
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"MJPG"), 30, (320, 240))
+    for index in range(FRAMES):
+        writer.write(np.full((240, 320, 3), frame_value(index), dtype=np.uint8))
+    writer.release()
+    return path
+
+
+def read_all(reader, hold):
+    """Reads every frame and checks that the last `hold` delivered frames are still intact."""
+    seen, kept = [], []
+    for frame in reader:
+        seen.append(frame_index(frame))
+        kept.append((seen[-1], frame))
+        kept = kept[-hold:] if hold else kept
+        assert [frame_index(old) for _, old in kept] == [index for index, _ in kept]
+    reader.close()
+    return seen
+
+
+@pytest.mark.parametrize("ingest_size", [None, 640, 160])
+@pytest.mark.parametrize("hold", [None, 4])
+def test_video_reader_delivers_every_frame_in_order(video, ingest_size, hold):
+    # ingest 640 on a 320x240 clip is the no-resize case that used to alias one buffer
+    resizer = None
+    if ingest_size:
+        resizer = IngestResizer(ingest_size)
+        resizer.set_source_size(320, 240)
+    reader = VideoPrefetchReader(cv2.VideoCapture(video), prefetch=4, hold=hold, resizer=resizer)
+    assert read_all(reader, hold) == list(range(FRAMES))
+
+
+def test_video_reader_resizes_to_ingest_size(video):
+    resizer = IngestResizer(160)
+    resizer.set_source_size(320, 240)
+    reader = VideoPrefetchReader(cv2.VideoCapture(video), prefetch=2, hold=2, resizer=resizer)
+    shapes = {frame.shape for frame in reader}
+    reader.close()
+    assert shapes == {(120, 160, 3)}
+
+
+def test_resize_without_reduction_fills_dst():
+    resizer = IngestResizer(640)
+    frame = np.full((240, 320, 3), 7, dtype=np.uint8)
+    dst = np.zeros_like(frame)
+    assert resizer.resize(frame, dst) is dst
+    assert (dst == 7).all()
+
+
+def test_image_reader_keeps_order_and_skips_unreadable(tmp_path):
+    paths = []
+    for index in range(12):
+        path = str(tmp_path / f"{index:03d}.png")
+        cv2.imwrite(path, np.full((16, 16, 3), frame_value(index), dtype=np.uint8))
+        paths.append(path)
+    paths.insert(5, str(tmp_path / "missing.png"))
+    reader = ImagePrefetchReader(paths, prefetch=3, workers=4)
+    assert [frame_index(frame) for frame in reader] == list(range(12))
+    reader.close()
+
+
+class BlockingCapture:
+    """A capture whose read blocks until `unblock` is set, like a stalled network stream."""
+
+    def __init__(self):
+        self.unblock = threading.Event()
+        self.released = False
+
+    def read(self):
+        self.unblock.wait()
+        return False, None
+
+    def release(self):
+        self.released = True
+
+
+def test_latest_reader_close_does_not_hang_on_a_blocked_read():
+    cap = BlockingCapture()
+    reader = LatestFrameReader(cap)
+    frames = []
+    consumer = threading.Thread(target=lambda: frames.extend(reader))
+    consumer.start()
+    time.sleep(0.05)
+
+    start = time.perf_counter()
+    assert reader.close(timeout=0.1) is False
+    assert time.perf_counter() - start < 1
+    # The consumer waiting for a frame is woken up, the capture is still in use
+    consumer.join(timeout=1)
+    assert not consumer.is_alive() and frames == []
+    assert not cap.released
+
+    cap.unblock.set()
+    reader._thread.join(timeout=1)
+    assert cap.released
+
+
+def test_latest_reader_close_releases_the_capture(video):
+    cap = cv2.VideoCapture(video)
+    reader = LatestFrameReader(cap)
+    assert next(iter(reader)) is not None
+    assert reader.close() is True
+    assert not cap.isOpened()
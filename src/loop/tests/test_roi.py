@@ -0,0 +1,68 @@
+import numpy as np
+
+from src.loop.utils.boxes import centers_inside
+from src.loop.utils.roi import RoiDetector, region_crop
+from src.loop.tests.stubs import Result
+
+STILL = np.array([10, 10, 30, 30], dtype=np.float32)
+MOVING = np.array([200, 150, 220, 170], dtype=np.float32)
+
+
+class StubModel:
+    """Sees both objects on a full frame and one box in the middle of every crop."""
+
+    def __init__(self, crop_size):
+        self.crop_size = crop_size
+        self.calls = []
+
+    def predict(self, inputs, imgsz, **kwargs):
+        self.calls.append(imgsz)
+        if imgsz == self.crop_size:
+            return [Result([[160, 160, 180, 180]]) for _ in inputs]
+        return [Result([STILL, MOVING]) for _ in inputs]
+
+
+class StubFinder:
+    """Returns the given regions frame by frame."""
+
+    def __init__(self, regions):
+        self.regions = iter(regions)
+
+    def __call__(self, frame):
+        return next(self.regions)
+
+
+def detector(regions, refresh_interval=None):
+    return RoiDetector(StubModel(320), crop_size=320, finder=StubFinder(regions), refresh_interval=refresh_interval)
+
+
+def test_centers_inside():
+    boxes = np.array([[0, 0, 10, 10], [100, 100, 120, 120]], dtype=np.float32)
+    assert centers_inside(boxes, [[0, 0, 50, 50]]).tolist() == [True, False]
+    assert centers_inside(boxes, np.zeros((0, 4))).tolist() == [False, False]
+
+
+def test_cropped_frame_keeps_detections_outside_the_crops():
+    frame = np.zeros((480, 640, 3), dtype=np.uint8)
+    region = np.array([[205, 155, 215, 165]])
+    roi = detector([None, region])
+    first, second = roi([frame, frame])
+    assert [report["roi_status"] for report in roi.last_reports] == ["full", "cropped"]
+    assert len(first[0]) == 2
+
+    x, y, _, _ = region_crop(region[0], 320, 640, 480)
+    boxes = second[0].tolist()
+    # The still object is not covered by the crop and survives; the moving one comes from the crop
+    assert STILL.tolist() in boxes
+    assert [160 + x, 160 + y, 180 + x, 180 + y] in boxes
+    assert MOVING.tolist() not in boxes and len(boxes) == 2
+
+
+def test_skipped_frame_reuses_detections_and_refresh_forces_full_pass():
+    frame = np.zeros((480, 640, 3), dtype=np.uint8)
+    empty = np.zeros((0, 4))
+    roi = detector([None, empty, empty, empty], refresh_interval=2)
+    detections = roi([frame] * 4)
+    assert [report["roi_status"] for report in roi.last_reports] == ["full", "skipped", "full", "skipped"]
+    assert all(len(boxes) == 2 for boxes, _, _ in detections)
+    assert roi.counts == {"skipped": 2, "cropped": 0, "full": 2}
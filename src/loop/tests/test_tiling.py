@@ -0,0 +1,104 @@
+import numpy as np
+import pytest
+
+from src.loop.utils.tiling import TiledDetector, active_tiles, make_tiles, merge_detections, motion_mask
+from src.loop.tests.stubs import Result
+
+
+class BrightSpotModel:
+    """Detects the bright pixels of every input as one box in input coordinates."""
+
+    def __init__(self):
+        self.inputs = []
+        self.kwargs = None
+
+    def predict(self, inputs, **kwargs):
+        self.inputs.append([image.shape[:2] for image in inputs])
+        self.kwargs = kwargs
+        results = []
+        for image in inputs:
+            ys, xs = np.nonzero(image[..., 0] > 127)
+            boxes = [[xs.min(), ys.min(), xs.max() + 1, ys.max() + 1]] if len(xs) else []
+            results.append(Result(boxes))
+        return results
+
+
+def frame_with_drone(x, y, width=1000, height=640):
+    frame = np.zeros((height, width, 3), dtype=np.uint8)
+    frame[y:y + 20, x:x + 20] = 255
+    return frame
+
+
+def test_tiles_cover_the_frame_with_equal_tiles():
+    tiles = make_tiles(1000, 700, tile_size=640, overlap=0.2)
+    assert tiles.tolist() == [[0, 0, 640, 640], [360, 0, 1000, 640], [0, 60, 640, 700], [360, 60, 1000, 700]]
+    assert make_tiles(320, 240, tile_size=640).tolist() == [[0, 0, 320, 240]]
+    with pytest.raises(ValueError):
+        make_tiles(1000, 700, overlap=1)
+
+
+def test_nms_keeps_the_best_box_per_class():
+    boxes = [[0, 0, 10, 10], [1, 0, 11, 10], [0, 0, 10, 10], [50, 50, 60, 60]]
+    merged, class_ids, scores = merge_detections(boxes, [0, 0, 1, 0], [0.6, 0.9, 0.5, 0.7])
+    assert merged.tolist() == [[1, 0, 11, 10], [50, 50, 60, 60], [0, 0, 10, 10]]
+    assert class_ids.tolist() == [0, 0, 1]
+    assert scores.tolist() == pytest.approx([0.9, 0.7, 0.5])
+
+
+def test_wbf_averages_a_group_by_score():
+    merged, _, scores = merge_detections([[0, 0, 10, 10], [2, 0, 12, 10]], [0, 0], [0.75, 0.25], method="wbf")
+    assert merged.tolist() == [[0.5, 0, 10.5, 10]]
+    assert scores.tolist() == [0.75]
+    with pytest.raises(ValueError):
+        merge_detections([], [], [], method="mean")
+
+
+def test_only_tiles_with_motion_are_active():
+    tiles = make_tiles(1000, 640, tile_size=640)
+    still = frame_with_drone(100, 300)[..., 0]
+    moved = frame_with_drone(900, 300)[..., 0]
+    assert active_tiles(tiles, motion_mask(still, still)).tolist() == [False, False]
+    assert active_tiles(tiles, motion_mask(still, frame_with_drone(110, 300)[..., 0])).tolist() == [True, False]
+    assert active_tiles(tiles, motion_mask(still, moved)).tolist() == [True, True]
+
+
+def test_drone_on_a_seam_is_reported_once_in_frame_coordinates():
+    model = BrightSpotModel()
+    detector = TiledDetector(model, tile_size=640, overlap=0.2)
+    [(boxes, class_ids, scores)] = detector([frame_with_drone(400, 300)])
+    # Both tiles and the full frame see the drone
+    assert model.inputs == [[(640, 640), (640, 640), (640, 1000)]]
+    assert boxes.tolist() == [[400, 300, 420, 320]]
+    assert class_ids.tolist() == [0]
+
+
+def test_static_tiles_are_skipped_but_keep_their_detections():
+    model = BrightSpotModel()
+    detector = TiledDetector(model, tile_size=640, full_frame=False, motion_threshold=25)
+    # A hovering drone on the left, then a second drone appears on the right
+    frames = [frame_with_drone(100, 300), frame_with_drone(100, 300), frame_with_drone(100, 300)]
+    frames[2][300:320, 900:920] = 255
+    detections = [detector([frame])[0] for frame in frames]
+    # No tile runs on the static frame, only the right one on the last frame
+    assert [len(inputs) for inputs in model.inputs] == [2, 1]
+    assert [boxes.tolist() for boxes, _, _ in detections] == [
+        [[100, 300, 120, 320]],
+        [[100, 300, 120, 320]],
+        [[100, 300, 120, 320], [900, 300, 920, 320]],
+    ]
+    assert detector.summary() == "Tiles processed: 3/6 (50.0%)"
+
+
+def test_moving_drone_is_not_duplicated_by_the_carried_detections():
+    detector = TiledDetector(BrightSpotModel(), tile_size=640, full_frame=False, motion_threshold=25)
+    detector([frame_with_drone(100, 300)])
+    [(boxes, _, _)] = detector([frame_with_drone(110, 300)])
+    assert boxes.tolist() == [[110, 300, 130, 320]]
+
+
+def test_predict_args_reach_the_model():
+    model = BrightSpotModel()
+    detector = TiledDetector(model, tile_size=640)
+    detector.predict_args = {"conf": 0.5}
+    detector([frame_with_drone(100, 300)])
+    assert model.kwargs == {"conf": 0.5}
@@ -0,0 +1,61 @@
+import numpy as np
+
+from src.loop.utils.tracker import MultiObjectTracker, associate
+
+
+def box(x, y, size=20):
+    return [x, y, x + size, y + size]
+
+
+def test_associate_matches_by_iou_above_threshold():
+    tracks = np.array([box(0, 0), box(100, 100)], dtype=np.float32)
+    dets = np.array([box(102, 101), box(300, 300), box(1, 1)], dtype=np.float32)
+    rows, cols = associate(tracks, dets, 0.3)
+    assert dict(zip(rows.tolist(), cols.tolist())) == {0: 2, 1: 0}
+    assert len(associate(tracks, np.zeros((0, 4)), 0.3)[0]) == 0
+
+
+def test_ids_stay_with_their_objects_after_min_hits():
+    tracker = MultiObjectTracker(min_hits=3)
+    reported = []
+    for step in range(6):
+        # Two drones moving in opposite directions
+        boxes = [box(10 + 5 * step, 50), box(200 - 5 * step, 150)]
+        _, _, _, ids = tracker.update(boxes, [0, 1], [0.9, 0.8])
+        reported.append(ids.tolist())
+    assert reported[:2] == [[], []]
+    assert all(sorted(ids) == [1, 2] for ids in reported[2:])
+
+    out_boxes, class_ids, _, ids = tracker.update([box(40, 50), box(170, 150)], [0, 1], [0.9, 0.8])
+    by_id = dict(zip(ids.tolist(), class_ids.tolist()))
+    assert by_id == {1: 0, 2: 1}
+    assert abs(out_boxes[ids.tolist().index(1)][0] - 40) < 3
+
+
+def test_low_score_detection_keeps_but_does_not_start_a_track():
+    tracker = MultiObjectTracker(min_hits=1)
+    tracker.update([box(50, 50)], [0], [0.9])
+    _, _, scores, ids = tracker.update([box(51, 50), box(300, 300)], [0, 0], [0.2, 0.2])
+    assert ids.tolist() == [1]
+    assert scores.tolist() == [np.float32(0.2)]
+    assert len(tracker) == 1
+
+
+def test_unmatched_track_is_dropped_after_max_age():
+    tracker = MultiObjectTracker(min_hits=1, max_age=2)
+    tracker.update([box(50, 50)], [0], [0.9])
+    for _ in range(2):
+        _, _, _, ids = tracker.update([], [], [])
+        assert len(ids) == 0
+        assert len(tracker) == 1
+    tracker.update([], [], [])
+    assert len(tracker) == 0
+
+
+def test_coast_moves_tracks_along_their_velocity():
+    tracker = MultiObjectTracker(min_hits=1)
+    for step in range(8):
+        tracker.update([box(10 * step, 50)], [0], [0.9])
+    boxes, _, _, ids = tracker.coast()
+    assert ids.tolist() == [1]
+    assert 75 < boxes[0][0] < 85
@@ -0,0 +1,70 @@
+import os
+
+import cv2
+import numpy as np
+import pytest
+
+from src.loop.utils import writers
+from src.loop.utils.writers import AsyncWriter, FFmpegWriter, ffmpeg_command, open_video_writer
+
+
+def option(command, name):
+    return command[command.index(name) + 1] if name in command else None
+
+
+def test_preset_only_for_encoders_that_take_it():
+    assert option(ffmpeg_command("ffmpeg", "out.mp4", 640, 480, 30, "libx264", "veryfast"), "-preset") == "veryfast"
+    assert option(ffmpeg_command("ffmpeg", "out.mp4", 640, 480, 30, "h264_qsv", "veryfast"), "-preset") == "veryfast"
+    assert option(ffmpeg_command("ffmpeg", "out.mp4", 640, 480, 30, "h264_nvenc", "veryfast"), "-preset") == "p2"
+    assert "-preset" not in ffmpeg_command("ffmpeg", "out.mp4", 640, 480, 30, "hevc_vaapi", "veryfast")
+    assert "-preset" not in ffmpeg_command("ffmpeg", "out.mp4", 640, 480, 30, "h264_videotoolbox", "veryfast")
+    assert "-crf" not in ffmpeg_command("ffmpeg", "out.mp4", 640, 480, 30, "h264_nvenc")
+
+
+def test_odd_frame_sides_are_padded_for_yuv420p():
+    assert "-vf" not in ffmpeg_command("ffmpeg", "out.mp4", 640, 480, 30)
+    command = ffmpeg_command("ffmpeg", "out.mp4", 641, 481, 30)
+    assert option(command, "-s") == "641x481"
+    assert option(command, "-vf") == "pad=ceil(iw/2)*2:ceil(ih/2)*2"
+    assert command[-3:] == ["-pix_fmt", "yuv420p", "out.mp4"]
+
+
+@pytest.mark.parametrize("sink", ["mjpeg", "images"])
+def test_async_writer_writes_every_frame(tmp_path, sink):
+    writer = open_video_writer(str(tmp_path), "clip", 64, 48, 12, sink=sink, queue_size=2)
+    assert isinstance(writer, AsyncWriter)
+    for index in range(10):
+        writer.write(np.full((48, 64, 3), index * 20, dtype=np.uint8))
+    writer.release()
+    assert writer.writer.frames == 10
+    if sink == "images":
+        assert len(os.listdir(tmp_path / "clip")) == 10
+    else:
+        cap = cv2.VideoCapture(str(tmp_path / "clip.avi"))
+        assert cap.get(cv2.CAP_PROP_FPS) == pytest.approx(12)
+        assert int(cap.get(cv2.CAP_PROP_FRAME_COUNT)) == 10
+        cap.release()
+
+
+def test_unknown_sink_is_rejected(tmp_path):
+    with pytest.raises(ValueError):
+        open_video_writer(str(tmp_path), "clip", 64, 48, sink="gif")
+
+
+@pytest.mark.skipif(os.name == "nt", reason="the stand-in ffmpeg is a shell script")
+@pytest.mark.parametrize("exit_code", [0, 1])
+def test_ffmpeg_exit_code_is_checked(tmp_path, monkeypatch, exit_code):
+    # Reads every frame like ffmpeg would, then exits with the given code
+    fake = tmp_path / "ffmpeg"
+    fake.write_text(f"#!/bin/sh\ncat > /dev/null\necho 'Unknown encoder' >&2\nexit {exit_code}\n")
+    fake.chmod(0o755)
+    monkeypatch.setattr(writers.shutil, "which", lambda name: str(fake))
+
+    writer = FFmpegWriter(str(tmp_path / "out.mp4"), 32, 24, 25)
+    for _ in range(3):
+        writer.write(np.zeros((24, 32, 3), dtype=np.uint8))
+    if exit_code:
+        with pytest.raises(RuntimeError, match="exit code 1.*Unknown encoder"):
+            writer.release()
+    else:
+        writer.release()
@@ -0,0 +1,233 @@
+import hashlib
+import os
+import time
+
+from ultralytics import YOLO
+from src.loop.utils.boxes import box_iou, greedy_match
+from src.loop.utils.process import get_frame_iterator, detect_frames
+
+# Export arguments of every backend; "torch" runs the weights as they are.
+# A new backend only needs an entry here if ultralytics can export and load it.
+EXPORT_ARGS = {
+    "torch": None,
+    "onnx": {"format": "onnx", "dynamic": True, "simplify": True},
+    "openvino": {"format": "openvino", "dynamic": True},
+    "openvino-int8": {"format": "openvino", "int8": True},
+}
+BACKENDS = tuple(EXPORT_ARGS)
+
+
+def weights_path(model):
+    """Returns the path of the weights behind a YOLO instance or a path."""
+    if isinstance(model, str):
+        return model
+    path = getattr(model, "ckpt_path", None) or getattr(model, "model_name", None)
+    if not path:
+        raise ValueError("Cannot find the weights of the model, pass the path to the .pt file instead.")
+    return str(path)
+
+
+def calibration_id(data):
+    """
+    Returns a short identity of the INT8 calibration data.
+
+    A local dataset yaml is identified by its absolute path and modification time, so editing
+    it (e.g. pointing it at other calibration images) gives a new identity. A name that is not
+    a local file, such as a dataset known to ultralytics, is identified by the name alone.
+
+    Args:
+        data (str): Dataset yaml used for calibration.
+
+    Returns:
+        str: Hex digest of 8 characters.
+    """
+    if os.path.isfile(data):
+        stat = os.stat(data)
+        identity = f"{os.path.abspath(data)}:{stat.st_mtime_ns}:{stat.st_size}"
+    else:
+        identity = str(data)
+    return hashlib.blake2b(identity.encode(), digest_size=4).hexdigest()
+
+
+def export_path(weights, backend, imgsz=640, data=None):
+    """
+    Returns where the export of a backend is kept next to the weights.
+
+    The inference size, the precision flags and, for INT8, the calibration data are baked
+    into an export, so they are part of the name and an export made with other settings is
+    never picked up.
+
+    Args:
+        weights (str): Path to the trained `.pt` weights.
+        backend (str): One of `BACKENDS` other than "torch".
+        imgsz (int, optional): Inference size baked into the export. Defaults to 640.
+        data (str, optional): Dataset yaml used to calibrate INT8 quantization. Defaults to None.
+
+    Returns:
+        str: Path of the exported file or directory.
+    """
+    args = EXPORT_ARGS[backend]
+    flags = "".join(f"_{flag}" for flag in ("half", "int8") if args.get(flag))
+    if args.get("int8") and data:
+        flags += f"_{calibration_id(data)}"
+    stem = f"{os.path.splitext(weights)[0]}_{imgsz}{flags}"
+    if args["format"] == "onnx":
+        return f"{stem}.onnx"
+    # ultralytics recognizes an OpenVINO model by the suffix of its directory
+    return f"{stem}_openvino_model"
+
+
+def export_model(weights, backend, imgsz=640, data=None):
+    """
+    Exports trained weights for a faster CPU backend, reusing a previous export when it exists.
+
+    Args:
+        weights (str): Path to the trained `.pt` weights.
+        backend (str): One of `BACKENDS`.
+        imgsz (int, optional): Inference size baked into the export. Defaults to 640.
+        data (str, optional): Dataset yaml used to calibrate INT8 quantization. Defaults to None.
+
+    Returns:
+        str: Path of the exported model (file or directory) that `YOLO` can load.
+
+    Raises:
+        ValueError: If the backend is unknown or INT8 calibration data is missing.
+    """
+    if backend not in EXPORT_ARGS:
+        raise ValueError(f"Unknown backend: {backend}. Expected one of {BACKENDS}.")
+    args = EXPORT_ARGS[backend]
+    if args is None:
+        return weights
+    if args.get("int8") and not data:
+        raise ValueError(f"Backend '{backend}' needs a dataset yaml (`data`) for INT8 calibration.")
+
+    expected = export_path(weights, backend, imgsz, data)
+    if os.path.exists(expected):
+        return expected
+
+    export_args = dict(args, imgsz=imgsz)
+    if data:
+        export_args["data"] = data
+    exported = YOLO(weights).export(**export_args)
+    os.replace(exported, expected)
+    return expected
+
+
+def load_backend(model, backend="torch", imgsz=640, data=None):
+    """
+    Loads a model for the given inference backend.
+
+    The result is always a `YOLO` instance (ultralytics picks the runtime from the exported
+    file), so `detect_frames` and the rest of the loop work unchanged and return the same
+    `boxes`/`class_ids`/`scores` arrays for every backend.
+
+    With the "torch" backend an already loaded model is returned as it is, which also lets
+    any object with a YOLO-compatible `predict` (e.g. the benchmark stand-in) run the loop.
+
+    Args:
+        model (YOLO or str): Trained model or path to its `.pt` weights.
+        backend (str, optional): One of `BACKENDS`. Defaults to "torch".
+        imgsz (int, optional): Inference size baked into the export. Defaults to 640.
+        data (str, optional): Dataset yaml used to calibrate INT8 quantization. Defaults to None.
+
+    Returns:
+        YOLO: Model running on the requested backend.
+    """
+    if backend == "torch":
+        return YOLO(model) if isinstance(model, (str, os.PathLike)) else model
+    exported = export_model(weights_path(model), backend, imgsz, data)
+    return YOLO(exported, task="detect")
+
+
+def _read_sample(video=None, frames_dir=None, max_frames=100):
+    frame_iterator, _, cap = get_frame_iterator(video=video, frames_dir=frames_dir)
+    frames = []
+    for frame in frame_iterator:
+        frames.append(frame)
+        if len(frames) == max_frames:
+            break
+    if cap:
+        cap.release()
+    return frames
+
+
+def compare_detections(reference, candidate, iou_threshold=0.5):
+    """
+    Compares the detections of two backends on the same frames.
+
+    Args:
+        reference (list[tuple]): Per-frame detections of the reference backend.
+        candidate (list[tuple]): Per-frame detections of the compared backend.
+        iou_threshold (float, optional): Minimum IoU for two detections to be the same object. Defaults to 0.5.
+
+    Returns:
+        dict: Matched, missing and extra detections, class mismatches, mean IoU and
+        mean absolute score delta of the matches.
+    """
+    delta = {"matched": 0, "missing": 0, "extra": 0, "class_mismatch": 0, "mean_iou": 0.0, "mean_score_delta": 0.0}
+    ious, score_deltas = [], []
+    for (ref_boxes, ref_classes, ref_scores), (boxes, class_ids, scores) in zip(reference, candidate):
+        iou = box_iou(ref_boxes, boxes)
+        rows, cols = greedy_match(iou, iou_threshold)
+        delta["matched"] += len(rows)
+        delta["missing"] += len(ref_boxes) - len(rows)
+        delta["extra"] += len(boxes) - len(cols)
+        delta["class_mismatch"] += int((ref_classes[rows] != class_ids[cols]).sum())
+        ious.extend(iou[rows, cols])
+        score_deltas.extend(abs(ref_scores[rows] - scores[cols]))
+    if ious:
+        delta["mean_iou"] = float(sum(ious) / len(ious))
+        delta["mean_score_delta"] = float(sum(score_deltas) / len(score_deltas))
+    return delta
+
+
+def compare_backends(weights, video=None, frames_dir=None, backends=("torch", "onnx"), max_frames=100,
+                     batch_size=1, imgsz=640, data=None):
+    """
+    Runs several backends on a sample clip and reports their detection delta and speedup.
+
+    The first backend is the reference. Every backend gets one warm-up call that is not timed.
+
+    Args:
+        weights (str): Path to the trained `.pt` weights.
+        video (str, optional): Path to the sample video. Defaults to None.
+        frames_dir (str, optional): Path to the directory with sample frames. Defaults to None.
+        backends (tuple, optional): Backends to compare. Defaults to ("torch", "onnx").
+        max_frames (int, optional): Number of frames of the sample. Defaults to 100.
+        batch_size (int, optional): Number of frames per predict call. Defaults to 1.
+        imgsz (int, optional): Inference size baked into the exports. Defaults to 640.
+        data (str, optional): Dataset yaml used to calibrate INT8 quantization. Defaults to None.
+
+    Returns:
+        dict: Per backend the fps, the speedup against the reference and the detection delta.
+    """
+    frames = _read_sample(video, frames_dir, max_frames)
+    report, reference, reference_time = {}, None, None
+
+    for backend in backends:
+        model = load_backend(weights, backend, imgsz, data)
+        detect_frames(frames[:1], model)
+
+        start = time.perf_counter()
+        detections = []
+        for i in range(0, len(frames), batch_size):
+            detections.extend(detect_frames(frames[i:i + batch_size], model))
+        elapsed = time.perf_counter() - start
+
+        if reference is None:
+            reference, reference_time = detections, elapsed
+        report[backend] = {
+            "fps": len(frames) / elapsed if elapsed > 0 else 0.0,
+            "speedup": reference_time / elapsed if elapsed > 0 else 0.0,
+            **compare_detections(reference, detections),
+        }
+
+    print(f"Backend parity on {len(frames)} frames (reference: {backends[0]}):")
+    for backend, row in report.items():
+        print(
+            f"  {backend:<14} fps={row['fps']:7.1f} speedup={row['speedup']:5.2f}x "
+            f"matched={row['matched']} missing={row['missing']} extra={row['extra']} "
+            f"class_mismatch={row['class_mismatch']} mean_iou={row['mean_iou']:.3f} "
+            f"score_delta={row['mean_score_delta']:.3f}"
+        )
+    return report
@@ -0,0 +1,90 @@
+import numpy as np
+
+
+def box_iou(boxes_a, boxes_b):
+    """
+    Computes the pairwise IoU of two sets of boxes.
+
+    Args:
+        boxes_a (np.ndarray): Array of shape (N, 4) with boxes [x_min, y_min, x_max, y_max].
+        boxes_b (np.ndarray): Array of shape (M, 4) with boxes [x_min, y_min, x_max, y_max].
+
+    Returns:
+        np.ndarray: Array of shape (N, M) with the IoU of every pair.
+    """
+    boxes_a = np.asarray(boxes_a, dtype=np.float32).reshape(-1, 4)
+    boxes_b = np.asarray(boxes_b, dtype=np.float32).reshape(-1, 4)
+
+    top_left = np.maximum(boxes_a[:, None, :2], boxes_b[None, :, :2])
+    bottom_right = np.minimum(boxes_a[:, None, 2:], boxes_b[None, :, 2:])
+    intersection = np.prod(np.clip(bottom_right - top_left, 0, None), axis=2)
+
+    area_a = np.prod(boxes_a[:, 2:] - boxes_a[:, :2], axis=1)
+    area_b = np.prod(boxes_b[:, 2:] - boxes_b[:, :2], axis=1)
+    union = area_a[:, None] + area_b[None, :] - intersection
+    return np.where(union > 0, intersection / np.maximum(union, 1e-9), 0.0)
+
+
+def clip_boxes(boxes, width, height):
+    """
+    Clips boxes to the frame bounds.
+
+    Args:
+        boxes (np.ndarray): Array of shape (N, 4) with boxes [x_min, y_min, x_max, y_max].
+        width (int): Width of the frame.
+        height (int): Height of the frame.
+
+    Returns:
+        np.ndarray: The clipped boxes.
+    """
+    boxes = np.asarray(boxes, dtype=np.float32).reshape(-1, 4).copy()
+    boxes[:, [0, 2]] = np.clip(boxes[:, [0, 2]], 0, width)
+    boxes[:, [1, 3]] = np.clip(boxes[:, [1, 3]], 0, height)
+    return boxes
+
+
+def centers_inside(boxes, windows):
+    """
+    Tells which boxes have their center inside at least one of the windows.
+
+    Args:
+        boxes (np.ndarray): Boxes [x_min, y_min, x_max, y_max].
+        windows (np.ndarray): Windows [x_min, y_min, x_max, y_max].
+
+    Returns:
+        np.ndarray: Boolean array, True for boxes centered in a window.
+    """
+    boxes = np.asarray(boxes, dtype=np.float32).reshape(-1, 4)
+    windows = np.asarray(windows, dtype=np.float32).reshape(-1, 4)
+    centers = (boxes[:, None, :2] + boxes[:, None, 2:]) / 2
+    inside = (centers >= windows[None, :, :2]) & (centers < windows[None, :, 2:])
+    return inside.all(axis=2).any(axis=1)
+
+
+def greedy_match(iou, threshold):
+    """
+    Matches rows to columns of an IoU matrix, best pairs first.
+
+    Args:
+        iou (np.ndarray): Array of shape (N, M) with pairwise IoU.
+        threshold (float): Minimum IoU of a match.
+
+    Returns:
+        tuple:
+            - np.ndarray: Matched row indices.
+            - np.ndarray: Matched column indices.
+    """
+    rows, cols = [], []
+    if iou.size:
+        order = np.argsort(-iou, axis=None)
+        used_rows = np.zeros(iou.shape[0], dtype=bool)
+        used_cols = np.zeros(iou.shape[1], dtype=bool)
+        for row, col in zip(*np.unravel_index(order, iou.shape)):
+            if iou[row, col] < threshold:
+                break
+            if used_rows[row] or used_cols[col]:
+                continue
+            used_rows[row] = used_cols[col] = True
+            rows.append(row)
+            cols.append(col)
+    return np.array(rows, dtype=int), np.array(cols, dtype=int)
@@ -0,0 +1,181 @@
+import hashlib
+import json
+import os
+import sqlite3
+import time
+
+import numpy as np
+
+
+def file_digest(path, chunk_size=1 << 20):
+    """
+    Hashes the content of a file.
+
+    Args:
+        path (str): Path to the file.
+        chunk_size (int, optional): Bytes read at once. Defaults to 1 MB.
+
+    Returns:
+        str: Hex digest of the file.
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def frame_digest(frame):
+    """Hashes the pixels and the shape of a frame."""
+    digest = hashlib.blake2b(np.ascontiguousarray(frame).data, digest_size=16)
+    digest.update(str(frame.shape).encode())
+    return digest.hexdigest()
+
+
+def cache_namespace(weights_digest, params, source_digest=None):
+    """
+    Combines everything that determines the detections of a run, except the frame itself.
+
+    Args:
+        weights_digest (str): Hash of the model weights.
+        params (dict): Inference parameters (backend, tiling, ROI, ingest size, ...), JSON serializable.
+        source_digest (str, optional): Hash of the source file; frames are then keyed by index. Defaults to None.
+
+    Returns:
+        str: Prefix of the cache keys of the run.
+    """
+    payload = json.dumps({"weights": weights_digest, "params": params, "source": source_digest}, sort_keys=True)
+    return hashlib.blake2b(payload.encode(), digest_size=16).hexdigest()
+
+
+def _pack(boxes, class_ids, scores):
+    boxes = np.asarray(boxes, dtype=np.float32).reshape(-1, 4)
+    count = np.array([len(boxes)], dtype=np.int32)
+    return b"".join([
+        count.tobytes(),
+        boxes.tobytes(),
+        np.asarray(class_ids, dtype=np.int32).tobytes(),
+        np.asarray(scores, dtype=np.float32).tobytes(),
+    ])
+
+
+def _unpack(data):
+    count = int(np.frombuffer(data, dtype=np.int32, count=1)[0])
+    offset = 4
+    boxes = np.frombuffer(data, dtype=np.float32, count=count * 4, offset=offset).reshape(count, 4)
+    offset += count * 16
+    class_ids = np.frombuffer(data, dtype=np.int32, count=count, offset=offset).astype(int)
+    offset += count * 4
+    scores = np.frombuffer(data, dtype=np.float32, count=count, offset=offset)
+    return boxes.copy(), class_ids, scores.copy()
+
+
+class DetectionCache:
+    """
+    Persistent, size-bounded store of per-frame detections (an SQLite file).
+
+    Entries are evicted least recently used first once the stored detections exceed
+    `max_bytes`. Writes and LRU updates are committed every `flush_every` changes and on
+    `close`, so lookups stay cheap inside the loop.
+
+    Args:
+        path (str): Path of the cache file, created if missing.
+        max_bytes (int, optional): Size limit of the stored detections. Defaults to 512 MB.
+        flush_every (int, optional): Changes between commits. Defaults to 256.
+    """
+
+    def __init__(self, path, max_bytes=512 * 1024 * 1024, flush_every=256):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.path = path
+        self.max_bytes = max_bytes
+        self.flush_every = flush_every
+        self.hits = 0
+        self.misses = 0
+        self.evicted = 0
+        self._changes = 0
+        # The infer stage may run on a pipeline thread; it is the only user of the connection
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS detections "
+            "(key TEXT PRIMARY KEY, data BLOB NOT NULL, size INTEGER NOT NULL, last_used REAL NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS detections_last_used ON detections (last_used)")
+        self.size = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM detections").fetchone()[0]
+
+    def get(self, key):
+        """
+        Looks up the detections of a frame.
+
+        Args:
+            key (str): Key of the frame.
+
+        Returns:
+            tuple or None: Boxes, class indices and probabilities, None on a miss.
+        """
+        row = self._db.execute("SELECT data FROM detections WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._db.execute("UPDATE detections SET last_used = ? WHERE key = ?", (time.time(), key))
+        self._changed()
+        return _unpack(row[0])
+
+    def put(self, key, boxes, class_ids, scores):
+        """
+        Stores the detections of a frame.
+
+        Args:
+            key (str): Key of the frame.
+            boxes (np.ndarray): Boxes [x_min, y_min, x_max, y_max].
+            class_ids (np.ndarray): Class indices.
+            scores (np.ndarray): Probabilities for each detection.
+        """
+        data = _pack(boxes, class_ids, scores)
+        previous = self._db.execute("SELECT size FROM detections WHERE key = ?", (key,)).fetchone()
+        self._db.execute(
+            "INSERT OR REPLACE INTO detections (key, data, size, last_used) VALUES (?, ?, ?, ?)",
+            (key, data, len(data), time.time()),
+        )
+        self.size += len(data) - (previous[0] if previous else 0)
+        self._changed()
+
+    def flush(self):
+        """Evicts entries over the size limit and commits the pending changes."""
+        if self.size > self.max_bytes:
+            self._evict()
+        self._db.commit()
+        self._changes = 0
+
+    def close(self):
+        """Flushes and closes the cache file."""
+        self.flush()
+        self._db.close()
+
+    def summary(self):
+        lookups = self.hits + self.misses
+        rate = self.hits / lookups if lookups else 0.0
+        return (
+            f"Detection cache: {self.hits} hits, {self.misses} misses ({rate:.0%} hit rate), "
+            f"{self.evicted} evicted, {self.size / (1024 * 1024):.1f} MB"
+        )
+
+    def _changed(self):
+        self._changes += 1
+        if self._changes >= self.flush_every:
+            self.flush()
+
+    def _evict(self):
+        # Evict down to 90% of the limit so that eviction does not run on every flush
+        target = self.max_bytes * 0.9
+        while self.size > target:
+            rows = self._db.execute("SELECT key, size FROM detections ORDER BY last_used LIMIT 256").fetchall()
+            if not rows:
+                self.size = 0
+                break
+            # Only the oldest entries needed to get under the target, not the whole chunk
+            excess = np.cumsum([size for _, size in rows]) - (self.size - target)
+            rows = rows[:int(np.searchsorted(excess, 0, side="left")) + 1]
+            self._db.executemany("DELETE FROM detections WHERE key = ?", [(key,) for key, _ in rows])
+            self.size -= sum(size for _, size in rows)
+            self.evicted += len(rows)
@@ -0,0 +1,231 @@
+import json
+import os
+
+import numpy as np
+
+COLUMNS = ("frame_id", "timestamp", "x_min", "y_min", "x_max", "y_max", "class_id", "score", "track_id")
+
+
+class DetectionSink:
+    """
+    Base class of the append-only detection streams.
+
+    Detections are buffered as numpy columns and handed to `_write_rows` every
+    `batch_size` frames, so logging costs one vectorized write per batch instead of a
+    formatted print per frame. One row is written per detection.
+
+    Args:
+        path (str): Path of the output file.
+        batch_size (int, optional): Number of frames buffered before a write. Defaults to 256.
+    """
+
+    def __init__(self, path, batch_size=256):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.path = path
+        self.batch_size = batch_size
+        self.rows = 0
+        self._frames = 0
+        self._buffer = []
+
+    def write(self, frame_id, timestamp, boxes, class_ids, scores, track_ids=None):
+        """
+        Appends the detections of one frame.
+
+        Args:
+            frame_id (int): Index of the frame in the source.
+            timestamp (float): Capture time of the frame (seconds since the epoch).
+            boxes (np.ndarray): Boxes [x_min, y_min, x_max, y_max].
+            class_ids (np.ndarray): Class indices.
+            scores (np.ndarray): Probabilities for each detection.
+            track_ids (np.ndarray, optional): Track ID of each detection. Defaults to None (-1).
+        """
+        count = len(boxes)
+        if count:
+            if track_ids is None:
+                track_ids = np.full(count, -1, dtype=np.int64)
+            self._buffer.append((
+                np.full(count, frame_id, dtype=np.int64),
+                np.full(count, timestamp, dtype=np.float64),
+                np.asarray(boxes, dtype=np.float32).reshape(-1, 4),
+                np.asarray(class_ids, dtype=np.int64),
+                np.asarray(scores, dtype=np.float32),
+                np.asarray(track_ids, dtype=np.int64),
+            ))
+        self._frames += 1
+        if self._frames >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        """Writes the buffered detections."""
+        if self._buffer:
+            frame_ids, timestamps, boxes, class_ids, scores, track_ids = (
+                np.concatenate(column) for column in zip(*self._buffer)
+            )
+            columns = {
+                "frame_id": frame_ids,
+                "timestamp": timestamps,
+                "x_min": boxes[:, 0],
+                "y_min": boxes[:, 1],
+                "x_max": boxes[:, 2],
+                "y_max": boxes[:, 3],
+                "class_id": class_ids,
+                "score": scores,
+                "track_id": track_ids,
+            }
+            self._write_rows(columns)
+            self.rows += len(frame_ids)
+        self._buffer = []
+        self._frames = 0
+
+    def close(self):
+        """Flushes the buffer and closes the file."""
+        self.flush()
+
+    def _write_rows(self, columns):
+        raise NotImplementedError
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+class JsonlSink(DetectionSink):
+    """Writes one JSON object per detection and line; `track_id` is null when tracking is off."""
+
+    def __init__(self, path, batch_size=256):
+        super().__init__(path, batch_size)
+        self._file = open(path, "w")
+
+    def _write_rows(self, columns):
+        names = list(columns)
+        lines = []
+        for values in zip(*(columns[name].tolist() for name in names)):
+            row = dict(zip(names, values))
+            if row["track_id"] < 0:
+                row["track_id"] = None
+            lines.append(json.dumps(row))
+        self._file.write("\n".join(lines) + "\n")
+
+    def close(self):
+        super().close()
+        self._file.close()
+
+
+class ParquetSink(DetectionSink):
+    """Writes a Parquet file with one row group per flushed batch (requires `pyarrow`)."""
+
+    def __init__(self, path, batch_size=256):
+        try:
+            import pyarrow
+            import pyarrow.parquet
+        except ImportError as e:
+            raise ImportError("Parquet output requires pyarrow: pip install pyarrow") from e
+        super().__init__(path, batch_size)
+        self._pa = pyarrow
+        self._writer = pyarrow.parquet.ParquetWriter(path, pyarrow.schema([
+            ("frame_id", pyarrow.int64()),
+            ("timestamp", pyarrow.float64()),
+            ("x_min", pyarrow.float32()),
+            ("y_min", pyarrow.float32()),
+            ("x_max", pyarrow.float32()),
+            ("y_max", pyarrow.float32()),
+            ("class_id", pyarrow.int64()),
+            ("score", pyarrow.float32()),
+            ("track_id", pyarrow.int64()),
+        ]))
+
+    def _write_rows(self, columns):
+        arrays = dict(columns)
+        arrays["track_id"] = self._pa.array(columns["track_id"], mask=columns["track_id"] < 0)
+        self._writer.write_table(self._pa.table(arrays, schema=self._writer.schema))
+
+    def close(self):
+        super().close()
+        self._writer.close()
+
+
+class CocoResultsSink(DetectionSink):
+    """
+    Writes a COCO results JSON array that `COCOEvalTool` / `COCO.loadRes` consumes directly.
+
+    `COCO.loadRes` rejects an empty results list, so a run without any detection writes no
+    file (an older file at the path is removed) and prints a notice instead.
+
+    Args:
+        path (str): Path of the output file.
+        batch_size (int, optional): Number of frames buffered before a write. Defaults to 256.
+        image_id_offset (int, optional): Added to the frame index to get the COCO `image_id`;
+            1 matches the CVAT exports. Defaults to 1.
+        category_offset (int, optional): Added to the class index to get the COCO
+            `category_id`; 1 matches `YoloToCoco`. Defaults to 1.
+    """
+
+    def __init__(self, path, batch_size=256, image_id_offset=1, category_offset=1):
+        super().__init__(path, batch_size)
+        self.image_id_offset = image_id_offset
+        self.category_offset = category_offset
+        # Opened with the first detection, so that a run without any leaves no empty array
+        self._file = None
+
+    def _write_rows(self, columns):
+        x_min = columns["x_min"].astype(np.float64)
+        y_min = columns["y_min"].astype(np.float64)
+        widths = columns["x_max"].astype(np.float64) - x_min
+        heights = columns["y_max"].astype(np.float64) - y_min
+        entries = []
+        for frame_id, class_id, x, y, w, h, score in zip(
+            columns["frame_id"].tolist(),
+            columns["class_id"].tolist(),
+            np.round(x_min, 2).tolist(),
+            np.round(y_min, 2).tolist(),
+            np.round(widths, 2).tolist(),
+            np.round(heights, 2).tolist(),
+            np.round(columns["score"].astype(np.float64), 5).tolist(),
+        ):
+            entries.append(json.dumps({
+                "image_id": frame_id + self.image_id_offset,
+                "category_id": class_id + self.category_offset,
+                "bbox": [x, y, w, h],
+                "score": score,
+            }))
+        if self._file is None:
+            self._file = open(self.path, "w")
+            self._file.write("[" + ",\n".join(entries))
+        else:
+            self._file.write(",\n" + ",\n".join(entries))
+
+    def close(self):
+        super().close()
+        if self._file is None:
+            if os.path.exists(self.path):
+                os.remove(self.path)
+            print(f"No detections, COCO results file {self.path} not written")
+            return
+        self._file.write("]\n")
+        self._file.close()
+
+
+def open_detection_sink(path, batch_size=256):
+    """
+    Creates the detection sink matching the extension of the output path.
+
+    Args:
+        path (str): `.jsonl` for JSON lines, `.parquet` for Parquet, `.json` for COCO results.
+        batch_size (int, optional): Number of frames buffered before a write. Defaults to 256.
+
+    Returns:
+        DetectionSink: The opened sink.
+
+    Raises:
+        ValueError: If the extension is not supported.
+    """
+    extension = os.path.splitext(path)[1].lower()
+    if extension == ".jsonl":
+        return JsonlSink(path, batch_size)
+    if extension == ".parquet":
+        return ParquetSink(path, batch_size)
+    if extension == ".json":
+        return CocoResultsSink(path, batch_size)
+    raise ValueError(f"Unsupported detections output: {path}. Use .jsonl, .parquet or .json (COCO results).")
@@ -0,0 +1,124 @@
+import sys
+import threading
+import time
+
+import cv2
+
+ESC_KEY = 27
+
+
+class DisplayThread:
+    """
+    Shows annotated frames in a window at its own refresh rate, off the critical path of the loop.
+
+    `show` only keeps the newest frame (a copy, so the caller may reuse its buffer) and
+    returns immediately; frames arriving faster than `refresh_rate`, or while the previous one
+    is still waiting to be drawn, are skipped. Whoever owns the window draws the pending
+    frame, pumps the GUI events and sets `cancelled` when ESC is pressed.
+
+    By default a background thread owns the window. HighGUI only works from the main thread
+    on macOS (and with some Qt builds), so there the window belongs to the main thread
+    instead (`background=False`): `show` draws right away when it is called on the main
+    thread, and while the frames are produced on other threads the main thread has to run
+    `run_until` to draw them.
+
+    Args:
+        window (str, optional): Name of the window. Defaults to "cam".
+        refresh_rate (float, optional): Maximum frames shown per second. Defaults to 30.
+        size (tuple, optional): Size (width, height) the frames are shown at. Defaults to (640, 640).
+        background (bool, optional): Whether a background thread owns the window. Defaults to
+            None (True except on macOS).
+    """
+
+    def __init__(self, window="cam", refresh_rate=30, size=(640, 640), background=None):
+        self.window = window
+        self.interval = 1 / refresh_rate
+        self.size = size
+        self.background = sys.platform != "darwin" if background is None else background
+        self.shown = 0
+        self.skipped = 0
+        self.cancelled = threading.Event()
+        self._pending = None
+        self._next_due = 0.0
+        self._stopped = False
+        self._window_open = False
+        self._condition = threading.Condition()
+        self._thread = None
+        if self.background:
+            self._thread = threading.Thread(target=self._run, name="display", daemon=True)
+            self._thread.start()
+
+    def show(self, frame):
+        """
+        Hands a frame to the owner of the window.
+
+        Args:
+            frame (np.ndarray): The annotated frame.
+        """
+        now = time.perf_counter()
+        if now < self._next_due:
+            self.skipped += 1
+            return
+        self._next_due = now + self.interval
+        frame = frame.copy()
+        with self._condition:
+            if self._pending is not None:
+                self.skipped += 1
+            self._pending = frame
+            self._condition.notify()
+        if not self.background and threading.current_thread() is threading.main_thread():
+            self.pump()
+
+    def pump(self):
+        """Draws the pending frame and handles the GUI events; call it from the thread owning the window."""
+        if not self._window_open:
+            cv2.namedWindow(self.window, cv2.WINDOW_NORMAL)
+            self._window_open = True
+        with self._condition:
+            frame, self._pending = self._pending, None
+        if frame is not None:
+            cv2.imshow(self.window, cv2.resize(frame, self.size))
+            self.shown += 1
+        if cv2.waitKey(1) == ESC_KEY:
+            self.cancelled.set()
+
+    def run_until(self, finished):
+        """
+        Draws the frames handed over by other threads on the calling (main) thread.
+
+        Args:
+            finished (Callable): Returns True once no more frames will come.
+        """
+        while not finished():
+            with self._condition:
+                if self._pending is None:
+                    # Wake up regularly anyway so the window stays responsive
+                    self._condition.wait(self.interval)
+            self.pump()
+
+    def close(self):
+        """Stops the display thread and closes the window."""
+        if self._thread is not None:
+            with self._condition:
+                self._stopped = True
+                self._condition.notify()
+            self._thread.join()
+        elif self._window_open:
+            cv2.destroyWindow(self.window)
+            self._window_open = False
+
+    def summary(self):
+        return f"Display: {self.shown} frames shown, {self.skipped} skipped"
+
+    def _run(self):
+        try:
+            while True:
+                with self._condition:
+                    if self._pending is None and not self._stopped:
+                        self._condition.wait(self.interval)
+                    if self._stopped:
+                        return
+                self.pump()
+        finally:
+            if self._window_open:
+                cv2.destroyWindow(self.window)
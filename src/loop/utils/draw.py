@@ -1,62 +1,151 @@
 import cv2
 import numpy as np
 
+FONT = cv2.FONT_HERSHEY_SIMPLEX
+FONT_SCALE = 0.6
+FONT_THICKNESS = 2
+BOX_THICKNESS = 3
+ALPHA = 0.7
 
-def draw_boxes(frame, boxes, class_ids, scores, classes):
+
+class BoxRenderer:
+    """
+    Draws semi-transparent boxes and labels directly into a frame.
+
+    Only the pixels under the box borders and the labels are blended, in place, so the
+    cost depends on the number of boxes instead of the frame size and no full-frame copy
+    is made. Border strips are blended with preallocated solid-color buffers and labels
+    are rendered once per (tag, color, score in 1/100 steps, track ID) and reused.
+
+    Args:
+        alpha (float, optional): Opacity of the boxes and labels. Defaults to 0.7.
+        max_labels (int, optional): Maximum number of cached label images. Defaults to 4096.
+    """
+
+    def __init__(self, alpha=ALPHA, max_labels=4096):
+        self.alpha = alpha
+        self.max_labels = max_labels
+        self._labels = {}
+        self._strips = {}
+
+    def draw(self, frame, boxes, class_ids, scores, classes, track_ids=None):
+        """
+        Draws the detections into `frame` in place.
+
+        Args:
+            frame (np.ndarray): An image or frame from a video, modified in place.
+            boxes (list): List of bounding box coordinates [x_min, y_min, x_max, y_max].
+            class_ids (list): List of class indices.
+            scores (list): List of probabilities for each detection.
+            classes (dict): Dictionary containing class information (colors and tags).
+            track_ids (list, optional): Persistent track ID of each detection. Defaults to None.
+
+        Returns:
+            np.ndarray: The same frame with bounding boxes and labels drawn.
+        """
+        height, width = frame.shape[:2]
+        if track_ids is None:
+            track_ids = [None] * len(boxes)
+        for box, class_id, score, track_id in zip(boxes, class_ids, scores, track_ids):
+            x_min, y_min, x_max, y_max = map(int, box)
+
+            # Get class information
+            class_info = classes.get(class_id, {"color": (0, 255, 0), "tag": f"Class {class_id}"})
+            color = tuple(int(c) for c in class_info["color"])
+
+            self._draw_border(frame, x_min, y_min, x_max, y_max, color, width, height)
+
+            label = self._label(class_info["tag"], color, score, track_id)
+            label_y_min = max(y_min - label.shape[0], 0)
+            self._blend(frame, x_min, label_y_min, label, width, height)
+        return frame
+
+    def _draw_border(self, frame, x_min, y_min, x_max, y_max, color, width, height):
+        """Blends the four border strips of a box without overlapping corners."""
+        half = BOX_THICKNESS // 2
+        outer_x_min, outer_x_max = x_min - half, x_max + half + 1
+        strips = (
+            (outer_x_min, y_min - half, outer_x_max, y_min + half + 1),
+            (outer_x_min, y_max - half, outer_x_max, y_max + half + 1),
+            (x_min - half, y_min + half + 1, x_min + half + 1, y_max - half),
+            (x_max - half, y_min + half + 1, x_max + half + 1, y_max - half),
+        )
+        for strip_x_min, strip_y_min, strip_x_max, strip_y_max in strips:
+            strip_x_min, strip_x_max = max(strip_x_min, 0), min(strip_x_max, width)
+            strip_y_min, strip_y_max = max(strip_y_min, 0), min(strip_y_max, height)
+            if strip_x_min >= strip_x_max or strip_y_min >= strip_y_max:
+                continue
+            roi = frame[strip_y_min:strip_y_max, strip_x_min:strip_x_max]
+            solid = self._solid(color, roi.shape[0], roi.shape[1])
+            cv2.addWeighted(roi, 1 - self.alpha, solid, self.alpha, 0, dst=roi)
+
+    def _solid(self, color, rows, cols):
+        """Returns a view of a preallocated solid-color buffer of at least the given size."""
+        buffer = self._strips.get(color)
+        if buffer is None or buffer.shape[0] < rows or buffer.shape[1] < cols:
+            old_rows, old_cols = buffer.shape[:2] if buffer is not None else (0, 0)
+            buffer = np.empty((max(rows, old_rows), max(cols, old_cols), 3), dtype=np.uint8)
+            buffer[:] = color
+            self._strips[color] = buffer
+        return buffer[:rows, :cols]
+
+    def _label(self, tag, color, score, track_id):
+        """Returns the rendered label image (background and text), cached per score bucket."""
+        key = (tag, color, int(round(float(score) * 100)), track_id)
+        label = self._labels.get(key)
+        if label is None:
+            text = f"{tag}: {key[2] / 100:.2f}"
+            if track_id is not None:
+                text = f"#{track_id} {text}"
+            (text_width, text_height), _ = cv2.getTextSize(text, FONT, FONT_SCALE, FONT_THICKNESS)
+            label = np.empty((text_height + 10, text_width + 10, 3), dtype=np.uint8)
+            label[:] = color
+            cv2.putText(
+                label,
+                text,
+                (5, text_height + 5),
+                FONT,
+                FONT_SCALE,
+                (255, 255, 255),
+                thickness=FONT_THICKNESS,
+                lineType=cv2.LINE_AA,
+            )
+            if len(self._labels) >= self.max_labels:
+                self._labels.clear()
+            self._labels[key] = label
+        return label
+
+    def _blend(self, frame, x, y, patch, width, height):
+        """Blends a patch into the frame at (x, y), clipped to the frame bounds."""
+        x_min, y_min = max(x, 0), max(y, 0)
+        x_max, y_max = min(x + patch.shape[1], width), min(y + patch.shape[0], height)
+        if x_min >= x_max or y_min >= y_max:
+            return
+        roi = frame[y_min:y_max, x_min:x_max]
+        patch = patch[y_min - y:y_max - y, x_min - x:x_max - x]
+        cv2.addWeighted(roi, 1 - self.alpha, patch, self.alpha, 0, dst=roi)
+
+
+_renderer = BoxRenderer()
+
+
+def draw_boxes(frame, boxes, class_ids, scores, classes, track_ids=None):
     """
     Displays rectangles, class names, probabilities, and colors on the frame
     with improved visualization (transparent labels and thicker boxes).
 
+    The boxes are drawn on a copy, `frame` is left as it is. Loops that own their frames
+    draw in place with a `BoxRenderer` instead and skip the copy.
+
     Args:
         frame (np.ndarray): An image or frame from a video.
         boxes (list): List of bounding box coordinates [x_min, y_min, x_max, y_max].
         class_ids (list): List of class indices.
         scores (list): List of probabilities for each detection.
         classes (dict): Dictionary containing class information (colors and tags).
+        track_ids (list, optional): Persistent track ID of each detection, rendered in the label. Defaults to None.
 
     Returns:
-        np.ndarray: Frame with bounding boxes and labels drawn.
+        np.ndarray: Copy of the frame with bounding boxes and labels drawn.
     """
-    overlay = frame.copy()
-    for box, class_id, score in zip(boxes, class_ids, scores):
-        x_min, y_min, x_max, y_max = map(int, box)
-
-        # Get class information
-        class_info = classes.get(class_id, {"color": (0, 255, 0), "tag": f"Class {class_id}"})
-        color = class_info["color"]
-        tag = class_info["tag"]
-
-        # Draw bounding box with thicker line
-        cv2.rectangle(overlay, (x_min, y_min), (x_max, y_max), color, thickness=3)
-
-        # Label with background
-        label = f"{tag}: {score:.2f}"
-        (text_width, text_height), baseline = cv2.getTextSize(label, cv2.FONT_HERSHEY_SIMPLEX, 0.6, 2)
-        label_bg_x_min = x_min
-        label_bg_y_min = y_min - text_height - 10
-        label_bg_x_max = x_min + text_width + 10
-        label_bg_y_max = y_min
-
-        # Ensure label background is within the frame bounds
-        label_bg_y_min = max(label_bg_y_min, 0)
-
-        # Draw label background rectangle
-        cv2.rectangle(overlay, (label_bg_x_min, label_bg_y_min), (label_bg_x_max, label_bg_y_max), color, thickness=-1)
-
-        # Draw label text
-        cv2.putText(
-            overlay,
-            label,
-            (x_min + 5, y_min - 5),
-            cv2.FONT_HERSHEY_SIMPLEX,
-            0.6,
-            (255, 255, 255),
-            thickness=2,
-            lineType=cv2.LINE_AA,
-        )
-
-    # Add transparency effect
-    alpha = 0.7
-    frame = cv2.addWeighted(overlay, alpha, frame, 1 - alpha, 0)
-
-    return frame
+    return _renderer.draw(frame.copy(), boxes, class_ids, scores, classes, track_ids)
@@ -0,0 +1,131 @@
+import cv2
+import numpy as np
+
+# JPEG decoders can scale by these factors while decoding (DCT scaling)
+REDUCED_READ_FLAGS = {
+    2: cv2.IMREAD_REDUCED_COLOR_2,
+    4: cv2.IMREAD_REDUCED_COLOR_4,
+    8: cv2.IMREAD_REDUCED_COLOR_8,
+}
+
+
+def reduced_size(width, height, max_side):
+    """
+    Computes the frame size whose longest side is `max_side`, keeping the aspect ratio.
+
+    Frames that are already small enough keep their size.
+
+    Args:
+        width (int): Width of the source frame.
+        height (int): Height of the source frame.
+        max_side (int): Longest side of the reduced frame.
+
+    Returns:
+        tuple: Width and height of the reduced frame.
+    """
+    scale = max_side / max(width, height)
+    if scale >= 1:
+        return width, height
+    return max(int(round(width * scale)), 1), max(int(round(height * scale)), 1)
+
+
+class IngestResizer:
+    """
+    Scales frames once, right after decoding, to the resolution the detector runs at.
+
+    The detector letterboxes every frame down to its input size anyway, so decoding 4K frames
+    and carrying them through the loop only costs memory bandwidth. JPEG folders are decoded
+    at 1/2, 1/4 or 1/8 scale directly (`cv2.IMREAD_REDUCED_*`) and then resized to the exact
+    size; video frames are resized on the decoding thread. Boxes found on the reduced frames
+    are mapped back to source pixels with `to_source`.
+
+    The source size is learnt from the first frame (or set with `set_source_size`); all
+    frames of a source are expected to have the same size.
+
+    Args:
+        max_side (int): Longest side of the reduced frames, normally the inference size.
+    """
+
+    def __init__(self, max_side):
+        self.max_side = max_side
+        self.source_size = None
+        self.size = None
+        self.read_flag = cv2.IMREAD_COLOR
+
+    def set_source_size(self, width, height):
+        """Sets the size of the source frames and picks the decode-time reduction for images."""
+        self.source_size = (width, height)
+        self.size = reduced_size(width, height, self.max_side)
+        factor = min(width // self.size[0], height // self.size[1])
+        for reduction in sorted(REDUCED_READ_FLAGS, reverse=True):
+            if reduction <= factor:
+                self.read_flag = REDUCED_READ_FLAGS[reduction]
+                break
+
+    @property
+    def reduces(self):
+        """Whether the frames are smaller than the source frames."""
+        return self.size != self.source_size
+
+    @property
+    def scale(self):
+        """Factors (x, y) from reduced to source pixels."""
+        return self.source_size[0] / self.size[0], self.source_size[1] / self.size[1]
+
+    def resize(self, frame, dst=None):
+        """
+        Scales a full-resolution frame to the reduced size.
+
+        Args:
+            frame (np.ndarray): Decoded frame.
+            dst (np.ndarray, optional): Preallocated output of the reduced size. Defaults to None.
+
+        Returns:
+            np.ndarray: The reduced frame. When no reduction is needed it is the frame itself,
+            or a copy in `dst` when `dst` is given, so `dst` is always the returned buffer.
+        """
+        if self.source_size is None:
+            self.set_source_size(frame.shape[1], frame.shape[0])
+        if (frame.shape[1], frame.shape[0]) == self.size:
+            if dst is None:
+                return frame
+            np.copyto(dst, frame)
+            return dst
+        return cv2.resize(frame, self.size, dst=dst, interpolation=cv2.INTER_AREA)
+
+    def read(self, path):
+        """
+        Reads an image and scales it to the reduced size, decoding at reduced scale when possible.
+
+        Args:
+            path (str): Path to the image.
+
+        Returns:
+            np.ndarray or None: The reduced frame, None if the image cannot be read.
+        """
+        if self.source_size is None:
+            frame = cv2.imread(path)
+            return None if frame is None else self.resize(frame)
+        frame = cv2.imread(path, self.read_flag)
+        if frame is None:
+            return None
+        if (frame.shape[1], frame.shape[0]) == self.size:
+            return frame
+        return cv2.resize(frame, self.size, interpolation=cv2.INTER_AREA)
+
+    def to_source(self, boxes):
+        """
+        Maps boxes [x_min, y_min, x_max, y_max] from reduced to source pixels.
+
+        Args:
+            boxes (np.ndarray): Boxes on the reduced frames.
+
+        Returns:
+            np.ndarray: Boxes on the source frames.
+        """
+        scale_x, scale_y = self.scale
+        if scale_x == 1 and scale_y == 1:
+            return boxes
+        return np.asarray(boxes, dtype=np.float32).reshape(-1, 4) * np.array(
+            [scale_x, scale_y, scale_x, scale_y], dtype=np.float32
+        )
@@ -0,0 +1,194 @@
+import cv2
+import numpy as np
+from src.loop.utils.boxes import box_iou, clip_boxes, greedy_match
+
+MOTION_MODELS = ("velocity", "flow")
+
+
+def frame_thumbnail(frame, size=(64, 36)):
+    """
+    Builds a tiny grayscale copy of a frame for cheap frame-to-frame comparisons.
+
+    Args:
+        frame (np.ndarray): The input frame.
+        size (tuple, optional): Thumbnail size (width, height). Defaults to (64, 36).
+
+    Returns:
+        np.ndarray: Grayscale thumbnail as float32.
+    """
+    gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY) if frame.ndim == 3 else frame
+    return cv2.resize(gray, size, interpolation=cv2.INTER_AREA).astype(np.float32)
+
+
+def scene_change_score(thumbnail_a, thumbnail_b):
+    """
+    Measures how much the scene changed between two thumbnails.
+
+    Args:
+        thumbnail_a (np.ndarray): Thumbnail built by `frame_thumbnail`.
+        thumbnail_b (np.ndarray): Thumbnail built by `frame_thumbnail`.
+
+    Returns:
+        float: Mean absolute difference normalized to [0, 1].
+    """
+    return float(np.mean(np.abs(thumbnail_a - thumbnail_b))) / 255.0
+
+
+class KeyframeScheduler:
+    """
+    Decides on which frames the detector has to run.
+
+    A frame is a keyframe when `stride` frames have passed since the last keyframe, or,
+    when `scene_change_threshold` is set, as soon as the scene differs from the last
+    keyframe by more than the threshold. For a purely scene-driven schedule use a large
+    stride; it then only bounds how long boxes are propagated without a detector pass.
+
+    Args:
+        stride (int, optional): Maximum number of frames between detector runs. Defaults to 1.
+        scene_change_threshold (float, optional): Threshold of `scene_change_score` that
+            forces a keyframe. Defaults to None (stride only).
+    """
+
+    def __init__(self, stride=1, scene_change_threshold=None):
+        if stride < 1:
+            raise ValueError("Detection stride must be at least 1.")
+        self.stride = stride
+        self.scene_change_threshold = scene_change_threshold
+        self.keyframes = 0
+        self.frames = 0
+        self._since_keyframe = None
+        self._keyframe_thumbnail = None
+
+    def is_keyframe(self, frame):
+        """
+        Registers the next frame and tells whether the detector must run on it.
+
+        Args:
+            frame (np.ndarray): The next frame of the source.
+
+        Returns:
+            bool: True if the frame is a keyframe.
+        """
+        self.frames += 1
+        keyframe = self._since_keyframe is None or self._since_keyframe + 1 >= self.stride
+
+        thumbnail = None
+        if self.scene_change_threshold is not None:
+            thumbnail = frame_thumbnail(frame)
+            if not keyframe:
+                score = scene_change_score(thumbnail, self._keyframe_thumbnail)
+                keyframe = score > self.scene_change_threshold
+
+        if keyframe:
+            self.keyframes += 1
+            self._since_keyframe = 0
+            self._keyframe_thumbnail = thumbnail
+        else:
+            self._since_keyframe += 1
+        return keyframe
+
+    def summary(self):
+        ratio = self.keyframes / self.frames if self.frames else 0.0
+        return f"Detector ran on {self.keyframes}/{self.frames} frames ({ratio:.1%})"
+
+
+class BoxPropagator:
+    """
+    Carries the detections of the last keyframe forward over the frames in between.
+
+    Motion models:
+        - "velocity": every box moves with the constant velocity measured between the
+          last two keyframes (boxes are matched by IoU and class).
+        - "flow": every box moves by the median sparse optical flow of the features
+          inside it; boxes without trackable features fall back to their velocity.
+
+    Args:
+        motion_model (str, optional): "velocity" or "flow". Defaults to "velocity".
+        match_iou (float, optional): Minimum IoU to match boxes of consecutive keyframes. Defaults to 0.1.
+    """
+
+    def __init__(self, motion_model="velocity", match_iou=0.1):
+        if motion_model not in MOTION_MODELS:
+            raise ValueError(f"Unknown motion model: {motion_model}. Expected one of {MOTION_MODELS}.")
+        self.motion_model = motion_model
+        self.match_iou = match_iou
+        self.boxes = np.zeros((0, 4), dtype=np.float32)
+        self.class_ids = np.zeros(0, dtype=int)
+        self.scores = np.zeros(0, dtype=np.float32)
+        self._velocity = np.zeros((0, 4), dtype=np.float32)
+        self._keyframe_boxes = self.boxes
+        self._since_keyframe = 0
+        self._previous_gray = None
+
+    def update(self, frame, boxes, class_ids, scores):
+        """
+        Stores the detections of a keyframe and re-estimates the box velocities.
+
+        Args:
+            frame (np.ndarray): The keyframe.
+            boxes (np.ndarray): Detected boxes [x_min, y_min, x_max, y_max].
+            class_ids (np.ndarray): Class indices.
+            scores (np.ndarray): Probabilities for each detection.
+        """
+        boxes = np.asarray(boxes, dtype=np.float32).reshape(-1, 4)
+        class_ids = np.asarray(class_ids, dtype=int)
+        velocity = np.zeros_like(boxes)
+
+        if len(self.boxes) and len(boxes):
+            # Match against the boxes propagated up to the previous frame (closest in time),
+            # measure the motion against the boxes detected on the previous keyframe
+            iou = box_iou(boxes, self.boxes)
+            iou[class_ids[:, None] != self.class_ids[None, :]] = 0
+            rows, cols = greedy_match(iou, self.match_iou)
+            gap = self._since_keyframe + 1
+            velocity[rows] = (boxes[rows] - self._keyframe_boxes[cols]) / gap
+
+        self.boxes = boxes
+        self._keyframe_boxes = boxes
+        self.class_ids = class_ids
+        self.scores = np.asarray(scores, dtype=np.float32)
+        self._velocity = velocity
+        self._since_keyframe = 0
+        if self.motion_model == "flow":
+            self._previous_gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+
+    def propagate(self, frame):
+        """
+        Moves the stored boxes to the next (non-key) frame.
+
+        Args:
+            frame (np.ndarray): The next frame of the source.
+
+        Returns:
+            tuple: Boxes, class indices and probabilities for the frame.
+        """
+        self._since_keyframe += 1
+        if len(self.boxes):
+            if self.motion_model == "flow":
+                gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+                shift = self._flow_shift(self._previous_gray, gray)
+                self._previous_gray = gray
+            else:
+                shift = self._velocity
+            height, width = frame.shape[:2]
+            self.boxes = clip_boxes(self.boxes + shift, width, height)
+        return self.boxes.copy(), self.class_ids.copy(), self.scores.copy()
+
+    def _flow_shift(self, previous_gray, gray):
+        """Median optical flow of the features inside every box, velocity when a box has none."""
+        shift = self._velocity.copy()
+        for index, (x_min, y_min, x_max, y_max) in enumerate(self.boxes.astype(int)):
+            roi = previous_gray[max(y_min, 0):max(y_max, 0), max(x_min, 0):max(x_max, 0)]
+            if roi.size == 0:
+                continue
+            corners = cv2.goodFeaturesToTrack(roi, maxCorners=20, qualityLevel=0.01, minDistance=2)
+            if corners is None:
+                continue
+            corners = corners + np.array([max(x_min, 0), max(y_min, 0)], dtype=np.float32)
+            moved, status, _ = cv2.calcOpticalFlowPyrLK(previous_gray, gray, corners, None)
+            tracked = status.ravel() == 1
+            if not tracked.any():
+                continue
+            dx, dy = np.median((moved - corners)[tracked].reshape(-1, 2), axis=0)
+            shift[index] = (dx, dy, dx, dy)
+        return shift
@@ -0,0 +1,245 @@
+import queue
+import threading
+import time
+
+BACKPRESSURE_POLICIES = ("block", "drop_oldest", "drop_newest")
+
+_END = object()
+
+
+class StopPipeline(Exception):
+    """Raised by a stage to request a clean shutdown of the pipeline (e.g. ESC pressed)."""
+
+
+class StageStats:
+    """
+    Throughput counters of a single pipeline stage.
+
+    Attributes:
+        name (str): Name of the stage.
+        items (int): Number of items (frames) the stage produced.
+        dropped (int): Number of items (frames) discarded by the backpressure policy on the stage output.
+        busy (float): Seconds spent doing work (excluding waiting on queues).
+        wall (float): Seconds between the stage start and its end.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.items = 0
+        self.dropped = 0
+        self.busy = 0.0
+        self.wall = 0.0
+
+    @property
+    def fps(self):
+        """Items per second of busy time, i.e. the speed the stage could sustain on its own."""
+        return self.items / self.busy if self.busy > 0 else 0.0
+
+    def summary(self):
+        return (
+            f"{self.name:<10} items={self.items:<6} dropped={self.dropped:<5} "
+            f"busy={self.busy:7.2f}s fps={self.fps:8.1f} util={self._utilization():5.1%}"
+        )
+
+    def _utilization(self):
+        return self.busy / self.wall if self.wall > 0 else 0.0
+
+
+class BoundedQueue:
+    """
+    A bounded FIFO queue between two stages with a selectable backpressure policy.
+
+    Policies:
+        - "block": the producer waits for free space, no frame is lost.
+        - "drop_oldest": the oldest queued item is discarded to make room (lowest latency for live sources).
+        - "drop_newest": the incoming item is discarded when the queue is full.
+
+    Args:
+        maxsize (int): Capacity of the queue.
+        policy (str, optional): Backpressure policy. Defaults to "block".
+        stop_event (threading.Event, optional): Event that aborts blocking puts. Defaults to None.
+        item_size (Callable, optional): Counts the frames carried by an item, used for the
+            drop counters. Defaults to None (one frame per item).
+    """
+
+    def __init__(self, maxsize, policy="block", stop_event=None, item_size=None):
+        if policy not in BACKPRESSURE_POLICIES:
+            raise ValueError(f"Unknown backpressure policy: {policy}. Expected one of {BACKPRESSURE_POLICIES}.")
+        if maxsize < 1:
+            raise ValueError("Queue size must be at least 1.")
+        self.policy = policy
+        self._queue = queue.Queue(maxsize)
+        self._stop_event = stop_event or threading.Event()
+        self._item_size = item_size or (lambda item: 1)
+
+    def put(self, item, force_block=False):
+        """
+        Puts an item into the queue according to the policy.
+
+        Args:
+            item: Item to enqueue.
+            force_block (bool, optional): Ignore the drop policies, used for the end-of-stream marker.
+
+        Returns:
+            int: Number of frames dropped by this call.
+        """
+        if self.policy == "block" or force_block:
+            while not self._stop_event.is_set():
+                try:
+                    self._queue.put(item, timeout=0.1)
+                    return 0
+                except queue.Full:
+                    continue
+            return 0 if item is _END else self._item_size(item)
+
+        if self.policy == "drop_newest":
+            try:
+                self._queue.put_nowait(item)
+                return 0
+            except queue.Full:
+                return self._item_size(item)
+
+        dropped = 0
+        while True:
+            try:
+                self._queue.put_nowait(item)
+                return dropped
+            except queue.Full:
+                try:
+                    dropped += self._item_size(self._queue.get_nowait())
+                except queue.Empty:
+                    continue
+
+    def get(self):
+        """Waits for the next item, returns the end-of-stream marker once the pipeline is stopped."""
+        while True:
+            try:
+                return self._queue.get(timeout=0.1)
+            except queue.Empty:
+                if self._stop_event.is_set():
+                    return _END
+
+    def qsize(self):
+        return self._queue.qsize()
+
+
+def run_pipeline(source, stages, queue_size=8, backpressure="block", source_name="decode", item_size=None):
+    """
+    Runs a source iterator and a chain of stages concurrently, one thread per stage.
+
+    Every stage is connected to the next one through a `BoundedQueue`, so a slow stage
+    throttles (or drops frames of) the faster ones instead of growing memory. Each stage
+    has exactly one worker and the queues are FIFO, so items reach the last stage in
+    source order. OpenCV and PyTorch release the GIL in their heavy calls, which lets
+    the stages overlap on CPU-only hosts: the end-to-end rate approaches the rate of the
+    slowest stage instead of the sum of all stage times.
+
+    Args:
+        source (Iterable): Produces items for the first stage (e.g. decoded frames).
+        stages (list[tuple[str, Callable]]): Named stage functions. A function takes an item
+            and returns the item for the next stage, or None to drop it. A stage may raise
+            `StopPipeline` to stop the whole pipeline cleanly.
+        queue_size (int, optional): Capacity of each queue between stages. Defaults to 8.
+        backpressure (str, optional): Policy of the queues, see `BoundedQueue`. Defaults to "block".
+        source_name (str, optional): Name of the source stage in the statistics. Defaults to "decode".
+        item_size (Callable, optional): Counts the frames carried by an item, e.g. `len` when
+            items are batches. Defaults to None (one frame per item).
+
+    Returns:
+        list[StageStats]: Statistics of the source and of every stage, in pipeline order.
+
+    Raises:
+        Exception: The first exception raised by any stage, re-raised in the calling thread.
+    """
+    stop_event = threading.Event()
+    count = item_size or (lambda item: 1)
+    queues = [BoundedQueue(queue_size, backpressure, stop_event, count) for _ in stages]
+    stats = [StageStats(source_name)] + [StageStats(name) for name, _ in stages]
+    errors = []
+
+    def run_source():
+        stage_stats = stats[0]
+        start = time.perf_counter()
+        iterator = iter(source)
+        try:
+            while not stop_event.is_set():
+                tick = time.perf_counter()
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    break
+                stage_stats.busy += time.perf_counter() - tick
+                stage_stats.items += count(item)
+                stage_stats.dropped += queues[0].put(item)
+        except StopPipeline:
+            stop_event.set()
+        except Exception as e:
+            errors.append(e)
+            stop_event.set()
+        finally:
+            queues[0].put(_END, force_block=True)
+            stage_stats.wall = time.perf_counter() - start
+
+    def run_stage(index, fn):
+        stage_stats = stats[index + 1]
+        inbox = queues[index]
+        outbox = queues[index + 1] if index + 1 < len(queues) else None
+        start = time.perf_counter()
+        try:
+            while True:
+                item = inbox.get()
+                if item is _END:
+                    break
+                tick = time.perf_counter()
+                result = fn(item)
+                stage_stats.busy += time.perf_counter() - tick
+                if result is None:
+                    continue
+                stage_stats.items += count(result)
+                if outbox is not None:
+                    stage_stats.dropped += outbox.put(result)
+        except StopPipeline:
+            stop_event.set()
+        except Exception as e:
+            errors.append(e)
+            stop_event.set()
+        finally:
+            if outbox is not None:
+                outbox.put(_END, force_block=True)
+            stage_stats.wall = time.perf_counter() - start
+
+    threads = [threading.Thread(target=run_source, name=source_name, daemon=True)]
+    threads += [
+        threading.Thread(target=run_stage, args=(i, fn), name=name, daemon=True)
+        for i, (name, fn) in enumerate(stages)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    if errors:
+        raise errors[0]
+    return stats
+
+
+def format_stage_report(stats, wall_time):
+    """
+    Formats per-stage throughput statistics as a printable report.
+
+    Args:
+        stats (list[StageStats]): Statistics returned by `run_pipeline`.
+        wall_time (float): End-to-end duration of the run in seconds.
+
+    Returns:
+        str: The report.
+    """
+    lines = ["Stage throughput:"]
+    lines += [f"  {stage.summary()}" for stage in stats]
+    if stats and wall_time > 0:
+        bottleneck = min((s for s in stats if s.items), key=lambda s: s.fps, default=stats[-1])
+        lines.append(
+            f"  end-to-end fps={stats[-1].items / wall_time:.1f} "
+            f"(bottleneck: {bottleneck.name} at {bottleneck.fps:.1f} fps)"
+        )
+    return "\n".join(lines)
@@ -1,89 +1,199 @@
 import os
+import queue
+import re
+import threading
+import time
 import cv2
 from src.loop.utils.draw import draw_boxes
+from src.loop.utils.readers import VideoPrefetchReader, ImagePrefetchReader, LatestFrameReader
 
 
-def get_frame_iterator(video=None, frames_dir=None):
+def list_frame_files(frames_dir):
     """
-    Returns a frame iterator from either a video file or a directory of images.
+    Lists the image frames of a directory in sorted order.
+
+    Args:
+        frames_dir (str): Path to the directory containing image frames.
+
+    Returns:
+        list[str]: Paths to the frames.
+
+    Raises:
+        ValueError: If no valid frames are found.
+    """
+    valid_extensions = ('.png', '.jpg', '.jpeg')
+    frame_files = [
+        os.path.join(frames_dir, f)
+        for f in sorted(os.listdir(frames_dir))
+        if f.lower().endswith(valid_extensions)
+    ]
+    if not frame_files:
+        raise ValueError(f"No valid frames found in folder: {frames_dir}")
+    return frame_files
+
+
+def open_stream(stream):
+    """
+    Opens a live source: a network stream URL (RTSP, HTTP, ...) or a camera index.
+
+    Args:
+        stream (str or int): URL of the stream, or index of the camera (e.g. 0 or "0").
+
+    Returns:
+        cv2.VideoCapture: The opened capture.
+
+    Raises:
+        ValueError: If the source cannot be opened.
+    """
+    source = int(stream) if str(stream).isdigit() else stream
+    cap = cv2.VideoCapture(source)
+    if not cap.isOpened():
+        raise ValueError(f"Unable to open stream: {stream}")
+    # Keep the driver-side buffer short so that grabbed frames are fresh
+    cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+    return cap
+
+
+class IndexedFrames:
+    """
+    Iterates the frames of a source decoded on the consumer thread.
+
+    Attributes:
+        frame_index (int): Source index of the last delivered frame (-1 before the first).
+
+    Args:
+        pairs (generator): Yields (source index, frame) pairs.
+    """
+
+    def __init__(self, pairs):
+        self._pairs = pairs
+        self.frame_index = -1
+
+    def __iter__(self):
+        for self.frame_index, frame in self._pairs:
+            yield frame
+
+    def close(self):
+        self._pairs.close()
+
+
+def get_frame_iterator(video=None, frames_dir=None, prefetch=0, hold=None, workers=4, resizer=None,
+                       stream=None, latest_only=True):
+    """
+    Returns a frame iterator from a video file, a directory of images or a live stream.
+
+    With `prefetch` > 0 the frames are decoded ahead on background threads (see
+    `VideoPrefetchReader` and `ImagePrefetchReader`); call `close()` on the iterator when
+    it is abandoned before the end. Every iterator exposes the source index of the frame it
+    delivered last as `frame_index`, so skipped or unreadable frames do not shift the
+    numbering.
+
+    With a `resizer` the frames are scaled to the inference resolution as they are decoded.
+
+    A `stream` is read with `LatestFrameReader` by default, which drops stale frames instead
+    of queueing them; with `latest_only=False` every frame is read in order like a video.
+    `LatestFrameReader.close` releases the capture of the stream itself.
 
     Args:
         video (str, optional): Path to the video file.
         frames_dir (str, optional): Path to the directory containing image frames.
+        prefetch (int, optional): Number of frames decoded ahead; 0 decodes on the consumer thread. Defaults to 0.
+        hold (int, optional): Number of delivered video frames the consumer may still reference; enables
+            the ring of preallocated frames. Defaults to None (no buffer reuse).
+        workers (int, optional): Number of threads reading a directory of images. Defaults to 4.
+        resizer (IngestResizer, optional): Scales the frames once while decoding. Defaults to None.
+        stream (str or int, optional): URL of a network stream or index of a camera.
+        latest_only (bool, optional): Whether to skip stale frames of a stream. Defaults to True.
 
     Returns:
         tuple:
-            - generator: An iterator yielding frames.
-            - int: The total number of frames.
-            - cv2.VideoCapture or None: The video capture object if the input is a video, otherwise None.
+            - Iterable: An iterator yielding frames.
+            - int: The total number of frames (0 for streams).
+            - cv2.VideoCapture or None: The video capture object if the input is a video or a stream, otherwise None.
 
     Raises:
-        ValueError: If neither `video` nor `frames_dir` is provided or if no valid frames are found.
+        ValueError: If no source is provided, it cannot be opened or no valid frames are found.
     """
     if frames_dir:
-        valid_extensions = ('.png', '.jpg', '.jpeg')
-        frame_files = [
-            os.path.join(frames_dir, f)
-            for f in sorted(os.listdir(frames_dir))
-            if f.lower().endswith(valid_extensions)
-        ]
-        if not frame_files:
-            raise ValueError(f"No valid frames found in folder: {frames_dir}")
+        frame_files = list_frame_files(frames_dir)
+        if resizer is not None and resizer.source_size is None:
+            first = next((frame for frame in map(cv2.imread, frame_files) if frame is not None), None)
+            if first is not None:
+                resizer.set_source_size(first.shape[1], first.shape[0])
+        if prefetch:
+            return ImagePrefetchReader(frame_files, prefetch, workers, resizer), len(frame_files), None
 
         def frame_generator():
-            for frame_path in frame_files:
-                frame = cv2.imread(frame_path)
+            for index, frame_path in enumerate(frame_files):
+                frame = resizer.read(frame_path) if resizer is not None else cv2.imread(frame_path)
                 if frame is None:
                     print(f"Could not read frame: {frame_path}")
                     continue
-                yield frame
+                yield index, frame
 
-        return frame_generator(), len(frame_files), None
+        return IndexedFrames(frame_generator()), len(frame_files), None
 
-    elif video:
-        cap = cv2.VideoCapture(video)
-        if not cap.isOpened():
-            raise ValueError(f"Unable to open video: {video}")
+    elif video or stream is not None:
+        if video:
+            cap = cv2.VideoCapture(video)
+            if not cap.isOpened():
+                raise ValueError(f"Unable to open video: {video}")
+        else:
+            cap = open_stream(stream)
+        if resizer is not None and resizer.source_size is None:
+            resizer.set_source_size(int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)), int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)))
+        if not video and latest_only:
+            return LatestFrameReader(cap, resizer), 0, cap
+        if prefetch:
+            reader = VideoPrefetchReader(cap, prefetch, hold, resizer)
+            return reader, reader.total_frames, cap
 
         def frame_generator():
+            index = 0
             while True:
                 ret_val, frame = cap.read()
                 if not ret_val:
                     break
-                yield frame
+                yield index, resizer.resize(frame) if resizer is not None else frame
+                index += 1
 
-        return frame_generator(), int(
-            cap.get(cv2.CAP_PROP_FRAME_COUNT)), cap
+        return IndexedFrames(frame_generator()), max(int(cap.get(cv2.CAP_PROP_FRAME_COUNT)), 0), cap
 
     else:
-        raise ValueError("Either 'video' or 'frames_dir' must be provided.")
+        raise ValueError("Either 'video', 'frames_dir' or 'stream' must be provided.")
 
 
-def generate_output_name(video=None, frames_dir=None):
+def generate_output_name(video=None, frames_dir=None, stream=None):
     """
     Generates the output file name based on the input source.
 
     Args:
         video (str, optional): Path to the video file.
         frames_dir (str, optional): Path to the directory containing image frames.
+        stream (str or int, optional): URL of a network stream or index of a camera.
 
     Returns:
         str: The generated output file name.
 
     Raises:
-        ValueError: If neither `video` nor `frames_dir` is provided.
+        ValueError: If no source is provided.
     """
     if video:
         base_name = os.path.splitext(os.path.basename(video))[0]
     elif frames_dir:
         base_name = os.path.basename(os.path.dirname(os.path.normpath(frames_dir)))
+    elif stream is not None:
+        if str(stream).isdigit():
+            base_name = f"camera{stream}"
+        else:
+            base_name = re.sub(r"[^\w.-]+", "_", str(stream).split("://", 1)[-1]).strip("_")
     else:
-        raise ValueError("Either 'video' or 'frames_dir' must be provided.")
+        raise ValueError("Either 'video', 'frames_dir' or 'stream' must be provided.")
 
     return f"{base_name}_result.avi"
 
 
-def create_output_writer(output_dir, output_name, width, height):
+def create_output_writer(output_dir, output_name, width, height, fps=30):
     """
     Creates a video writer object to save the processed output.
 
@@ -92,6 +202,7 @@ def create_output_writer(output_dir, output_name, width, height):
         output_name (str): Name of the output video file.
         width (int): Width of the video frames.
         height (int): Height of the video frames.
+        fps (float, optional): Frame rate of the output video. Defaults to 30.
 
     Returns:
         cv2.VideoWriter: Video writer object, or None if no `output_dir` is provided.
@@ -99,31 +210,207 @@ def create_output_writer(output_dir, output_name, width, height):
     if output_dir:
         os.makedirs(output_dir, exist_ok=True)
         output_path = os.path.join(output_dir, output_name)
-        return cv2.VideoWriter(output_path, cv2.VideoWriter_fourcc(*"XVID"), 30, (width, height))
+        return cv2.VideoWriter(output_path, cv2.VideoWriter_fourcc(*"XVID"), fps, (width, height))
     return None
 
 
-def process_frame(frame, model, classes, vid_writer=None, visualize=False):
+class FramePacket:
     """
-    Processes a single frame: detects objects, draws bounding boxes, and optionally saves/visualizes the frame.
+    Carries a single frame and everything computed for it through the loop stages.
+
+    Attributes:
+        frame_id (int): Index of the frame in the source.
+        frame (np.ndarray): The decoded frame.
+        timestamp (float): Time the frame was grabbed or decoded (seconds since the epoch).
+        boxes (np.ndarray): Bounding boxes [x_min, y_min, x_max, y_max], None until detection ran.
+        class_ids (np.ndarray): Class indices of the detections, None until detection ran.
+        scores (np.ndarray): Probabilities of the detections, None until detection ran.
+        source_frame (np.ndarray): Full-resolution frame when `frame` was reduced for inference
+            and a full-resolution output is needed, otherwise None.
+        annotated (np.ndarray): Frame with the detections drawn on it, None until annotation ran.
+        track_ids (np.ndarray): Persistent track ID of each detection, None when tracking is off.
+        is_keyframe (bool): Whether the detector ran on the frame (False for propagated boxes).
+        meta (dict): Additional per-frame information reported by the stages (e.g. ROI status).
+    """
+
+    def __init__(self, frame_id, frame, timestamp=None):
+        self.frame_id = frame_id
+        self.frame = frame
+        self.source_frame = None
+        self.timestamp = timestamp or time.time()
+        self.boxes = None
+        self.class_ids = None
+        self.scores = None
+        self.track_ids = None
+        self.annotated = None
+        self.is_keyframe = True
+        self.meta = {}
+
+
+def extract_detections(result):
+    """
+    Converts a single YOLO result into plain numpy arrays.
 
     Args:
-        frame (np.ndarray): The input frame to be processed.
+        result (ultralytics.engine.results.Results): Prediction result for one frame.
+
+    Returns:
+        tuple:
+            - np.ndarray: Bounding boxes [x_min, y_min, x_max, y_max].
+            - np.ndarray: Class indices.
+            - np.ndarray: Probabilities for each detection.
+    """
+    boxes = result.boxes.xyxy.cpu().numpy()
+    class_ids = result.boxes.cls.cpu().numpy().astype(int)
+    scores = result.boxes.conf.cpu().numpy()
+    return boxes, class_ids, scores
+
+
+def detect_frame(frame, model):
+    """
+    Runs the detector on a single frame.
+
+    Args:
+        frame (np.ndarray): The input frame.
         model (YOLO): YOLO model instance for object detection.
-        classes (dict): Dictionary containing class information (tags and colors).
-        vid_writer (cv2.VideoWriter, optional): Video writer to save the processed frame. Defaults to None.
-        visualize (bool, optional): Whether to display the processed frame in a window. Defaults to False.
 
     Returns:
-        bool: False if the ESC key is pressed during visualization, True otherwise.
+        tuple: Boxes, class indices and probabilities, see `extract_detections`.
     """
     results = model.predict(frame)
-    boxes = results[0].boxes.xyxy.cpu().numpy()
-    class_ids = results[0].boxes.cls.cpu().numpy().astype(int)
-    scores = results[0].boxes.conf.cpu().numpy()
-    print(f"Box {boxes}, Class {class_ids}, Score {scores}")
-    online_im = draw_boxes(frame.copy(), boxes, class_ids, scores, classes)
+    return extract_detections(results[0])
+
+
+def detect_frames(frames, model, **predict_args):
+    """
+    Runs the detector on several frames with a single predict call.
+
+    Preprocessing, tensor creation and NMS setup are paid once per call, so on CPU a
+    batch is noticeably cheaper than the same number of single-frame calls.
+
+    Args:
+        frames (list[np.ndarray]): The input frames.
+        model (YOLO): YOLO model instance for object detection.
+        **predict_args: Extra arguments of `model.predict`, e.g. `imgsz` or `conf`.
+
+    Returns:
+        list[tuple]: Boxes, class indices and probabilities for every frame, in input order.
+    """
+    if not frames:
+        return []
+    results = model.predict(list(frames), **predict_args)
+    return [extract_detections(result) for result in results]
+
+
+def iterate_batches(iterator, batch_size, max_wait=None, latest_only=False, on_drop=None):
+    """
+    Groups the items of an iterator into lists of up to `batch_size` items.
+
+    Without `max_wait` a batch is only yielded once it is full (or the iterator ends).
+    With `max_wait` the iterator is consumed on a background thread and a partial batch
+    is yielded once `max_wait` seconds have passed since its first item, so a slow live
+    source never stalls the loop while a batch fills. Single-item batches never wait, so
+    they skip the background thread.
+
+    With `latest_only` the background thread keeps only the newest item waiting for the
+    next batch and drops older ones, so a live source that already drops stale frames does
+    not get a backlog of them behind the batching.
+
+    Args:
+        iterator (Iterable): Source of items (e.g. frames).
+        batch_size (int): Maximum number of items in a batch.
+        max_wait (float, optional): Maximum time in seconds to wait for a batch to fill. Defaults to None.
+        latest_only (bool, optional): Whether to drop items that wait for a batch when a newer
+            one arrives. Only used with `max_wait`. Defaults to False.
+        on_drop (Callable, optional): Called with every item dropped by `latest_only`. Defaults to None.
+
+    Yields:
+        list: The next batch, in source order.
+
+    Raises:
+        ValueError: If `batch_size` is less than 1.
+    """
+    if batch_size < 1:
+        raise ValueError("Batch size must be at least 1.")
+
+    if max_wait is None or batch_size == 1:
+        batch = []
+        for item in iterator:
+            batch.append(item)
+            if len(batch) == batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+        return
+
+    items = queue.Queue(maxsize=1 if latest_only else batch_size * 2)
+    closed = threading.Event()
+    end = object()
+
+    def put(item):
+        replace = latest_only and item is not end
+        while not closed.is_set():
+            try:
+                if replace:
+                    items.put_nowait(item)
+                else:
+                    items.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                if replace:
+                    # Drops the item waiting for the next batch, it is older than this one
+                    try:
+                        dropped = items.get_nowait()
+                    except queue.Empty:
+                        continue
+                    if on_drop is not None:
+                        on_drop(dropped)
+
+    def feed():
+        for item in iterator:
+            put(item)
+            if closed.is_set():
+                return
+        put(end)
+
+    threading.Thread(target=feed, name="batch-feeder", daemon=True).start()
+    try:
+        while True:
+            item = items.get()
+            if item is end:
+                return
+            batch = [item]
+            deadline = time.monotonic() + max_wait
+            while len(batch) < batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = items.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if item is end:
+                    yield batch
+                    return
+                batch.append(item)
+            yield batch
+    finally:
+        closed.set()
+
+
+def emit_frame(online_im, vid_writer=None, visualize=False):
+    """
+    Writes an annotated frame to the output video and optionally shows it.
+
+    Args:
+        online_im (np.ndarray): The annotated frame.
+        vid_writer (cv2.VideoWriter, optional): Video writer to save the frame. Defaults to None.
+        visualize (bool, optional): Whether to display the frame in a window. Defaults to False.
 
+    Returns:
+        bool: False if the ESC key is pressed during visualization, True otherwise.
+    """
     if vid_writer:
         vid_writer.write(online_im)
     if visualize:
@@ -133,3 +420,24 @@ def process_frame(frame, model, classes, vid_writer=None, visualize=False):
         if key == 27:  # ESC key
             return False
     return True
+
+
+def process_frame(frame, model, classes, vid_writer=None, visualize=False):
+    """
+    Processes a single frame: detects objects, draws bounding boxes, and optionally saves/visualizes the frame.
+
+    The bounding boxes are drawn on a copy, `frame` is left as it is.
+
+    Args:
+        frame (np.ndarray): The input frame to be processed.
+        model (YOLO): YOLO model instance for object detection.
+        classes (dict): Dictionary containing class information (tags and colors).
+        vid_writer (cv2.VideoWriter, optional): Video writer to save the processed frame. Defaults to None.
+        visualize (bool, optional): Whether to display the processed frame in a window. Defaults to False.
+
+    Returns:
+        bool: False if the ESC key is pressed during visualization, True otherwise.
+    """
+    boxes, class_ids, scores = detect_frame(frame, model)
+    online_im = draw_boxes(frame, boxes, class_ids, scores, classes)
+    return emit_frame(online_im, vid_writer, visualize)
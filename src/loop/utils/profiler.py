@@ -0,0 +1,211 @@
+import json
+import os
+import sys
+import threading
+import time
+
+import numpy as np
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# Stages of the inference loop, in report order
+LOOP_STAGES = ("decode", "preprocess", "inference", "postprocess", "draw", "encode", "display")
+
+
+def peak_rss_mb():
+    """
+    Returns the peak resident set size of the process in MB, None where it is unavailable.
+
+    On Linux the high-water mark of the current address space (`VmHWM`) is used: `ru_maxrss`
+    survives `exec`, so a freshly spawned process would report the peak of its parent.
+    """
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+class SampleWindow:
+    """
+    Keeps the last `size` values of a measurement in a preallocated array.
+
+    Memory stays constant on endless runs; count, total and maximum cover all values,
+    percentiles cover the window.
+
+    Args:
+        size (int, optional): Number of values kept for the percentiles. Defaults to 100000.
+    """
+
+    def __init__(self, size=100_000):
+        self._values = np.empty(size, dtype=np.float64)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, value):
+        self._values[self.count % len(self._values)] = value
+        self.count += 1
+        self.total += value
+        if value > self.max:
+            self.max = value
+
+    def percentiles(self, q=(50, 95, 99)):
+        """Returns the percentiles of the window, zeros when it is empty."""
+        if not self.count:
+            return np.zeros(len(q))
+        return np.percentile(self._values[:min(self.count, len(self._values))], q)
+
+
+class _Span:
+    __slots__ = ("profiler", "name", "items", "start")
+
+    def __init__(self, profiler, name, items):
+        self.profiler = profiler
+        self.name = name
+        self.items = items
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.profiler.record(self.name, self.start, time.perf_counter(), self.items)
+
+
+class _NullSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        pass
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class StageProfiler:
+    """
+    Records how long every stage of the loop takes, per frame.
+
+    A stage call is timed with `with profiler.span(name, items):`, which costs two
+    `perf_counter` calls and an array write, so the profiler can stay enabled in production.
+    Per-frame times (call time divided by the frames of the call) go into a `SampleWindow`
+    per stage. With `trace=True` every call is also kept as an event for `export_trace`
+    (up to `max_events`).
+
+    `latency` collects the decode-to-detection latency of every frame and is filled even
+    when the profiler is disabled. `count` tallies per-frame outcomes that are not timings
+    (e.g. the ROI status of every detected frame); they are listed in the report.
+
+    Args:
+        enabled (bool, optional): Whether to record anything. Defaults to True.
+        trace (bool, optional): Whether to keep the events for a Chrome trace. Defaults to False.
+        window (int, optional): Number of per-frame times kept per stage. Defaults to 100000.
+        max_events (int, optional): Maximum number of trace events. Defaults to 1000000.
+    """
+
+    def __init__(self, enabled=True, trace=False, window=100_000, max_events=1_000_000):
+        self.enabled = enabled
+        self.trace = trace
+        self.window = window
+        self.max_events = max_events
+        self.stages = {}
+        self.frames = {}
+        self.busy = {}
+        self.events = []
+        self.counts = {}
+        self.latency = SampleWindow(window)
+        self.started = time.perf_counter()
+
+    def span(self, name, items=1):
+        """Returns a context manager timing one call of a stage that handles `items` frames."""
+        if not self.enabled:
+            return _NULL_SPAN
+        return _Span(self, name, items)
+
+    def record(self, name, start, end, items=1):
+        """Records one call of a stage from `start` to `end` (`time.perf_counter` seconds)."""
+        if not self.enabled or not items:
+            return
+        samples = self.stages.get(name)
+        if samples is None:
+            samples = self.stages.setdefault(name, SampleWindow(self.window))
+            self.frames[name] = 0
+            self.busy[name] = 0.0
+        samples.add((end - start) / items)
+        self.frames[name] += items
+        self.busy[name] += end - start
+        if self.trace and len(self.events) < self.max_events:
+            self.events.append((name, start, end - start, threading.get_ident(), items))
+
+    def count(self, name, items=1):
+        """Adds `items` frames to the counter `name`."""
+        if self.enabled:
+            self.counts[name] = self.counts.get(name, 0) + items
+
+    def report(self, wall_time=None):
+        """
+        Formats the per-stage latency percentiles, throughput and the peak memory.
+
+        Args:
+            wall_time (float, optional): Duration of the run; defaults to the time since creation.
+
+        Returns:
+            str: The report.
+        """
+        wall_time = wall_time or time.perf_counter() - self.started
+        names = [name for name in LOOP_STAGES if name in self.stages]
+        names += [name for name in self.stages if name not in LOOP_STAGES]
+        lines = ["Stage latency per frame (ms):"]
+        for name in names:
+            samples = self.stages[name]
+            p50, p95, p99 = samples.percentiles() * 1000
+            fps = self.frames[name] / self.busy[name] if self.busy[name] > 0 else 0.0
+            lines.append(
+                f"  {name:<12} frames={self.frames[name]:<7} p50={p50:7.2f} p95={p95:7.2f} p99={p99:7.2f} "
+                f"max={samples.max * 1000:7.2f} fps={fps:9.1f}"
+            )
+        if self.counts:
+            lines.append("  counts: " + " ".join(f"{name}={count}" for name, count in self.counts.items()))
+        frames = max(self.frames.values(), default=0)
+        peak = peak_rss_mb()
+        peak_text = f" peak RSS={peak:.0f} MB" if peak is not None else ""
+        lines.append(f"  end-to-end fps={frames / wall_time if wall_time > 0 else 0.0:.1f}{peak_text}")
+        return "\n".join(lines)
+
+    def export_trace(self, path):
+        """
+        Writes the recorded events as a Chrome trace (open in chrome://tracing or Perfetto).
+
+        Args:
+            path (str): Path of the JSON file.
+        """
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        pid = os.getpid()
+        events = [
+            {
+                "name": name,
+                "ph": "X",
+                "ts": (start - self.started) * 1e6,
+                "dur": duration * 1e6,
+                "pid": pid,
+                "tid": thread,
+                "args": {"frames": items},
+            }
+            for name, start, duration, thread, items in self.events
+        ]
+        with open(path, "w") as f:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
@@ -0,0 +1,146 @@
+import time
+
+
+def quality_ladder(stride=1, imgsz=640, conf=0.25, tiling=False, min_imgsz=320, max_stride=4):
+    """
+    Builds the settings of every quality level, from full quality to the cheapest one.
+
+    Each level degrades one knob: tiling is dropped first, then the detection stride and
+    the inference size take turns, and the confidence threshold is raised last since it
+    discards detections outright.
+
+    Args:
+        stride (int, optional): Detection stride at full quality. Defaults to 1.
+        imgsz (int, optional): Inference size at full quality. Defaults to 640.
+        conf (float, optional): Confidence threshold at full quality. Defaults to 0.25.
+        tiling (bool, optional): Whether tiling is on at full quality. Defaults to False.
+        min_imgsz (int, optional): Smallest inference size. Defaults to 320.
+        max_stride (int, optional): Largest detection stride. Defaults to 4.
+
+    Returns:
+        list[dict]: Settings ("stride", "imgsz", "conf", "tiling") of every level.
+    """
+    settings = {"stride": stride, "imgsz": imgsz, "conf": conf, "tiling": tiling}
+    ladder = [dict(settings)]
+    if tiling:
+        settings["tiling"] = False
+        ladder.append(dict(settings))
+
+    sizes = [size for size in (512, 416, 320) if min_imgsz <= size < imgsz]
+    strides = list(range(stride + 1, max(max_stride, stride) + 1))
+    while sizes or strides:
+        if strides:
+            settings["stride"] = strides.pop(0)
+            ladder.append(dict(settings))
+        if sizes:
+            settings["imgsz"] = sizes.pop(0)
+            ladder.append(dict(settings))
+
+    for threshold in (0.35, 0.5):
+        if threshold > conf:
+            settings["conf"] = threshold
+            ladder.append(dict(settings))
+    return ladder
+
+
+def describe_settings(settings):
+    return (
+        f"stride={settings['stride']} imgsz={settings['imgsz']} conf={settings['conf']:.2f} "
+        f"tiling={'on' if settings['tiling'] else 'off'}"
+    )
+
+
+class QualityController:
+    """
+    Moves along a quality ladder to hold a target frame rate or latency budget.
+
+    Every `window` finished frames the controller compares the measured output rate and the
+    mean decode-to-detection latency with the targets. When a target is missed it steps down
+    one quality level; when both are met with `headroom` to spare it steps back up. After a
+    change it waits `cooldown` frames so the effect of the change is measured before the
+    next one. Every adjustment is printed.
+
+    Args:
+        ladder (list[dict]): Settings per level, see `quality_ladder`.
+        target_fps (float, optional): Output frame rate to hold. Defaults to None.
+        latency_budget (float, optional): Mean latency in seconds to stay under. Defaults to None.
+        window (int, optional): Frames per measurement. Defaults to 30.
+        cooldown (int, optional): Frames to wait after an adjustment. Defaults to 30.
+        headroom (float, optional): Fraction of the target that must be reached before
+            stepping up (e.g. 0.8: fps above target / 0.8). Defaults to 0.8.
+
+    Raises:
+        ValueError: If neither `target_fps` nor `latency_budget` is set.
+    """
+
+    def __init__(self, ladder, target_fps=None, latency_budget=None, window=30, cooldown=30, headroom=0.8):
+        if not target_fps and not latency_budget:
+            raise ValueError("The quality controller needs a target fps or a latency budget.")
+        self.ladder = ladder
+        self.target_fps = target_fps
+        self.latency_budget = latency_budget
+        self.window = window
+        self.cooldown = cooldown
+        self.headroom = headroom
+        self.level = 0
+        self.adjustments = 0
+        self._frames = 0
+        self._latency = 0.0
+        self._since_change = cooldown
+        self._window_start = None
+
+    @property
+    def settings(self):
+        """Settings of the current quality level."""
+        return self.ladder[self.level]
+
+    def observe(self, latency):
+        """
+        Registers a finished frame and adjusts the quality level at the end of a window.
+
+        Args:
+            latency (float): Decode-to-detection latency of the frame in seconds.
+
+        Returns:
+            bool: True if the quality level changed.
+        """
+        now = time.perf_counter()
+        if self._window_start is None:
+            self._window_start = now
+            return False
+        self._frames += 1
+        self._latency += latency
+        self._since_change += 1
+        if self._frames < self.window:
+            return False
+
+        fps = self._frames / (now - self._window_start)
+        mean_latency = self._latency / self._frames
+        self._frames, self._latency, self._window_start = 0, 0.0, now
+        if self._since_change < self.cooldown:
+            return False
+
+        too_slow = (self.target_fps and fps < self.target_fps) or (
+            self.latency_budget and mean_latency > self.latency_budget
+        )
+        fast_enough = (not self.target_fps or fps * self.headroom > self.target_fps) and (
+            not self.latency_budget or mean_latency < self.latency_budget * self.headroom
+        )
+        if too_slow and self.level < len(self.ladder) - 1:
+            level = self.level + 1
+        elif fast_enough and not too_slow and self.level > 0:
+            level = self.level - 1
+        else:
+            return False
+
+        print(
+            f"Quality level {self.level} -> {level} (fps={fps:.1f}, latency={mean_latency * 1000:.0f}ms): "
+            f"{describe_settings(self.ladder[level])}"
+        )
+        self.level = level
+        self.adjustments += 1
+        self._since_change = 0
+        return True
+
+    def summary(self):
+        return f"Quality controller: {self.adjustments} adjustments, final level {self.level} ({describe_settings(self.settings)})"
@@ -0,0 +1,312 @@
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+import numpy as np
+
+_END = object()
+
+
+class PrefetchReader:
+    """
+    Base class of the readers that decode frames ahead of the consumer on background threads.
+
+    Decoded frames wait in a bounded queue of `prefetch` frames. Iterating yields the frames
+    in source order; `close` stops the background work early (e.g. when the loop is cancelled).
+
+    Attributes:
+        total_frames (int): Number of frames reported by the source; replaced by the number
+            of frames actually delivered once the source is exhausted.
+        frames (int): Number of frames delivered so far.
+        frame_index (int): Source index of the last delivered frame (-1 before the first), which
+            differs from the number of delivered frames once a frame was skipped.
+        decode_time (float): Seconds spent decoding on the background threads.
+        wait_time (float): Seconds the consumer waited for a decoded frame.
+    """
+
+    def __init__(self, total_frames, prefetch=8):
+        self.total_frames = total_frames
+        self.prefetch = prefetch
+        self.frames = 0
+        self.frame_index = -1
+        self.decode_time = 0.0
+        self.wait_time = 0.0
+        self._occupancy_sum = 0
+        self._occupancy_max = 0
+        self._queue = queue.Queue(maxsize=prefetch)
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._produce_safely, name="frame-reader", daemon=True)
+        self._started = False
+
+    def __iter__(self):
+        if not self._started:
+            self._started = True
+            self._thread.start()
+        while True:
+            occupancy = self._queue.qsize()
+            self._occupancy_sum += occupancy
+            self._occupancy_max = max(self._occupancy_max, occupancy)
+
+            start = time.perf_counter()
+            item = self._queue.get()
+            self.wait_time += time.perf_counter() - start
+            if item is _END:
+                self.total_frames = self.frames
+                return
+            self.frame_index, frame = item
+            self.frames += 1
+            yield frame
+
+    def close(self):
+        """Stops the background decoding and waits for it to finish."""
+        self._stop.set()
+        while self._thread.is_alive():
+            try:
+                self._queue.get_nowait()
+            except queue.Empty:
+                pass
+            self._thread.join(timeout=0.01)
+        # Wakes up a consumer still waiting for a frame (e.g. the batch feeder of an aborted run)
+        try:
+            self._queue.put_nowait(_END)
+        except queue.Full:
+            pass
+
+    def summary(self):
+        mean_occupancy = self._occupancy_sum / self.frames if self.frames else 0.0
+        fps = self.frames / self.decode_time if self.decode_time > 0 else 0.0
+        return (
+            f"Decoded {self.frames} frames ({fps:.1f} fps decode), consumer waited {self.wait_time:.2f}s, "
+            f"queue occupancy mean={mean_occupancy:.1f} max={self._occupancy_max}/{self.prefetch}"
+        )
+
+    def _put(self, item):
+        """Puts an item into the queue, gives up when the reader is closed."""
+        while not self._stop.is_set():
+            try:
+                self._queue.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def _produce_safely(self):
+        try:
+            self._produce()
+        finally:
+            self._put(_END)
+
+    def _produce(self):
+        raise NotImplementedError
+
+
+class VideoPrefetchReader(PrefetchReader):
+    """
+    Decodes a video on a background thread into a ring of preallocated frames.
+
+    `cap.read` decodes straight into the next slot of the ring, so no frame is allocated
+    while the video plays. A slot is overwritten `prefetch + hold + 1` frames after it was
+    decoded, so the consumer may keep references to at most `hold` delivered frames. With
+    `hold=None` every frame gets its own buffer and the consumer may keep frames forever.
+
+    With a `resizer` the frames are decoded into a single full-resolution buffer and scaled
+    into the ring, so only reduced frames leave the reader.
+
+    Args:
+        cap (cv2.VideoCapture): Opened video capture.
+        prefetch (int, optional): Number of frames decoded ahead of the consumer. Defaults to 8.
+        hold (int, optional): Number of delivered frames the consumer may still reference.
+            Defaults to None (no buffer reuse).
+        resizer (IngestResizer, optional): Scales the frames to the inference resolution. Defaults to None.
+    """
+
+    def __init__(self, cap, prefetch=8, hold=None, resizer=None):
+        super().__init__(int(cap.get(cv2.CAP_PROP_FRAME_COUNT)), prefetch)
+        self.cap = cap
+        self.resizer = resizer
+        self._ring = None
+        if hold is not None:
+            width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+            height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+            if resizer is not None:
+                width, height = resizer.size
+            self._ring = np.empty((prefetch + hold + 1, height, width, 3), dtype=np.uint8)
+
+    def _produce(self):
+        index = 0
+        decoded = None
+        # A source that is already small enough decodes straight into the ring; going through the
+        # scratch buffer would hand out the same array for every frame
+        resize = self.resizer is not None and (self.resizer.source_size is None or self.resizer.reduces)
+        while not self._stop.is_set():
+            start = time.perf_counter()
+            slot = self._ring[index % len(self._ring)] if self._ring is not None else None
+            if resize:
+                ret_val, decoded = self.cap.read(decoded)
+                frame = self.resizer.resize(decoded, slot) if ret_val else None
+                if frame is decoded:
+                    decoded = None
+            else:
+                ret_val, frame = self.cap.read(slot)
+            self.decode_time += time.perf_counter() - start
+            if not ret_val or not self._put((index, frame)):
+                break
+            index += 1
+
+
+class ImagePrefetchReader(PrefetchReader):
+    """
+    Reads a sorted list of images with a pool of threads and delivers them in order.
+
+    Unreadable images are reported and skipped.
+
+    Args:
+        frame_files (list[str]): Paths to the frames, in order.
+        prefetch (int, optional): Number of frames read ahead of the consumer. Defaults to 8.
+        workers (int, optional): Number of reading threads. Defaults to 4.
+        resizer (IngestResizer, optional): Reads the images at the inference resolution. Defaults to None.
+    """
+
+    def __init__(self, frame_files, prefetch=8, workers=4, resizer=None):
+        super().__init__(len(frame_files), prefetch)
+        self.frame_files = frame_files
+        self.workers = workers
+        self.resizer = resizer
+        self._lock = threading.Lock()
+
+    def _read(self, path):
+        start = time.perf_counter()
+        frame = self.resizer.read(path) if self.resizer is not None else cv2.imread(path)
+        with self._lock:
+            self.decode_time += time.perf_counter() - start
+        return frame
+
+    def _produce(self):
+        with ThreadPoolExecutor(self.workers, thread_name_prefix="frame-reader") as pool:
+            pending = []
+            for index, path in enumerate(self.frame_files):
+                pending.append((index, path, pool.submit(self._read, path)))
+                if len(pending) < self.prefetch:
+                    continue
+                if not self._deliver(*pending.pop(0)):
+                    break
+            while pending and not self._stop.is_set():
+                if not self._deliver(*pending.pop(0)):
+                    break
+            for _, _, future in pending:
+                future.cancel()
+
+    def _deliver(self, index, path, future):
+        frame = future.result()
+        if frame is None:
+            print(f"Could not read frame: {path}")
+            return not self._stop.is_set()
+        return self._put((index, frame))
+
+
+class LatestFrameReader:
+    """
+    Grabs a live source (network stream or camera) on a background thread, keeping only the newest frame.
+
+    Frames that arrive while the consumer is busy replace the waiting frame instead of
+    queueing up, so a slow consumer always works on the most recent picture and its latency
+    never builds a backlog. Iterating blocks until a frame newer than the last delivered one
+    is available and ends when the source closes or the reader is closed.
+
+    The reader owns the capture and releases it in `close`. A stalled network source can
+    block `cap.read` for a long time, so `close` only waits `timeout` seconds for the grabber;
+    a grabber that is still blocked releases the capture itself once the read returns.
+
+    Attributes:
+        total_frames (int): Always 0, a live source has no known length.
+        frames (int): Number of frames delivered.
+        grabbed (int): Number of frames read from the source.
+        skipped (int): Number of frames replaced by a newer one before they were delivered.
+        capture_time (float): Time the last delivered frame was grabbed (seconds since the epoch).
+        frame_index (int): Number of frames grabbed before the last delivered one (-1 before the first).
+
+    Args:
+        cap (cv2.VideoCapture): Opened capture of the live source.
+        resizer (IngestResizer, optional): Scales the frames to the inference resolution. Defaults to None.
+    """
+
+    def __init__(self, cap, resizer=None):
+        self.cap = cap
+        self.resizer = resizer
+        self.total_frames = 0
+        self.frames = 0
+        self.grabbed = 0
+        self.skipped = 0
+        self.capture_time = None
+        self.frame_index = -1
+        self._latest = None
+        self._done = False
+        self._finished = False
+        self._release_on_exit = False
+        self._condition = threading.Condition()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._grab, name="frame-grabber", daemon=True)
+        self._started = False
+
+    def __iter__(self):
+        if not self._started:
+            self._started = True
+            self._thread.start()
+        while True:
+            with self._condition:
+                while self._latest is None and not self._done:
+                    self._condition.wait()
+                if self._latest is None:
+                    return
+                frame, self.capture_time, self.frame_index = self._latest
+                self._latest = None
+            self.frames += 1
+            yield frame
+
+    def close(self, timeout=1.0):
+        """
+        Stops grabbing, waits up to `timeout` seconds for the grabber thread and releases the capture.
+
+        Returns:
+            bool: False if the grabber is still blocked on the source; it then releases the
+            capture when the read returns.
+        """
+        self._stop.set()
+        with self._condition:
+            self._done = True
+            self._condition.notify_all()
+        if self._thread.is_alive():
+            self._thread.join(timeout)
+        with self._condition:
+            if self._started and not self._finished:
+                self._release_on_exit = True
+                return False
+        self.cap.release()
+        return True
+
+    def summary(self):
+        return f"Grabbed {self.grabbed} frames, delivered {self.frames}, skipped {self.skipped} stale frames"
+
+    def _grab(self):
+        try:
+            while not self._stop.is_set():
+                ret_val, frame = self.cap.read()
+                capture_time = time.time()
+                if not ret_val:
+                    break
+                if self.resizer is not None:
+                    frame = self.resizer.resize(frame)
+                with self._condition:
+                    if self._latest is not None:
+                        self.skipped += 1
+                    self._latest = (frame, capture_time, self.grabbed)
+                    self.grabbed += 1
+                    self._condition.notify()
+        finally:
+            with self._condition:
+                self._done = self._finished = True
+                self._condition.notify()
+                if self._release_on_exit:
+                    self.cap.release()
@@ -0,0 +1,206 @@
+import cv2
+import numpy as np
+from src.loop.utils.boxes import centers_inside
+from src.loop.utils.process import extract_detections
+from src.loop.utils.tiling import merge_detections
+
+MOTION_METHODS = ("diff", "mog2")
+
+
+class MotionRegionFinder:
+    """
+    Finds moving regions of a frame with a cheap background model on a downscaled copy.
+
+    Args:
+        method (str, optional): "diff" compares with the previous frame, "mog2" keeps an
+            adaptive Gaussian mixture background. Defaults to "diff".
+        threshold (int, optional): Intensity change of a moving pixel for "diff". Defaults to 25.
+        scale (int, optional): Downscale factor of the motion analysis. Defaults to 4.
+        min_area (int, optional): Minimum area of a region in downscaled pixels. Defaults to 2.
+    """
+
+    def __init__(self, method="diff", threshold=25, scale=4, min_area=2):
+        if method not in MOTION_METHODS:
+            raise ValueError(f"Unknown motion method: {method}. Expected one of {MOTION_METHODS}.")
+        self.method = method
+        self.threshold = threshold
+        self.scale = scale
+        self.min_area = min_area
+        self._previous = None
+        self._subtractor = cv2.createBackgroundSubtractorMOG2(detectShadows=False) if method == "mog2" else None
+        self._kernel = np.ones((3, 3), dtype=np.uint8)
+
+    def __call__(self, frame):
+        """
+        Returns the moving regions of the frame.
+
+        Args:
+            frame (np.ndarray): The input frame.
+
+        Returns:
+            np.ndarray: Array of shape (N, 4) with regions [x_min, y_min, x_max, y_max] in
+            frame coordinates, or None when there is no reference yet (first frame).
+        """
+        height, width = frame.shape[:2]
+        size = (max(width // self.scale, 1), max(height // self.scale, 1))
+        small = cv2.resize(cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY), size, interpolation=cv2.INTER_AREA)
+
+        if self.method == "mog2":
+            mask = self._subtractor.apply(small) > 0
+            first = self._previous is None
+            self._previous = True
+        else:
+            previous, self._previous = self._previous, small
+            if previous is None or previous.shape != small.shape:
+                return None
+            mask = cv2.absdiff(previous, small) > self.threshold
+            first = False
+        if first:
+            return None
+
+        mask = cv2.dilate(mask.astype(np.uint8), self._kernel)
+        count, _, stats, _ = cv2.connectedComponentsWithStats(mask, connectivity=8)
+        stats = stats[1:count]
+        stats = stats[stats[:, cv2.CC_STAT_AREA] >= self.min_area]
+        regions = np.stack([
+            stats[:, cv2.CC_STAT_LEFT],
+            stats[:, cv2.CC_STAT_TOP],
+            stats[:, cv2.CC_STAT_LEFT] + stats[:, cv2.CC_STAT_WIDTH],
+            stats[:, cv2.CC_STAT_TOP] + stats[:, cv2.CC_STAT_HEIGHT],
+        ], axis=1) * self.scale
+        return np.minimum(regions, [width, height, width, height])
+
+
+def region_crop(region, crop_size, width, height):
+    """
+    Builds a crop window of at least `crop_size` centered on a region and kept inside the frame.
+
+    Args:
+        region (np.ndarray): Region [x_min, y_min, x_max, y_max].
+        crop_size (int): Minimum side of the crop.
+        width (int): Width of the frame.
+        height (int): Height of the frame.
+
+    Returns:
+        tuple: Crop window (x_min, y_min, x_max, y_max).
+    """
+    x_min, y_min, x_max, y_max = (int(v) for v in region)
+    crop_w = min(max(x_max - x_min, crop_size), width)
+    crop_h = min(max(y_max - y_min, crop_size), height)
+    x = min(max((x_min + x_max - crop_w) // 2, 0), width - crop_w)
+    y = min(max((y_min + y_max - crop_h) // 2, 0), height - crop_h)
+    return x, y, x + crop_w, y + crop_h
+
+
+class RoiDetector:
+    """
+    Runs the detector only around moving regions of mostly static footage.
+
+    For every frame the motion finder returns the moving regions:
+        - no motion: the detector is skipped and the previous detections are reused ("skipped");
+        - some motion: crops of `crop_size` around the regions are detected at `imgsz=crop_size`
+          in one batch with the crops of the other frames ("cropped"). Previous detections
+          centered outside the crops are kept and merged with the detections of the crops;
+        - no reference frame, crops more expensive than the full frame or `refresh_interval`
+          frames since the last full-frame pass: full-frame pass ("full"), which replaces all
+          previous detections.
+
+    The compute of a pass is estimated as the number of input pixels of the network, so a
+    crop costs (crop_size / imgsz) ** 2 of a full-frame pass. After each call
+    `last_reports` holds a dict with the status and the saved compute fraction of every frame.
+    `predict_args` holds extra arguments of every predict call (e.g. `conf`).
+
+    Args:
+        model (YOLO): YOLO model instance for object detection.
+        crop_size (int, optional): Side of the crops and their inference size. Defaults to 320.
+        imgsz (int, optional): Inference size of a full-frame pass. Defaults to 640.
+        finder (MotionRegionFinder, optional): Motion analysis to use. Defaults to frame differencing.
+        refresh_interval (int, optional): Maximum number of frames between full-frame passes, so
+            detections of objects that stopped moving are confirmed or dropped. None never
+            forces a full-frame pass. Defaults to 30.
+    """
+
+    def __init__(self, model, crop_size=320, imgsz=640, finder=None, refresh_interval=30):
+        self.model = model
+        self.crop_size = crop_size
+        self.imgsz = imgsz
+        self.finder = finder or MotionRegionFinder()
+        self.refresh_interval = refresh_interval
+        self.predict_args = {}
+        self.last_reports = []
+        self.counts = {"skipped": 0, "cropped": 0, "full": 0}
+        self.saved = 0.0
+        self._since_full = 0
+        self._previous = (np.zeros((0, 4), dtype=np.float32), np.zeros(0, dtype=int), np.zeros(0, dtype=np.float32))
+
+    def __call__(self, frames):
+        """
+        Detects objects on a batch of frames.
+
+        Args:
+            frames (list[np.ndarray]): The input frames.
+
+        Returns:
+            list[tuple]: Boxes, class indices and probabilities for every frame, in input order.
+        """
+        crop_cost = (self.crop_size / self.imgsz) ** 2
+        plans, crops, origins, owners = [], [], [], []
+        full_frames, full_owners = [], []
+
+        for index, frame in enumerate(frames):
+            height, width = frame.shape[:2]
+            regions = self.finder(frame)
+            self._since_full += 1
+            refresh = self.refresh_interval is not None and self._since_full >= self.refresh_interval
+            if regions is not None and len(regions) == 0 and not refresh:
+                plans.append(("skipped", 1.0, None))
+                continue
+            windows = [] if regions is None else sorted({region_crop(r, self.crop_size, width, height) for r in regions})
+            cost = len(windows) * crop_cost
+            if regions is None or cost >= 1.0 or refresh:
+                plans.append(("full", 0.0, None))
+                full_frames.append(frame)
+                full_owners.append(index)
+                self._since_full = 0
+                continue
+            plans.append(("cropped", 1.0 - cost, windows))
+            for x_min, y_min, x_max, y_max in windows:
+                crops.append(frame[y_min:y_max, x_min:x_max])
+                origins.append((x_min, y_min))
+                owners.append(index)
+
+        per_frame = [([], [], []) for _ in frames]
+        passes = [(crops, origins, owners, self.crop_size), (full_frames, [(0, 0)] * len(full_frames), full_owners, self.imgsz)]
+        for inputs, input_origins, input_owners, imgsz in passes:
+            if not inputs:
+                continue
+            for result, (x, y), owner in zip(self.model.predict(inputs, imgsz=imgsz, **self.predict_args), input_origins, input_owners):
+                boxes, class_ids, scores = extract_detections(result)
+                per_frame[owner][0].append(boxes + np.array([x, y, x, y], dtype=boxes.dtype))
+                per_frame[owner][1].append(class_ids)
+                per_frame[owner][2].append(scores)
+
+        detections, self.last_reports = [], []
+        for (status, saved, windows), (boxes, class_ids, scores) in zip(plans, per_frame):
+            if status == "cropped":
+                # The crops only cover the moving regions, detections elsewhere stay valid
+                keep = ~centers_inside(self._previous[0], windows)
+                boxes = [self._previous[0][keep]] + boxes
+                class_ids = [self._previous[1][keep]] + class_ids
+                scores = [self._previous[2][keep]] + scores
+            if status != "skipped":
+                if boxes:
+                    self._previous = merge_detections(np.concatenate(boxes), np.concatenate(class_ids), np.concatenate(scores))
+                else:
+                    self._previous = (np.zeros((0, 4), dtype=np.float32), np.zeros(0, dtype=int), np.zeros(0, dtype=np.float32))
+            detections.append(tuple(array.copy() for array in self._previous))
+            self.counts[status] += 1
+            self.saved += saved
+            self.last_reports.append({"roi_status": status, "compute_saved": saved})
+        return detections
+
+    def summary(self):
+        frames = sum(self.counts.values())
+        saved = self.saved / frames if frames else 0.0
+        counts = ", ".join(f"{status}={count}" for status, count in self.counts.items())
+        return f"ROI inference: {counts}, compute saved {saved:.1%}"
@@ -0,0 +1,239 @@
+import cv2
+import numpy as np
+from src.loop.utils.boxes import box_iou, centers_inside
+from src.loop.utils.process import extract_detections
+
+MERGE_METHODS = ("nms", "wbf")
+
+
+def make_tiles(width, height, tile_size=640, overlap=0.2):
+    """
+    Cuts a frame into overlapping square tiles that cover it completely.
+
+    The last tile of each row/column is aligned to the frame edge, so all tiles have the
+    same size (unless the frame is smaller than a tile).
+
+    Args:
+        width (int): Width of the frame.
+        height (int): Height of the frame.
+        tile_size (int, optional): Side of a tile in pixels. Defaults to 640.
+        overlap (float, optional): Fraction of a tile shared with its neighbour. Defaults to 0.2.
+
+    Returns:
+        np.ndarray: Array of shape (N, 4) with tiles [x_min, y_min, x_max, y_max].
+    """
+    if not 0 <= overlap < 1:
+        raise ValueError("Tile overlap must be in [0, 1).")
+    step = max(int(tile_size * (1 - overlap)), 1)
+
+    def starts(length):
+        if length <= tile_size:
+            return [0]
+        positions = list(range(0, length - tile_size, step))
+        return positions + [length - tile_size]
+
+    xs, ys = starts(width), starts(height)
+    tiles = [
+        (x, y, min(x + tile_size, width), min(y + tile_size, height))
+        for y in ys
+        for x in xs
+    ]
+    return np.array(tiles, dtype=int)
+
+
+def motion_mask(previous_gray, gray, threshold=25, scale=4):
+    """
+    Finds the pixels that changed between two frames with a downscaled frame difference.
+
+    Args:
+        previous_gray (np.ndarray): Previous grayscale frame.
+        gray (np.ndarray): Current grayscale frame.
+        threshold (int, optional): Minimum intensity change of a moving pixel. Defaults to 25.
+        scale (int, optional): Downscale factor of the comparison. Defaults to 4.
+
+    Returns:
+        np.ndarray: Boolean mask at the downscaled resolution.
+    """
+    size = (max(gray.shape[1] // scale, 1), max(gray.shape[0] // scale, 1))
+    previous_small = cv2.resize(previous_gray, size, interpolation=cv2.INTER_AREA)
+    small = cv2.resize(gray, size, interpolation=cv2.INTER_AREA)
+    return cv2.absdiff(previous_small, small) > threshold
+
+
+def active_tiles(tiles, mask, scale=4):
+    """
+    Tells which tiles contain at least one moving pixel.
+
+    Args:
+        tiles (np.ndarray): Tiles [x_min, y_min, x_max, y_max] in frame coordinates.
+        mask (np.ndarray): Boolean motion mask built by `motion_mask`.
+        scale (int, optional): Downscale factor of the mask. Defaults to 4.
+
+    Returns:
+        np.ndarray: Boolean array, True for tiles with motion.
+    """
+    # Summed-area table: the motion inside any rectangle costs four lookups
+    integral = cv2.integral(mask.astype(np.uint8))
+    x_min, y_min = tiles[:, 0] // scale, tiles[:, 1] // scale
+    x_max = np.minimum(-(-tiles[:, 2] // scale), mask.shape[1])
+    y_max = np.minimum(-(-tiles[:, 3] // scale), mask.shape[0])
+    moving = integral[y_max, x_max] - integral[y_min, x_max] - integral[y_max, x_min] + integral[y_min, x_min]
+    return moving > 0
+
+
+def merge_detections(boxes, class_ids, scores, iou_threshold=0.5, method="nms"):
+    """
+    Merges duplicate detections of the same object, e.g. across tile seams.
+
+    Args:
+        boxes (np.ndarray): Boxes [x_min, y_min, x_max, y_max].
+        class_ids (np.ndarray): Class indices.
+        scores (np.ndarray): Probabilities for each detection.
+        iou_threshold (float, optional): IoU above which two boxes of a class are duplicates. Defaults to 0.5.
+        method (str, optional): "nms" keeps the best box of a group, "wbf" replaces it by the
+            score-weighted average of the group. Defaults to "nms".
+
+    Returns:
+        tuple: Merged boxes, class indices and probabilities.
+    """
+    if method not in MERGE_METHODS:
+        raise ValueError(f"Unknown merge method: {method}. Expected one of {MERGE_METHODS}.")
+    boxes = np.asarray(boxes, dtype=np.float32).reshape(-1, 4)
+    class_ids = np.asarray(class_ids, dtype=int)
+    scores = np.asarray(scores, dtype=np.float32)
+    if len(boxes) < 2:
+        return boxes, class_ids, scores
+
+    order = np.argsort(-scores)
+    boxes, class_ids, scores = boxes[order], class_ids[order], scores[order]
+    iou = box_iou(boxes, boxes)
+    duplicate = (iou > iou_threshold) & (class_ids[:, None] == class_ids[None, :])
+
+    keep = np.ones(len(boxes), dtype=bool)
+    for index in range(len(boxes)):
+        if keep[index]:
+            later = duplicate[index].copy()
+            later[:index + 1] = False
+            keep[later] = False
+    kept = np.flatnonzero(keep)
+
+    merged = boxes[kept]
+    if method == "wbf":
+        # Every box joins the best kept box it duplicates (a kept box owns itself)
+        owner = np.argmax(duplicate[kept], axis=0)
+        weights = np.zeros((len(kept), len(boxes)), dtype=np.float32)
+        weights[owner, np.arange(len(boxes))] = scores
+        merged = (weights @ boxes) / weights.sum(axis=1, keepdims=True)
+
+    return merged.astype(np.float32), class_ids[kept], scores[kept]
+
+
+class TiledDetector:
+    """
+    Runs the detector on overlapping tiles of each frame so tiny distant objects keep enough pixels.
+
+    All tiles of all frames of a batch go through a single predict call. The boxes are
+    mapped back to frame coordinates and duplicates across tile seams are merged. An
+    optional full-frame pass catches objects larger than a tile. With
+    `motion_threshold` set, tiles without any moving pixel since the previous call are
+    skipped, which keeps the compute bounded on mostly static footage. The previous
+    detections centered in skipped tiles are kept, so a hovering drone is still reported.
+    `predict_args` holds extra arguments of every predict call (e.g. `conf`).
+
+    Args:
+        model (YOLO): YOLO model instance for object detection.
+        tile_size (int, optional): Side of a tile in pixels. Defaults to 640.
+        overlap (float, optional): Fraction of a tile shared with its neighbour. Defaults to 0.2.
+        full_frame (bool, optional): Whether to also run the detector on the whole frame. Defaults to True.
+        motion_threshold (int, optional): Intensity change that marks a pixel as moving;
+            None runs every tile. Defaults to None.
+        merge_method (str, optional): "nms" or "wbf", see `merge_detections`. Defaults to "nms".
+        merge_iou (float, optional): IoU threshold of the merge. Defaults to 0.5.
+    """
+
+    def __init__(self, model, tile_size=640, overlap=0.2, full_frame=True, motion_threshold=None,
+                 merge_method="nms", merge_iou=0.5):
+        self.model = model
+        self.tile_size = tile_size
+        self.overlap = overlap
+        self.full_frame = full_frame
+        self.motion_threshold = motion_threshold
+        self.merge_method = merge_method
+        self.merge_iou = merge_iou
+        self.predict_args = {}
+        self.tiles_run = 0
+        self.tiles_total = 0
+        self._tiles = None
+        self._previous_gray = None
+        self._previous = (np.zeros((0, 4), dtype=np.float32), np.zeros(0, dtype=int), np.zeros(0, dtype=np.float32))
+
+    def __call__(self, frames):
+        """
+        Detects objects on a batch of frames.
+
+        Args:
+            frames (list[np.ndarray]): The input frames.
+
+        Returns:
+            list[tuple]: Boxes, class indices and probabilities for every frame, in input order.
+        """
+        crops, origins, owners, runs = [], [], [], []
+        for index, frame in enumerate(frames):
+            height, width = frame.shape[:2]
+            if self._tiles is None or self._tiles[1] != (width, height):
+                self._tiles = (make_tiles(width, height, self.tile_size, self.overlap), (width, height))
+            tiles = self._tiles[0]
+            selected = tiles[self._select(frame, tiles)]
+            self.tiles_total += len(tiles)
+            self.tiles_run += len(selected)
+            # Only a frame without the full-frame pass and with skipped tiles carries detections over
+            runs.append(selected if len(selected) < len(tiles) and not self.full_frame else None)
+
+            for x_min, y_min, x_max, y_max in selected:
+                crops.append(frame[y_min:y_max, x_min:x_max])
+                origins.append((x_min, y_min))
+                owners.append(index)
+            if self.full_frame:
+                crops.append(frame)
+                origins.append((0, 0))
+                owners.append(index)
+
+        per_frame = [([], [], []) for _ in frames]
+        if crops:
+            for result, (x, y), owner in zip(self.model.predict(crops, **self.predict_args), origins, owners):
+                boxes, class_ids, scores = extract_detections(result)
+                per_frame[owner][0].append(boxes + np.array([x, y, x, y], dtype=boxes.dtype))
+                per_frame[owner][1].append(class_ids)
+                per_frame[owner][2].append(scores)
+
+        detections = []
+        for selected, (boxes, class_ids, scores) in zip(runs, per_frame):
+            if selected is not None:
+                # Static tiles were not run, their detections of the previous frame stay valid
+                keep = ~centers_inside(self._previous[0], selected)
+                boxes = [self._previous[0][keep]] + boxes
+                class_ids = [self._previous[1][keep]] + class_ids
+                scores = [self._previous[2][keep]] + scores
+            if boxes:
+                self._previous = merge_detections(
+                    np.concatenate(boxes), np.concatenate(class_ids), np.concatenate(scores),
+                    self.merge_iou, self.merge_method,
+                )
+            else:
+                self._previous = (np.zeros((0, 4), dtype=np.float32), np.zeros(0, dtype=int), np.zeros(0, dtype=np.float32))
+            detections.append(tuple(array.copy() for array in self._previous))
+        return detections
+
+    def summary(self):
+        ratio = self.tiles_run / self.tiles_total if self.tiles_total else 0.0
+        return f"Tiles processed: {self.tiles_run}/{self.tiles_total} ({ratio:.1%})"
+
+    def _select(self, frame, tiles):
+        """Boolean mask of the tiles to run on this frame."""
+        if self.motion_threshold is None:
+            return np.ones(len(tiles), dtype=bool)
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        previous_gray, self._previous_gray = self._previous_gray, gray
+        if previous_gray is None or previous_gray.shape != gray.shape:
+            return np.ones(len(tiles), dtype=bool)
+        return active_tiles(tiles, motion_mask(previous_gray, gray, self.motion_threshold))
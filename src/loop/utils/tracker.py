@@ -0,0 +1,207 @@
+import itertools
+
+import numpy as np
+from scipy.optimize import linear_sum_assignment
+from src.loop.utils.boxes import box_iou
+
+# Constant velocity model over [cx, cy, w, h, vcx, vcy, vw, vh]
+_F = np.eye(8, dtype=np.float64)
+_F[:4, 4:] = np.eye(4)
+_STD_POSITION = 1.0 / 20
+_STD_VELOCITY = 1.0 / 160
+
+
+def _xyxy_to_xywh(boxes):
+    boxes = np.asarray(boxes, dtype=np.float64).reshape(-1, 4)
+    wh = boxes[:, 2:] - boxes[:, :2]
+    return np.hstack([boxes[:, :2] + wh / 2, wh])
+
+
+def _xywh_to_xyxy(states):
+    wh = np.maximum(states[:, 2:4], 1.0)
+    return np.hstack([states[:, :2] - wh / 2, states[:, :2] + wh / 2]).astype(np.float32)
+
+
+def _size_std(wh, factor):
+    """Per-coordinate noise scaled by the box size: [w, h, w, h] * factor."""
+    return np.tile(wh, 2) * factor
+
+
+def associate(track_boxes, det_boxes, threshold):
+    """
+    Matches tracks to detections with the Hungarian algorithm on the IoU matrix.
+
+    Args:
+        track_boxes (np.ndarray): Array of shape (N, 4) with predicted track boxes.
+        det_boxes (np.ndarray): Array of shape (M, 4) with detected boxes.
+        threshold (float): Minimum IoU of a match.
+
+    Returns:
+        tuple:
+            - np.ndarray: Matched track indices.
+            - np.ndarray: Matched detection indices.
+    """
+    if len(track_boxes) == 0 or len(det_boxes) == 0:
+        return np.zeros(0, dtype=int), np.zeros(0, dtype=int)
+    iou = box_iou(track_boxes, det_boxes)
+    rows, cols = linear_sum_assignment(-iou)
+    keep = iou[rows, cols] >= threshold
+    return rows[keep], cols[keep]
+
+
+class MultiObjectTracker:
+    """
+    SORT/ByteTrack style tracker that assigns persistent IDs to per-frame detections.
+
+    Every track carries a Kalman filter with a constant velocity model over the box
+    center and size. All filters are stored as stacked arrays, so prediction, IoU and
+    correction are computed for all tracks at once. Detections are associated in two
+    rounds as in ByteTrack: confident detections first, then the remaining tracks are
+    matched against low-score detections, which keeps tracks alive through short
+    confidence drops. A track is only reported after `min_hits` matches, which removes
+    flickering false positives.
+
+    Args:
+        high_threshold (float, optional): Score of detections used in the first round and to start tracks. Defaults to 0.5.
+        low_threshold (float, optional): Minimum score of detections used in the second round. Defaults to 0.1.
+        match_iou (float, optional): Minimum IoU of a first round match. Defaults to 0.3.
+        low_match_iou (float, optional): Minimum IoU of a second round match. Defaults to 0.5.
+        min_hits (int, optional): Matches needed before a track is reported. Defaults to 3.
+        max_age (int, optional): Detector runs a track survives without a match. Defaults to 30.
+    """
+
+    def __init__(self, high_threshold=0.5, low_threshold=0.1, match_iou=0.3, low_match_iou=0.5, min_hits=3, max_age=30):
+        self.high_threshold = high_threshold
+        self.low_threshold = low_threshold
+        self.match_iou = match_iou
+        self.low_match_iou = low_match_iou
+        self.min_hits = min_hits
+        self.max_age = max_age
+        self._next_id = itertools.count(1)
+
+        self._mean = np.zeros((0, 8))
+        self._covariance = np.zeros((0, 8, 8))
+        self._ids = np.zeros(0, dtype=int)
+        self._class_ids = np.zeros(0, dtype=int)
+        self._scores = np.zeros(0, dtype=np.float32)
+        self._hits = np.zeros(0, dtype=int)
+        self._misses = np.zeros(0, dtype=int)
+
+    def __len__(self):
+        return len(self._ids)
+
+    def update(self, boxes, class_ids, scores):
+        """
+        Advances all tracks by one detector run and associates the new detections.
+
+        Args:
+            boxes (np.ndarray): Detected boxes [x_min, y_min, x_max, y_max].
+            class_ids (np.ndarray): Class indices.
+            scores (np.ndarray): Probabilities for each detection.
+
+        Returns:
+            tuple: Boxes, class indices, probabilities and track IDs of the confirmed tracks
+            matched on this frame.
+        """
+        boxes = np.asarray(boxes, dtype=np.float32).reshape(-1, 4)
+        class_ids = np.asarray(class_ids, dtype=int)
+        scores = np.asarray(scores, dtype=np.float32)
+        self._predict()
+
+        predicted = _xywh_to_xyxy(self._mean)
+        high = np.flatnonzero(scores >= self.high_threshold)
+        low = np.flatnonzero((scores >= self.low_threshold) & (scores < self.high_threshold))
+
+        tracks, dets = associate(predicted, boxes[high], self.match_iou)
+        matched_tracks, matched_dets = [tracks], [high[dets]]
+
+        remaining = np.setdiff1d(np.arange(len(self)), tracks)
+        tracks, dets = associate(predicted[remaining], boxes[low], self.low_match_iou)
+        matched_tracks.append(remaining[tracks])
+        matched_dets.append(low[dets])
+
+        matched_tracks = np.concatenate(matched_tracks)
+        matched_dets = np.concatenate(matched_dets)
+        self._correct(matched_tracks, boxes[matched_dets])
+        self._class_ids[matched_tracks] = class_ids[matched_dets]
+        self._scores[matched_tracks] = scores[matched_dets]
+        self._hits[matched_tracks] += 1
+        self._misses += 1
+        self._misses[matched_tracks] = 0
+
+        alive = self._misses <= self.max_age
+        self._select(alive)
+
+        new = np.setdiff1d(high, matched_dets)
+        self._start(boxes[new], class_ids[new], scores[new])
+
+        return self._report(self._misses == 0)
+
+    def coast(self):
+        """
+        Advances all tracks by one frame without detections (frames between keyframes).
+
+        Returns:
+            tuple: Predicted boxes, class indices, probabilities and track IDs of the
+            confirmed tracks that were matched on the last detector run.
+        """
+        self._predict()
+        return self._report(self._misses == 0)
+
+    def _report(self, mask):
+        mask = mask & (self._hits >= self.min_hits)
+        return (
+            _xywh_to_xyxy(self._mean[mask]),
+            self._class_ids[mask].copy(),
+            self._scores[mask].copy(),
+            self._ids[mask].copy(),
+        )
+
+    def _predict(self):
+        if not len(self):
+            return
+        wh = self._mean[:, 2:4]
+        std = np.hstack([_size_std(wh, _STD_POSITION), _size_std(wh, _STD_VELOCITY)])
+        noise = np.einsum("ni,ij->nij", std ** 2, np.eye(8))
+        self._mean = self._mean @ _F.T
+        self._covariance = _F @ self._covariance @ _F.T + noise
+
+    def _correct(self, indices, boxes):
+        if not len(indices):
+            return
+        measurement = _xyxy_to_xywh(boxes)
+        mean = self._mean[indices]
+        covariance = self._covariance[indices]
+
+        std = _size_std(mean[:, 2:4], _STD_POSITION)
+        innovation_cov = covariance[:, :4, :4] + np.einsum("ni,ij->nij", std ** 2, np.eye(4))
+        gain = covariance[:, :, :4] @ np.linalg.inv(innovation_cov)
+        innovation = measurement - mean[:, :4]
+
+        self._mean[indices] = mean + np.einsum("nij,nj->ni", gain, innovation)
+        self._covariance[indices] = covariance - gain @ covariance[:, :4, :]
+
+    def _start(self, boxes, class_ids, scores):
+        if not len(boxes):
+            return
+        measurement = _xyxy_to_xywh(boxes)
+        wh = measurement[:, 2:]
+        std = np.hstack([_size_std(wh, 2 * _STD_POSITION), _size_std(wh, 10 * _STD_VELOCITY)])
+        mean = np.hstack([measurement, np.zeros_like(measurement)])
+
+        self._mean = np.vstack([self._mean, mean])
+        self._covariance = np.concatenate([self._covariance, np.einsum("ni,ij->nij", std ** 2, np.eye(8))])
+        self._ids = np.concatenate([self._ids, [next(self._next_id) for _ in range(len(boxes))]])
+        self._class_ids = np.concatenate([self._class_ids, class_ids])
+        self._scores = np.concatenate([self._scores, scores])
+        self._hits = np.concatenate([self._hits, np.ones(len(boxes), dtype=int)])
+        self._misses = np.concatenate([self._misses, np.zeros(len(boxes), dtype=int)])
+
+    def _select(self, mask):
+        self._mean = self._mean[mask]
+        self._covariance = self._covariance[mask]
+        self._ids = self._ids[mask]
+        self._class_ids = self._class_ids[mask]
+        self._scores = self._scores[mask]
+        self._hits = self._hits[mask]
+        self._misses = self._misses[mask]
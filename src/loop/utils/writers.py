@@ -0,0 +1,291 @@
+import os
+import queue
+import shutil
+import subprocess
+import tempfile
+import threading
+import time
+
+import cv2
+
+# Sink name -> (file extension, OpenCV fourcc or FFmpeg encoder)
+VIDEO_SINKS = {
+    "xvid": (".avi", "XVID"),
+    "mjpeg": (".avi", "MJPG"),
+    "raw": (".avi", "I420"),
+    "h264": (".mp4", "libx264"),
+    "h265": (".mp4", "libx265"),
+    "images": ("", None),
+}
+
+# Encoders that take `-preset`; others (e.g. "*_vaapi", "*_videotoolbox") reject the option
+PRESET_ENCODERS = ("libx264", "libx265", "_nvenc", "_qsv")
+# NVENC names its presets p1 (fastest) to p7 (best quality) instead of the x264 names
+NVENC_PRESETS = {
+    "ultrafast": "p1", "superfast": "p1", "veryfast": "p2", "faster": "p3", "fast": "p3",
+    "medium": "p4", "slow": "p5", "slower": "p6", "veryslow": "p7",
+}
+
+
+def ffmpeg_command(ffmpeg, path, width, height, fps, encoder="libx264", preset="veryfast", crf=23):
+    """
+    Builds the `ffmpeg` command that encodes raw BGR frames from stdin.
+
+    The preset is only passed to encoders that support it, and x264 preset names are
+    translated for NVENC. yuv420p needs even frame sides, so frames of odd width or height
+    are padded by one black pixel row/column.
+
+    Args:
+        ffmpeg (str): Path of the ffmpeg binary.
+        path (str): Path of the video file.
+        width (int): Width of the video frames.
+        height (int): Height of the video frames.
+        fps (float): Frame rate of the video.
+        encoder (str, optional): FFmpeg video encoder. Defaults to "libx264".
+        preset (str, optional): Encoder speed/quality preset. Defaults to "veryfast".
+        crf (int, optional): Constant rate factor of the software encoders. Defaults to 23.
+
+    Returns:
+        list[str]: The command.
+    """
+    command = [
+        ffmpeg, "-y", "-loglevel", "error",
+        "-f", "rawvideo", "-pix_fmt", "bgr24", "-s", f"{width}x{height}", "-r", str(fps), "-i", "-",
+        "-c:v", encoder,
+    ]
+    if preset and encoder.endswith(PRESET_ENCODERS):
+        if encoder.endswith("_nvenc"):
+            preset = NVENC_PRESETS.get(preset, preset)
+        command += ["-preset", preset]
+    if encoder in ("libx264", "libx265"):
+        command += ["-crf", str(crf)]
+    if width % 2 or height % 2:
+        command += ["-vf", "pad=ceil(iw/2)*2:ceil(ih/2)*2"]
+    return command + ["-pix_fmt", "yuv420p", path]
+
+
+class FrameWriter:
+    """
+    Base class of the output sinks; counts written frames and the time spent encoding them.
+
+    Attributes:
+        path (str): Output file or directory.
+        frames (int): Number of frames encoded.
+        dropped (int): Number of frames dropped before encoding.
+        encode_time (float): Seconds spent in the encoder.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.frames = 0
+        self.dropped = 0
+        self.encode_time = 0.0
+
+    def write(self, frame):
+        start = time.perf_counter()
+        self._write(frame)
+        self.encode_time += time.perf_counter() - start
+        self.frames += 1
+
+    def release(self):
+        pass
+
+    def summary(self):
+        fps = self.frames / self.encode_time if self.encode_time > 0 else 0.0
+        return f"Encoded {self.frames} frames to {self.path} ({fps:.1f} fps encode), dropped {self.dropped}"
+
+    def _write(self, frame):
+        raise NotImplementedError
+
+
+class OpenCVWriter(FrameWriter):
+    """
+    Writes an AVI through `cv2.VideoWriter` ("XVID", fast "MJPG" or uncompressed "I420").
+
+    Args:
+        path (str): Path of the video file.
+        width (int): Width of the video frames.
+        height (int): Height of the video frames.
+        fps (float): Frame rate of the video.
+        fourcc (str, optional): Four character code of the codec. Defaults to "XVID".
+    """
+
+    def __init__(self, path, width, height, fps, fourcc="XVID"):
+        super().__init__(path)
+        self._writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*fourcc), fps, (width, height))
+        if not self._writer.isOpened():
+            raise ValueError(f"Unable to open video writer with codec {fourcc}: {path}")
+
+    def _write(self, frame):
+        self._writer.write(frame)
+
+    def release(self):
+        self._writer.release()
+
+
+class FFmpegWriter(FrameWriter):
+    """
+    Pipes raw BGR frames into an `ffmpeg` process.
+
+    Any encoder of the local FFmpeg build can be used, including hardware ones
+    (e.g. "h264_nvenc", "h264_qsv", "hevc_vaapi"). See `ffmpeg_command` for the options.
+
+    Args:
+        path (str): Path of the video file.
+        width (int): Width of the video frames.
+        height (int): Height of the video frames.
+        fps (float): Frame rate of the video.
+        encoder (str, optional): FFmpeg video encoder. Defaults to "libx264".
+        preset (str, optional): Encoder speed/quality preset, ignored by encoders without
+            presets. Defaults to "veryfast".
+        crf (int, optional): Constant rate factor of the software encoders. Defaults to 23.
+
+    Raises:
+        ValueError: If `ffmpeg` is not installed.
+    """
+
+    def __init__(self, path, width, height, fps, encoder="libx264", preset="veryfast", crf=23):
+        super().__init__(path)
+        ffmpeg = shutil.which("ffmpeg")
+        if ffmpeg is None:
+            raise ValueError("FFmpeg output requires the ffmpeg binary on PATH.")
+        command = ffmpeg_command(ffmpeg, path, width, height, fps, encoder, preset, crf)
+        # A file instead of a pipe, so a chatty ffmpeg can never block on a full stderr pipe
+        self._stderr = tempfile.TemporaryFile()
+        self._process = subprocess.Popen(command, stdin=subprocess.PIPE, stderr=self._stderr)
+
+    def _write(self, frame):
+        self._process.stdin.write(memoryview(frame).cast("B") if frame.flags.c_contiguous else frame.tobytes())
+
+    def release(self):
+        """
+        Closes the input of ffmpeg and waits for the encoding to finish.
+
+        Raises:
+            RuntimeError: If ffmpeg exits with an error; the message holds its stderr.
+        """
+        try:
+            self._process.stdin.close()
+        except BrokenPipeError:
+            # ffmpeg already exited; its return code tells why
+            pass
+        returncode = self._process.wait()
+        self._stderr.seek(0)
+        stderr = self._stderr.read().decode(errors="replace").strip()
+        self._stderr.close()
+        if returncode != 0:
+            raise RuntimeError(f"ffmpeg failed with exit code {returncode} writing {self.path}: {stderr}")
+
+
+class ImageSequenceWriter(FrameWriter):
+    """
+    Writes every frame as a numbered image into a directory.
+
+    Args:
+        directory (str): Output directory.
+        extension (str, optional): Image format. Defaults to ".jpg".
+        quality (int, optional): JPEG quality. Defaults to 95.
+    """
+
+    def __init__(self, directory, extension=".jpg", quality=95):
+        super().__init__(directory)
+        os.makedirs(directory, exist_ok=True)
+        self.extension = extension
+        self._params = [cv2.IMWRITE_JPEG_QUALITY, quality] if extension in (".jpg", ".jpeg") else []
+
+    def _write(self, frame):
+        cv2.imwrite(os.path.join(self.path, f"{self.frames:06d}{self.extension}"), frame, self._params)
+
+
+class AsyncWriter:
+    """
+    Moves the encoding of another writer to a background thread behind a bounded queue.
+
+    Args:
+        writer (FrameWriter): The writer that does the encoding.
+        queue_size (int, optional): Number of frames that can wait for the encoder. Defaults to 32.
+        drop_frames (bool, optional): Drop frames when the queue is full instead of waiting. Defaults to False.
+    """
+
+    _END = object()
+
+    def __init__(self, writer, queue_size=32, drop_frames=False):
+        self.writer = writer
+        self.drop_frames = drop_frames
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._error = None
+        self._thread = threading.Thread(target=self._run, name="frame-writer", daemon=True)
+        self._thread.start()
+
+    def write(self, frame):
+        if self._error:
+            raise self._error
+        if self.drop_frames:
+            try:
+                self._queue.put_nowait(frame)
+            except queue.Full:
+                self.writer.dropped += 1
+        else:
+            self._queue.put(frame)
+
+    def release(self):
+        self._queue.put(self._END)
+        self._thread.join()
+        self.writer.release()
+        if self._error:
+            raise self._error
+
+    def summary(self):
+        return self.writer.summary()
+
+    def _run(self):
+        while True:
+            frame = self._queue.get()
+            if frame is self._END:
+                break
+            if self._error:
+                continue
+            try:
+                self.writer.write(frame)
+            except Exception as e:
+                self._error = e
+
+
+def open_video_writer(output_dir, output_name, width, height, fps=30, sink="xvid", encoder=None,
+                      preset="veryfast", async_write=True, queue_size=32, drop_frames=False):
+    """
+    Creates the output sink for annotated frames.
+
+    Args:
+        output_dir (str): Directory where the output will be saved.
+        output_name (str): Name of the output without extension.
+        width (int): Width of the video frames.
+        height (int): Height of the video frames.
+        fps (float, optional): Frame rate of the output, normally the source frame rate. Defaults to 30.
+        sink (str, optional): One of `VIDEO_SINKS`. Defaults to "xvid".
+        encoder (str, optional): FFmpeg encoder overriding the default of "h264"/"h265"
+            (e.g. "h264_nvenc"). Defaults to None.
+        preset (str, optional): FFmpeg encoder preset. Defaults to "veryfast".
+        async_write (bool, optional): Encode on a background thread. Defaults to True.
+        queue_size (int, optional): Capacity of the background queue. Defaults to 32.
+        drop_frames (bool, optional): Drop frames when the background queue is full. Defaults to False.
+
+    Returns:
+        FrameWriter or AsyncWriter: The opened sink.
+
+    Raises:
+        ValueError: If the sink is unknown or cannot be opened.
+    """
+    if sink not in VIDEO_SINKS:
+        raise ValueError(f"Unknown video sink: {sink}. Expected one of {tuple(VIDEO_SINKS)}.")
+    os.makedirs(output_dir, exist_ok=True)
+    extension, codec = VIDEO_SINKS[sink]
+    path = os.path.join(output_dir, output_name + extension)
+
+    if sink == "images":
+        writer = ImageSequenceWriter(path)
+    elif extension == ".mp4":
+        writer = FFmpegWriter(path, width, height, fps, encoder or codec, preset)
+    else:
+        writer = OpenCVWriter(path, width, height, fps, codec)
+    return AsyncWriter(writer, queue_size, drop_frames) if async_write else writer